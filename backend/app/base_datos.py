@@ -1,53 +1,326 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.pool import StaticPool
+from sqlalchemy import Column, Integer, create_engine, event, inspect, literal_column, text
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.pool import QueuePool, StaticPool
 
 # ACCEDER SQLITE: sqlite3 database.db
 
 # --- Configuración de la Base de Datos ---
 
-# Usamos una base de datos SQLite en un archivo.
+# Por defecto usamos una base de datos SQLite en un archivo.
 # La ruta ahora apuntará al directorio 'app'
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DB_PATH = os.path.join(BASE_DIR, "database.db")
-DATABASE_URL = f"sqlite:///{DB_PATH}"
 
-# Creamos el "motor" de la base de datos
-engine = create_engine(
-    DATABASE_URL,
-    # Esta configuración es necesaria para que SQLite funcione bien con Flask
-    connect_args={"check_same_thread": False},
-    # StaticPool es recomendado por FastAPI/Flask para SQLite
-    poolclass=StaticPool
-)
+# Variables de entorno (ver README, "Base de datos de servidor"):
+#   DATABASE_URL            URL de SQLAlchemy, p. ej. mysql+pymysql://u:p@host/beersp_db
+#                           o postgresql+psycopg2://u:p@host/beersp_db (SQLite por defecto)
+#   DB_POOL_SIZE            Conexiones que el pool mantiene abiertas (5)
+#   DB_MAX_OVERFLOW         Conexiones extra permitidas en picos (10)
+#   DB_POOL_TIMEOUT         Segundos esperando una conexión libre (30)
+#   DB_POOL_RECYCLE         Segundos antes de renovar una conexión; debe ser menor
+#                           que el wait_timeout del servidor (1800, -1 = nunca)
+#   DB_STATEMENT_TIMEOUT_MS Tiempo máximo de una consulta en ms (0 = sin límite)
+#   REPLICA_DATABASE_URL    URL de una réplica de solo lectura (opcional; ver SesionEnrutada)
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH}")
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL") or None
+
+# Pool de conexiones para bases de datos en fichero o servidor: cada
+# hilo/petición toma su propia conexión (las transacciones no se pisan)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+# PRAGMAs que se aplican a cada conexión SQLite en fichero al abrirla.
+# Con WAL los lectores no bloquean al único escritor (ni al revés).
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",   # Seguro con WAL y mucho más rápido que FULL
+    "busy_timeout": 5000,      # ms que espera un escritor antes de fallar con "database is locked"
+    "cache_size": -20000,      # Negativo = KiB (~20 MB de caché de páginas por conexión)
+    "mmap_size": 268435456,    # 256 MB de lectura por memoria mapeada
+}
+
+def es_sqlite_en_memoria(url: str) -> bool:
+    """Indica si la URL es una base de datos SQLite en memoria."""
+    return url.startswith("sqlite") and (url in ("sqlite://", "sqlite:///") or ":memory:" in url
+        or "mode=memory" in url)
+
+def _aplicar_pragmas_sqlite(conexion_dbapi, registro_conexion):
+    """Se ejecuta al abrir cada conexión física del pool."""
+    cursor = conexion_dbapi.cursor()
+    for pragma, valor in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma}={valor}")
+    cursor.close()
+
+def _limite_consultas(motor: str, milisegundos: int):
+    """
+    Devuelve un listener de "connect" que fija el tiempo máximo de las
+    consultas en cada conexión nueva, según el motor.
+    """
+    def aplicar(conexion_dbapi, registro_conexion):
+        cursor = conexion_dbapi.cursor()
+        if motor == "postgresql":
+            cursor.execute(f"SET statement_timeout = {milisegundos}")
+        elif motor in ("mysql", "mariadb"):
+            # En MySQL solo limita las SELECT (las escrituras usan innodb_lock_wait_timeout)
+            cursor.execute(f"SET SESSION max_execution_time = {milisegundos}")
+        cursor.close()
+    return aplicar
+
+def crear_engine(url: str, pool_size: int = None, max_overflow: int = None,
+                 pool_timeout: int = None, pool_recycle: int = None,
+                 statement_timeout_ms: int = None):
+    """
+    Crea un engine con el pool adecuado a la URL:
+    - SQLite en memoria: StaticPool (una única conexión compartida; si no,
+      cada conexión vería una base de datos vacía distinta). Solo para pruebas.
+    - SQLite en fichero: QueuePool con los PRAGMAs de SQLITE_PRAGMAS.
+    - MySQL / PostgreSQL: QueuePool con límite de tiempo por consulta.
+    Los parámetros que no se pasan toman el valor de las variables de entorno.
+    """
+    if es_sqlite_en_memoria(url):
+        return create_engine(
+            url,
+            # Esta configuración es necesaria para que SQLite funcione bien con Flask
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool
+        )
+
+    opciones = {}
+    if url.startswith("sqlite"):
+        opciones["connect_args"] = {"check_same_thread": False}
+    nuevo_engine = create_engine(
+        url,
+        poolclass=QueuePool,
+        pool_size=POOL_SIZE if pool_size is None else pool_size,
+        max_overflow=POOL_MAX_OVERFLOW if max_overflow is None else max_overflow,
+        pool_timeout=POOL_TIMEOUT if pool_timeout is None else pool_timeout,
+        pool_recycle=POOL_RECYCLE if pool_recycle is None else pool_recycle,
+        pool_pre_ping=True,
+        **opciones
+    )
+    if url.startswith("sqlite"):
+        # SQLite no tiene límite por consulta; busy_timeout acota las esperas por bloqueo
+        event.listen(nuevo_engine, "connect", _aplicar_pragmas_sqlite)
+    else:
+        limite = STATEMENT_TIMEOUT_MS if statement_timeout_ms is None else statement_timeout_ms
+        if limite > 0:
+            event.listen(nuevo_engine, "connect",
+                _limite_consultas(nuevo_engine.dialect.name, limite))
+    return nuevo_engine
+
+class SesionEnrutada(Session):
+    """
+    Sesión que envía las lecturas a la réplica cuando se abre con
+    info={"replica": True} (ver main.get_db_session) y todo lo demás a
+    la primaria. En cuanto la sesión escribe algo (flush o INSERT/UPDATE/
+    DELETE directo) se queda en la primaria hasta cerrarse, para que sus
+    propias lecturas vean lo escrito. Sin réplica configurada, todo va
+    a la primaria.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if isinstance(clause, UpdateBase) or self._flushing:
+            self.info["escrito"] = True
+        if (engine_replica is not None and self.info.get("replica")
+                and not self.info.get("escrito")):
+            return engine_replica
+        return super().get_bind(mapper=mapper, clause=clause, **kw)
 
 # Creamos una 'fábrica' de sesiones de base de datos
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# (se enlaza al engine en configurar_engine)
+SessionLocal = sessionmaker(class_=SesionEnrutada, autocommit=False, autoflush=False)
+engine = None
+engine_replica = None
+
+def configurar_engine(url: str = None, url_replica: str = None):
+    """
+    Crea el "motor" de la base de datos (y el de la réplica, si hay)
+    y enlaza SessionLocal a él. Sin argumentos usa DATABASE_URL y
+    REPLICA_DATABASE_URL.
+    Importar el módulo no lo crea: lo llama create_app() (ver main.py) y,
+    en producción, una vez en cada worker tras el fork (ver
+    gunicorn.conf.py), para que ningún proceso comparta conexiones
+    heredadas de otro.
+    """
+    global engine, engine_replica
+    if url is None:
+        url, url_replica = DATABASE_URL, REPLICA_DATABASE_URL
+    for anterior in (engine, engine_replica):
+        if anterior is not None:
+            # Descarta el pool heredado sin cerrar conexiones de otro proceso
+            anterior.dispose(close=False)
+    engine = crear_engine(url)
+    engine_replica = crear_engine(url_replica) if url_replica else None
+    SessionLocal.configure(bind=engine)
+    return engine
+
+def sincronizar_replica_sqlite():
+    """
+    Copia la base de datos primaria sobre la réplica con la API de
+    backup de SQLite. Solo para desarrollo y pruebas, donde un segundo
+    fichero SQLite hace de réplica; en MySQL/PostgreSQL la replicación
+    la hace el propio servidor.
+    """
+    if engine_replica is None:
+        raise ValueError("No hay réplica configurada (REPLICA_DATABASE_URL)")
+    if engine.dialect.name != "sqlite" or engine_replica.dialect.name != "sqlite":
+        raise ValueError("La sincronización manual solo está disponible entre ficheros SQLite")
+    origen = engine.raw_connection()
+    destino = engine_replica.raw_connection()
+    try:
+        origen.driver_connection.backup(destino.driver_connection)
+    finally:
+        destino.close()
+        origen.close()
 
 # 'Base' es la clase de la que heredarán todos nuestros modelos (objetos)
 Base = declarative_base()
 
+def columna_version():
+    """
+    Columna 'version' de una fila: empieza en 1 y sube en cada UPDATE,
+    también en los de Core (update(tabla)) que no la asignan. Es el
+    validador de los ETag de los endpoints de detalle (ver http_condicional).
+    """
+    return Column(Integer, nullable=False, default=1, server_default=text("1"),
+        onupdate=literal_column("version") + 1)
+
+def importar_modelos():
+    """
+    Importa todos los modelos para que 'Base' los reconozca.
+    ¡Tendrás que importar aquí todos tus modelos!
+    """
+    from .objetos import usuario, amistad, cerveza, cerveceria, degustacion, galardon, token, actividad, trabajo
+
 # --- Función para crear la base de datos ---
 def init_db():
     """
     Inicializa la base de datos y crea las tablas si no existen.
     """
-    # Importamos los modelos aquí para que 'Base' los reconozca
-    # ¡Tendrás que importar aquí todos tus modelos!
-    from .objetos import usuario, cerveza, galardon
-    # from .objetos import degustacion # (Cuando tu compañero lo cree)
+    importar_modelos()
     
-    print(f"Creando tablas en la base de datos en: {DB_PATH}")
+    print(f"Creando tablas en la base de datos en: {engine.url.render_as_string(hide_password=True)}")
 
     # Deputación para ver tablas creadas
     print("Tablas a crear:")
     for table_name, table in Base.metadata.tables.items():
         print(f"   - {table_name}")
 
+    feed_nuevo = not inspect(engine).has_table("actividad_amigos")
     Base.metadata.create_all(bind=engine)
+    if anadir_columnas_faltantes():
+        print("Columnas nuevas añadidas. Si son agregados, ejecuta: "
+              "flask --app app.main reconciliar-valoraciones")
+    crear_indices_faltantes()
+    from .servicios.busqueda import crear_indices_busqueda
+    for fts in crear_indices_busqueda(engine):
+        print(f"   + Índice de búsqueda creado: {fts}")
+    if feed_nuevo:
+        # Primera vez con el feed materializado: se llena con lo que ya hay
+        from .servicios import actividad_servicio
+        db = SessionLocal()
+        try:
+            print(f"   + Feed de actividad inicial: {actividad_servicio.reconstruir(db)} entradas")
+        finally:
+            db.close()
     print("Tablas creadas exitosamente.")
 
+def anadir_columnas_faltantes():
+    """
+    create_all() no modifica tablas que ya existen, así que añadimos con
+    ALTER TABLE las columnas nuevas de los modelos que falten en la BD.
+    Devuelve la lista de columnas añadidas ("tabla.columna").
+    """
+    inspector = inspect(engine)
+    anadidas = []
+    with engine.begin() as conexion:
+        for tabla in Base.metadata.sorted_tables:
+            if not inspector.has_table(tabla.name):
+                continue
+            existentes = {c['name'] for c in inspector.get_columns(tabla.name)}
+            for columna in tabla.columns:
+                if columna.name in existentes:
+                    continue
+                definicion = f"{columna.name} {columna.type.compile(dialect=engine.dialect)}"
+                if columna.server_default is not None:
+                    valor = columna.server_default.arg
+                    valor = valor.text if hasattr(valor, 'text') else f"'{valor}'"
+                    definicion += f" DEFAULT {valor}"
+                    if not columna.nullable:
+                        definicion += " NOT NULL"
+                conexion.execute(text(f"ALTER TABLE {tabla.name} ADD COLUMN {definicion}"))
+                anadidas.append(f"{tabla.name}.{columna.name}")
+                print(f"   + Columna añadida: {tabla.name}.{columna.name}")
+    return anadidas
+
+def crear_indices_faltantes():
+    """
+    Igual que con las columnas, create_all() no crea los índices nuevos
+    de tablas que ya existen. Los creamos aquí si faltan.
+    """
+    with engine.begin() as conexion:
+        for tabla in Base.metadata.sorted_tables:
+            for indice in tabla.indexes:
+                indice.create(conexion, checkfirst=True)
+
+# --- Esquema para bases de datos de servidor ---
+
+# Scripts de init_beersp/ que se generan desde los modelos. Todo lo que
+# haya a partir de MARCA_DATOS_EJEMPLO se conserva al regenerarlos.
+SCRIPTS_ESQUEMA = {
+    "mysql": os.path.join(os.path.dirname(BASE_DIR), "init_beersp", "init_beersp.sql"),
+    "postgresql": os.path.join(os.path.dirname(BASE_DIR), "init_beersp", "init_beersp_postgresql.sql"),
+}
+MARCA_DATOS_EJEMPLO = "-- Datos de ejemplo"
+
+def generar_esquema_sql(dialecto: str) -> str:
+    """
+    Genera el DDL (CREATE TABLE + CREATE INDEX) de todos los modelos
+    para 'mysql' o 'postgresql'. Así los scripts de init_beersp/ nunca
+    se desincronizan de los modelos.
+    """
+    from sqlalchemy.dialects import mysql, postgresql
+    from sqlalchemy.schema import CreateIndex, CreateTable
+
+    dialectos = {"mysql": mysql.dialect(), "postgresql": postgresql.dialect()}
+    if dialecto not in dialectos:
+        raise ValueError(f"Dialecto no soportado: {dialecto}")
+
+    importar_modelos()
+    sentencias = []
+    for tabla in Base.metadata.sorted_tables:
+        ddl = str(CreateTable(tabla, if_not_exists=True).compile(dialect=dialectos[dialecto]))
+        sentencias.append("\n".join(linea.rstrip() for linea in ddl.strip().splitlines()) + ";")
+        for indice in sorted(tabla.indexes, key=lambda i: i.name):
+            ddl = str(CreateIndex(indice).compile(dialect=dialectos[dialecto]))
+            sentencias.append(ddl.strip() + ";")
+    return "\n\n".join(sentencias) + "\n"
+
+def componer_script_esquema(dialecto: str, script_actual: str = "") -> str:
+    """
+    Devuelve el script de init_beersp/ para el dialecto: cabecera,
+    esquema generado y los datos de ejemplo que ya tuviera el script.
+    """
+    cabecera = [
+        f"-- Esquema de beersp_db para {dialecto}. NO EDITAR A MANO la parte del esquema:",
+        "-- se genera desde los modelos con: flask --app app.main exportar-esquema",
+        "-- Se ejecuta una sola vez, al crear el contenedor de la base de datos.",
+    ]
+    if dialecto == "mysql":
+        cabecera += ["-- CONNECT: docker exec -it beersp-db mysql -u root -p", "USE beersp_db;"]
+    else:
+        cabecera += ["-- CONNECT: docker exec -it beersp-db-pg psql -U beersp beersp_db"]
+
+    datos = ""
+    if MARCA_DATOS_EJEMPLO in script_actual:
+        datos = "\n" + script_actual[script_actual.index(MARCA_DATOS_EJEMPLO):]
+    return "\n".join(cabecera) + "\n\n" + generar_esquema_sql(dialecto) + datos
+
 # --- Función para obtener una sesión  ---
 def get_db():
     """
@@ -58,4 +331,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
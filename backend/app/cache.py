@@ -0,0 +1,227 @@
+"""
+Caché de respuestas para los endpoints de catálogo (estilos, países,
+listado de cervezas y galardones), que se leen mucho y cambian poco.
+
+Cada ruta cacheada pertenece a una "etiqueta" (p. ej. "cervezas_estilos")
+y la clave de cada entrada es etiqueta + versión de la etiqueta + ruta +
+parámetros de la consulta. Los servicios invalidan las etiquetas a las
+que afecta cada escritura con invalidar_al_confirmar(): al hacer commit
+se incrementa la versión y las entradas antiguas dejan de usarse (y
+acaban saliendo por TTL o LRU). Si la transacción se deshace, no se
+invalida nada.
+
+Con réplica de lectura, una respuesta leída de la réplica podría ser
+anterior a la última escritura y quedar guardada con la versión nueva de
+la etiqueta (y los aciertos no pasan por la BD, así que ni el cliente que
+acaba de escribir la vería). Por eso, al fallar la caché, la vista lee de
+la primaria (g.cache_leer_de_primaria) y nunca se guarda una respuesta
+cuya sesión haya leído de la réplica.
+
+El backend se elige con CACHE_URL:
+  - "memoria" (por defecto): diccionario LRU con TTL en cada proceso.
+    Cada worker invalida solo su copia, así que entre workers los datos
+    pueden ir hasta CACHE_TTL_SEGUNDOS por detrás.
+  - "redis://host:6379/0": Redis o cualquier servidor compatible
+    (necesita el paquete redis). Compartido por todos los workers, la
+    invalidación es inmediata en todos.
+  - "ninguna": sin caché.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import Response, current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import base_datos
+
+CACHE_URL = os.getenv("CACHE_URL", "memoria")
+TTL_SEGUNDOS = float(os.getenv("CACHE_TTL_SEGUNDOS", "60"))
+MAX_ENTRADAS = int(os.getenv("CACHE_MAX_ENTRADAS", "1024"))
+PREFIJO = "beersp:cache:"
+
+
+class CacheMemoria:
+    """LRU con TTL en memoria del proceso."""
+
+    nombre = "memoria"
+
+    def __init__(self, max_entradas: int = MAX_ENTRADAS):
+        self.max_entradas = max_entradas
+        self.entradas = OrderedDict()  # clave -> (caduca, valor)
+        self.versiones = {}
+        self.cerrojo = threading.Lock()
+
+    def obtener(self, clave: str):
+        with self.cerrojo:
+            entrada = self.entradas.get(clave)
+            if entrada is None:
+                return None
+            if entrada[0] < time.monotonic():
+                del self.entradas[clave]
+                return None
+            self.entradas.move_to_end(clave)
+            return entrada[1]
+
+    def guardar(self, clave: str, valor: bytes, ttl: float):
+        with self.cerrojo:
+            self.entradas[clave] = (time.monotonic() + ttl, valor)
+            self.entradas.move_to_end(clave)
+            while len(self.entradas) > self.max_entradas:
+                self.entradas.popitem(last=False)
+
+    def version(self, etiqueta: str) -> int:
+        with self.cerrojo:
+            return self.versiones.get(etiqueta, 0)
+
+    def incrementar_version(self, etiqueta: str):
+        with self.cerrojo:
+            self.versiones[etiqueta] = self.versiones.get(etiqueta, 0) + 1
+            # Las entradas de versiones anteriores ya no se pueden leer
+            for clave in [c for c in self.entradas if c.startswith(f"{etiqueta}:")]:
+                del self.entradas[clave]
+
+    def __len__(self):
+        return len(self.entradas)
+
+    def limpiar(self):
+        with self.cerrojo:
+            self.entradas.clear()
+            self.versiones.clear()
+
+
+class CacheRedis:
+    """Caché compartida en Redis (o un servidor compatible con su protocolo)."""
+
+    nombre = "redis"
+
+    def __init__(self, url: str):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_URL=redis://... necesita el paquete 'redis' (pip install redis)") from e
+        self.cliente = redis.Redis.from_url(url)
+
+    def obtener(self, clave: str):
+        return self.cliente.get(PREFIJO + clave)
+
+    def guardar(self, clave: str, valor: bytes, ttl: float):
+        self.cliente.set(PREFIJO + clave, valor, px=int(ttl * 1000))
+
+    def version(self, etiqueta: str) -> int:
+        return int(self.cliente.get(f"{PREFIJO}version:{etiqueta}") or 0)
+
+    def incrementar_version(self, etiqueta: str):
+        self.cliente.incr(f"{PREFIJO}version:{etiqueta}")
+
+    def __len__(self):
+        return sum(1 for _ in self.cliente.scan_iter(f"{PREFIJO}*:*:/*"))
+
+    def limpiar(self):
+        for clave in self.cliente.scan_iter(f"{PREFIJO}*"):
+            self.cliente.delete(clave)
+
+
+def crear_backend(url: str = CACHE_URL):
+    """Backend de caché para CACHE_URL, o None si está desactivada."""
+    if url == "ninguna":
+        return None
+    if url == "memoria":
+        return CacheMemoria()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return CacheRedis(url)
+    raise ValueError(f"CACHE_URL no válida: {url!r} (memoria, redis://... o ninguna)")
+
+
+backend = crear_backend()
+
+# Contadores del proceso: etiqueta -> {"aciertos": n, "fallos": n}
+_contadores = {}
+_cerrojo_contadores = threading.Lock()
+
+
+def _contar(etiqueta: str, tipo: str):
+    with _cerrojo_contadores:
+        contador = _contadores.setdefault(etiqueta, {"aciertos": 0, "fallos": 0})
+        contador[tipo] += 1
+
+
+def estadisticas() -> dict:
+    """Aciertos y fallos por etiqueta (de este proceso) y entradas guardadas."""
+    with _cerrojo_contadores:
+        por_etiqueta = {etiqueta: dict(valores) for etiqueta, valores in _contadores.items()}
+    return {
+        "backend": backend.nombre if backend is not None else "ninguna",
+        "entradas": len(backend) if backend is not None else 0,
+        "aciertos": sum(v["aciertos"] for v in por_etiqueta.values()),
+        "fallos": sum(v["fallos"] for v in por_etiqueta.values()),
+        "por_etiqueta": por_etiqueta,
+    }
+
+
+def limpiar():
+    """Vacía la caché y pone a cero los contadores (p. ej. entre pruebas)."""
+    if backend is not None:
+        backend.limpiar()
+    with _cerrojo_contadores:
+        _contadores.clear()
+
+
+def cacheada(etiqueta: str, ttl: float = None):
+    """
+    Decorador para rutas GET: sirve la respuesta desde la caché si está y,
+    si no, ejecuta la vista y guarda su respuesta (solo las 200 en JSON).
+    Añade la cabecera X-Cache: HIT o MISS.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltorio(*args, **kwargs):
+            if backend is None:
+                return vista(*args, **kwargs)
+            parametros = "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+            clave = f"{etiqueta}:{backend.version(etiqueta)}:{request.path}?{parametros}"
+            cuerpo = backend.obtener(clave)
+            if cuerpo is not None:
+                _contar(etiqueta, "aciertos")
+                respuesta = Response(cuerpo, status=200, mimetype="application/json")
+                respuesta.headers["X-Cache"] = "HIT"
+                return respuesta
+
+            _contar(etiqueta, "fallos")
+            # Lo que se guarda se lee de la primaria (ver main.puede_leer_de_replica)
+            g.cache_leer_de_primaria = True
+            respuesta = current_app.make_response(vista(*args, **kwargs))
+            sesion = g.get("_db_sesion")
+            de_replica = (base_datos.engine_replica is not None and sesion is not None
+                and sesion.info.get("replica") and not sesion.info.get("escrito"))
+            if respuesta.status_code == 200 and respuesta.is_json and not de_replica:
+                backend.guardar(clave, respuesta.get_data(), TTL_SEGUNDOS if ttl is None else ttl)
+            respuesta.headers["X-Cache"] = "MISS"
+            return respuesta
+        return envoltorio
+    return decorador
+
+
+def invalidar(*etiquetas: str):
+    """Invalida ya todas las entradas de esas etiquetas."""
+    if backend is None:
+        return
+    for etiqueta in etiquetas:
+        backend.incrementar_version(etiqueta)
+
+
+def invalidar_al_confirmar(db: Session, *etiquetas: str):
+    """Invalida esas etiquetas cuando 'db' haga commit (nada si hace rollback)."""
+    if db is not None:
+        db.info.setdefault("cache_invalidar", set()).update(etiquetas)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_tras_commit(sesion):
+    invalidar(*sesion.info.pop("cache_invalidar", ()))
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_tras_rollback(sesion):
+    sesion.info.pop("cache_invalidar", None)
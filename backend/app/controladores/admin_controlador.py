@@ -0,0 +1,58 @@
+from flask import Blueprint, g, jsonify, request
+from app import cache
+from app.servicios import tokens, trabajos
+
+# Blueprint para las rutas de administración y observabilidad
+admin_bp = Blueprint('admin_bp', __name__)
+# Verifica el token de acceso de la petición, si trae uno (ver servicios/tokens);
+# las rutas exigen además que sea de un administrador
+admin_bp.before_request(tokens.cargar_token)
+
+@admin_bp.route("/admin/cache/", methods=["GET"])
+@tokens.requiere_token
+@tokens.requiere_admin
+def api_estadisticas_cache():
+    """
+    Aciertos y fallos de la caché de respuestas (de este proceso) por
+    etiqueta, backend en uso y entradas guardadas.
+    """
+    try:
+        return jsonify(cache.estadisticas()), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@admin_bp.route("/admin/jobs/", methods=["GET"])
+@tokens.requiere_token
+@tokens.requiere_admin
+def api_estado_trabajos():
+    """
+    Estado de la cola de trabajos en segundo plano: cuántos hay en cada
+    estado y los más recientes (?estado=fallido para la cola de muertos).
+    """
+    try:
+        estado = request.args.get('estado')
+        if estado is not None and estado not in trabajos.ESTADOS:
+            return jsonify({"error": f"Estado no válido. Válidos: {', '.join(trabajos.ESTADOS)}"}), 400
+        skip = request.args.get('skip', 0, type=int)
+        limit = min(max(request.args.get('limit', 50, type=int), 1), 200)
+
+        resumen = trabajos.estadisticas(g.db)
+        resumen["trabajos"] = [trabajo.to_dict() for trabajo in
+            trabajos.obtener_trabajos(g.db, estado=estado, skip=skip, limit=limit)]
+        return jsonify(resumen), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@admin_bp.route("/admin/jobs/<int:trabajo_id>/reintentar/", methods=["POST"])
+@tokens.requiere_token
+@tokens.requiere_admin
+def api_reintentar_trabajo(trabajo_id: int):
+    """
+    Devuelve a la cola un trabajo fallido (con los intentos a cero).
+    """
+    try:
+        if not trabajos.reintentar(g.db, trabajo_id):
+            return jsonify({"error": "Trabajo no encontrado o no está fallido"}), 404
+        return jsonify({"message": "Trabajo devuelto a la cola"}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
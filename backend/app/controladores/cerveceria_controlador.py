@@ -1,8 +1,13 @@
 from flask import Blueprint, jsonify, request, abort, g
-from app.servicios.cerveceria_servicio import CerveceriaService
+from app.servicios.cerveceria_servicio import CerveceriaService, validar_coordenadas
+from app import http_condicional
+from app.objetos.cerveceria import Cerveceria
+from app.servicios import autocompletado, tokens
 
 # Blueprint para modularizar las APIs de cervecerías
 cerveceria_bp = Blueprint('cerveceria_bp', __name__)
+# Verifica el token de acceso de la petición, si trae uno (ver servicios/tokens)
+cerveceria_bp.before_request(tokens.cargar_token)
 
 @cerveceria_bp.route("/cervecerias/", methods=["POST"])
 def api_crear_cerveceria():
@@ -13,6 +18,10 @@ def api_crear_cerveceria():
     data = request.json
     if not data or 'nombre' not in data or 'direccion' not in data:
         abort(400, "Los campos 'nombre' y 'direccion' son obligatorios.")
+    try:
+        validar_coordenadas(data.get('lat'), data.get('lon'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
         
     try:
         nueva_cerveceria = CerveceriaService.crear_cerveceria(g.db, data)
@@ -39,6 +48,7 @@ def eliminar_cerveza(cerveceria_id: int):
 
 
 @cerveceria_bp.route("/cervecerias/", methods=["GET"])
+@http_condicional.condicional()
 def api_buscar_cervecerias():
     """
     Endpoint para listar o filtrar cervecerías.
@@ -57,7 +67,25 @@ def api_buscar_cervecerias():
         return jsonify({"error": f"{e}"}), 500
 
 
+@cerveceria_bp.route("/cervecerias/autocomplete/", methods=["GET"])
+def api_autocompletar_cervecerias():
+    """
+    Autocompletado del buscador de cervecerías.
+    Devuelve hasta 'limite' (10 por defecto) coincidencias por prefijo de
+    'q' desde el índice en memoria, sin consultar la base de datos.
+    """
+    q = request.args.get('q', '')
+    limite = request.args.get('limite', default=autocompletado.LIMITE_POR_DEFECTO, type=int)
+    if limite is None or not 0 < limite <= autocompletado.LIMITE_MAXIMO:
+        return jsonify({"error": f"'limite' debe estar entre 1 y {autocompletado.LIMITE_MAXIMO}."}), 400
+    try:
+        coincidencias = autocompletado.autocompletar(g.db, "cervecerias", q, limite)
+        return jsonify([{"id": id_fila, "nombre": texto} for id_fila, texto in coincidencias]), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @cerveceria_bp.route("/cervecerias/<int:id_cerveceria>/", methods=["GET"])
+@http_condicional.condicional(http_condicional.version_de_fila(Cerveceria, "id_cerveceria"))
 def api_get_detalle_cerveceria(id_cerveceria: int):
     """
     Endpoint para obtener detalle de una cervecería específica.
@@ -80,16 +108,77 @@ def api_sugerencias_cervecerias():
     Endpoint para RNF-8 (geolocalización).
     Devuelve cervecerías cercanas al usuario según lat/lon y radio.
     """
+    lat = request.args.get('lat', type=float)
+    lon = request.args.get('lon', type=float)
+    radio = request.args.get('radio', default=5, type=float)
+    limite = request.args.get('limite', type=int)
+
+    if lat is None or lon is None:
+        return jsonify({"error": "Los parámetros 'lat' y 'lon' son obligatorios."}), 400
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        return jsonify({"error": "Coordenadas fuera de rango."}), 400
+    if radio is None or radio <= 0 or (limite is not None and limite <= 0):
+        return jsonify({"error": "'radio' y 'limite' deben ser positivos."}), 400
+
     try:
-        lat = request.args.get('lat', type=float)
-        lon = request.args.get('lon', type=float)
-        radio = request.args.get('radio', default=5, type=float)
-        
-        if lat is None or lon is None:
-            abort(400, "Los parámetros 'lat' y 'lon' son obligatorios.")
-        
-        sugerencias = CerveceriaService.get_cervecerias_cercanas(g.db, lat, lon, radio)
-        return jsonify([c.to_dict() for c in sugerencias]), 200
+        sugerencias = CerveceriaService.get_cervecerias_cercanas(g.db, lat, lon, radio, limite)
+        resultado = []
+        for cerveceria, distancia in sugerencias:
+            cerveceria_dict = cerveceria.to_dict()
+            cerveceria_dict["distancia_km"] = round(distancia, 3)
+            resultado.append(cerveceria_dict)
+        return jsonify(resultado), 200
     
     except Exception as e:
         return jsonify({"error": f"{e}"}), 500
+
+# Máximo de puntos por petición en la consulta en lote
+MAX_PUNTOS_LOTE = 1000
+MAX_K_LOTE = 100
+
+@cerveceria_bp.route("/cervecerias/sugeridas/lote/", methods=["POST"])
+def api_sugerencias_cervecerias_lote():
+    """
+    Versión en lote de /cervecerias/sugeridas/ (RNF-8), p. ej. para
+    campañas: las k cervecerías más cercanas a cada punto.
+    Espera un JSON: {"puntos": [{"lat": .., "lon": .., "id": opcional}, ...],
+    "radio": 5, "k": 10}. El "id" (p. ej. de usuario) se devuelve tal cual.
+    """
+    data = request.get_json(silent=True) or {}
+    puntos = data.get('puntos')
+    radio = data.get('radio', 5)
+    k = data.get('k', 10)
+
+    if not isinstance(puntos, list) or not puntos:
+        return jsonify({"error": "El campo 'puntos' debe ser una lista no vacía."}), 400
+    if len(puntos) > MAX_PUNTOS_LOTE:
+        return jsonify({"error": f"Como máximo {MAX_PUNTOS_LOTE} puntos por petición."}), 400
+    if not isinstance(radio, (int, float)) or radio <= 0 \
+            or not isinstance(k, int) or not 0 < k <= MAX_K_LOTE:
+        return jsonify({"error": f"'radio' debe ser positivo y 'k' entre 1 y {MAX_K_LOTE}."}), 400
+    try:
+        for punto in puntos:
+            if not isinstance(punto, dict):
+                raise ValueError("Cada punto debe ser un objeto con 'lat' y 'lon'.")
+            validar_coordenadas(punto.get('lat'), punto.get('lon'))
+            if punto.get('lat') is None:
+                raise ValueError("Cada punto debe tener 'lat' y 'lon'.")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        sugerencias = CerveceriaService.get_cervecerias_cercanas_lote(
+            g.db, [(p['lat'], p['lon']) for p in puntos], radio, k)
+        resultados = []
+        for punto, cercanas in zip(puntos, sugerencias):
+            cervecerias = []
+            for cerveceria, distancia in cercanas:
+                cerveceria_dict = cerveceria.to_dict()
+                cerveceria_dict["distancia_km"] = round(distancia, 3)
+                cervecerias.append(cerveceria_dict)
+            resultados.append({"id": punto.get('id'), "lat": punto['lat'], "lon": punto['lon'],
+                "cervecerias": cervecerias})
+        return jsonify({"resultados": resultados}), 200
+
+    except Exception as e:
+        return jsonify({"error": f"{e}"}), 500
@@ -1,10 +1,15 @@
 import pdb
 from flask import Blueprint, jsonify, request, abort, g
-from app.servicios.cerveza_servicio import CervezaService
+from app import cache, http_condicional
+from app.objetos.cerveza import Cerveza
+from app.servicios.cerveza_servicio import CervezaService, CACHE_LISTADO, CACHE_ESTILOS, CACHE_PAISES
 from app.servicios.usuario_servicio import UsuarioServicio
+from app.servicios import autocompletado, tokens
 
 # Uso blueprint, para meter las APIs en "paquetes" y ser más modular.
 cerveza_bp = Blueprint('cerveza_bp', __name__)
+# Verifica el token de acceso de la petición, si trae uno (ver servicios/tokens)
+cerveza_bp.before_request(tokens.cargar_token)
 
 @cerveza_bp.route("/cervezas/", methods=["POST"])
 def api_crear_cerveza():
@@ -19,7 +24,6 @@ def api_crear_cerveza():
     try:
         nueva_cerveza = CervezaService.crear_cerveza(g.db, data)
         cerveza_dict = nueva_cerveza.to_dict()
-        cerveza_dict['valoracion_promedio'] = 0.0 # Valor inicial
         return jsonify(cerveza_dict), 201 # 201 Created
         
     except ValueError as e:
@@ -29,43 +33,37 @@ def api_crear_cerveza():
         return jsonify({"error": str(e)}), 500 
 
 @cerveza_bp.route("/cervezas/", methods=["GET"])
+@http_condicional.condicional()
+@cache.cacheada(CACHE_LISTADO)
 def api_buscar_cervezas():
     """
     Endpoint para RF-3.1 (Buscar) y RF-5.7 (Filtrar).
-    --- AHORA OPTIMIZADO (SIN N+1) ---
+    --- OPTIMIZADO (SIN N+1): la valoración se lee de columnas agregadas ---
     """
     
     # 1. Obtenemos parámetros
     q = request.args.get('q')
     estilo = request.args.get('estilo')
     pais = request.args.get('pais')
-
-    # pdb.set_trace()
     
-    # 2. Llamamos al servicio (que ahora devuelve tuplas)
-    #    Restauramos el try/except para robustez
+    # 2. Llamamos al servicio (1 sola consulta, sin agregados por petición)
     try:
-        cervezas_con_valoracion = CervezaService.buscar_cervezas(g.db, q=q, estilo=estilo, pais=pais)
+        cervezas = CervezaService.buscar_cervezas(g.db, q=q, estilo=estilo, pais=pais)
         
         # 3. Preparamos la respuesta
         resultado = []
         
-        # 'cervezas_con_valoracion' es list[tuple(Cerveza, float)]
-        for cerveza, valoracion in cervezas_con_valoracion:
-            # Obtiene la valoración promedio
-            valoracion = CervezaService.get_valoracion_promedio(g.db, cerveza.id) 
-            # Convierte a diccionario
+        for cerveza in cervezas:
             cerveza_dict = cerveza.to_dict()
-            # Asignamos la valoración (manejando el caso None si no tiene ratings)
-            val_promedio_final = round(valoracion, 2) if valoracion is not None else 0.0
             # Prepara el resultado
             resultado.append({
                 "id": cerveza_dict['id'],
                 "nombre": cerveza_dict['nombre'],
                 "estilo": cerveza_dict['estilo'],
-                "pais_procedencia": cerveza_dict.get('pais_procedencia'),
-                "porcentaje_alcohol": cerveza_dict.get('porcentaje_alcohol'),
-                "valoracion_promedio": val_promedio_final
+                "pais_procedencia": cerveza_dict['pais_procedencia'],
+                "porcentaje_alcohol": cerveza_dict['porcentaje_alcohol'],
+                "valoracion_promedio": cerveza_dict['valoracion_promedio'],
+                "total_valoraciones": cerveza_dict['total_valoraciones']
             })
             
         return jsonify(resultado), 200
@@ -73,7 +71,25 @@ def api_buscar_cervezas():
     except Exception as e:
         return jsonify({"error": str(e)}), 500 
 
+@cerveza_bp.route("/cervezas/autocomplete/", methods=["GET"])
+def api_autocompletar_cervezas():
+    """
+    Autocompletado del buscador de cervezas (RF-3.1).
+    Devuelve hasta 'limite' (10 por defecto) coincidencias por prefijo de
+    'q' desde el índice en memoria, sin consultar la base de datos.
+    """
+    q = request.args.get('q', '')
+    limite = request.args.get('limite', default=autocompletado.LIMITE_POR_DEFECTO, type=int)
+    if limite is None or not 0 < limite <= autocompletado.LIMITE_MAXIMO:
+        return jsonify({"error": f"'limite' debe estar entre 1 y {autocompletado.LIMITE_MAXIMO}."}), 400
+    try:
+        coincidencias = autocompletado.autocompletar(g.db, "cervezas", q, limite)
+        return jsonify([{"id": id_fila, "nombre": texto} for id_fila, texto in coincidencias]), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @cerveza_bp.route("/cervezas/<int:id_cerveza>/", methods=["GET"])
+@http_condicional.condicional(http_condicional.version_de_fila(Cerveza, "id_cerveza"))
 def api_get_detalle_cerveza(id_cerveza: int):
     """
     Endpoint para RF-3.4 (Detalle con valoración).
@@ -83,8 +99,8 @@ def api_get_detalle_cerveza(id_cerveza: int):
         if not cerveza:
            return jsonify({"error": "Cerveza no encontrada"}), 404
             
+        # Incluye la valoración promedio almacenada (RF-3.4)
         cerveza_dict = cerveza.to_dict()
-        # cerveza_dict['valoracion_promedio'] = CervezaService.get_valoracion_promedio(g.db, id_cerveza)
         
         return jsonify(cerveza_dict), 200
         
@@ -121,6 +137,8 @@ def api_get_favoritas(id_usuario: int):
         return jsonify({"error": str(e)}), 500 
         
 @cerveza_bp.route("/cervezas/estilos/", methods=["GET"])
+@http_condicional.condicional()
+@cache.cacheada(CACHE_ESTILOS)
 def api_get_estilos():
     """
     Endpoint para RNF-4 (Obtener lista de estilos únicos).
@@ -132,6 +150,8 @@ def api_get_estilos():
         return jsonify({"error": str(e)}), 500 
 
 @cerveza_bp.route("/cervezas/paises/", methods=["GET"])
+@http_condicional.condicional()
+@cache.cacheada(CACHE_PAISES)
 def api_get_paises():
     """
     Endpoint para RNF-4 (Obtener lista de países únicos).
@@ -2,13 +2,24 @@
 from flask import Blueprint, jsonify, request, abort, g
 from sqlalchemy.orm import Session
 from typing import List
-from app.servicios import degustacion_servicio
-from app.servicios.usuario_servicio import UsuarioServicio
-from app.servicios.cerveza_servicio import CervezaService
+from app import http_condicional
+from app.servicios import degustacion_servicio, tokens
 import pdb
 
 # Blueprint para las rutas de degustaciones
 degustacion_bp = Blueprint('degustacion_bp', __name__)
+# Verifica el token de acceso de la petición, si trae uno (ver servicios/tokens)
+degustacion_bp.before_request(tokens.cargar_token)
+
+def _pagina_con_cursor(degustaciones: list, degustaciones_dict: list, limit: int) -> dict:
+    """
+    Respuesta del modo cursor: la página y el cursor de la siguiente
+    (None si ya no quedan más degustaciones).
+    """
+    siguiente = None
+    if degustaciones and len(degustaciones) >= limit:
+        siguiente = degustacion_servicio.codificar_cursor(degustaciones[-1])
+    return {"degustaciones": degustaciones_dict, "siguiente_cursor": siguiente}
 
 @degustacion_bp.route("/degustaciones/", methods=["POST"])
 def api_crear_degustacion():
@@ -29,50 +40,59 @@ def api_crear_degustacion():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _validador_degustacion(db, degustacion_id: int):
+    """
+    ETag del detalle de una degustación (sin cargarla). Sin Last-Modified:
+    fecha_actualizacion no cambia al renombrar el usuario o la cerveza, que
+    también salen en la respuesta.
+    """
+    fila = degustacion_servicio.version_degustacion(db, degustacion_id)
+    if fila is None:
+        return None
+    version, nombre_usuario, nombre_cerveza = fila
+    return http_condicional.etag_de(version, nombre_usuario, nombre_cerveza), None
+
 @degustacion_bp.route("/degustaciones/", methods=["GET"])
+@http_condicional.condicional()
 def obtener_degustaciones():
     """
-    Obtiene degustaciones con filtros opcionales
+    Obtiene degustaciones con filtros opcionales.
+    Paginación: 'skip'/'limit' (lista) o 'cursor' (vacío para la primera
+    página), que devuelve {"degustaciones": [...], "siguiente_cursor": ...}
     """
     try:
         usuario_id = request.args.get('usuario_id', type=int)
         cerveza_id = request.args.get('cerveza_id', type=int)
         skip = request.args.get('skip', 0, type=int)
         limit = request.args.get('limit', 100, type=int)
+        cursor = request.args.get('cursor')
         
         if usuario_id:
             degustaciones = degustacion_servicio.obtener_degustaciones_por_usuario(
-                db=g.db, usuario_id=usuario_id, skip=skip, limit=limit
+                db=g.db, usuario_id=usuario_id, skip=skip, limit=limit, cursor=cursor
             )
         elif cerveza_id:
             degustaciones = degustacion_servicio.obtener_degustaciones_por_cerveza(
-                db=g.db, cerveza_id=cerveza_id, skip=skip, limit=limit
+                db=g.db, cerveza_id=cerveza_id, skip=skip, limit=limit, cursor=cursor
             )
         else:
             degustaciones = degustacion_servicio.obtener_todas_degustaciones(
-                db=g.db, skip=skip, limit=limit
+                db=g.db, skip=skip, limit=limit, cursor=cursor
             )
-        degustaciones_dict = []
-        for degustacion in degustaciones:
-            deg_final = degustacion.to_dict()
-            # Comprueba si existe el usuario y añade su nombre
-            usuario = UsuarioServicio.get_usuario_by_id(db=g.db, user_id=degustacion.usuario_id)
-            if not usuario:
-                return jsonify({"error": "El id del usuario proporcionado no existe"}), 404
-            # Comprueba si existe la cerveza y añade su nombre
-            cerveza = CervezaService.get_cerveza_por_id(db=g.db, cerveza_id=degustacion.cerveza_id)
-            if not cerveza:
-                return jsonify({"error": "El id de la cerveza proporcionada no existe"}), 404
-            # Añade el nombre de usuario y de la cerveza para mayor simplicidad
-            deg_final["nombre_usuario"] = usuario.username
-            deg_final["nombre_cerveza"] = cerveza.nombre
-            degustaciones_dict.append(deg_final)
+        # to_dict() ya incluye nombre_usuario y nombre_cerveza, precargados
+        # por el servicio (perfiles_carga) sin consultas por fila
+        degustaciones_dict = [degustacion.to_dict() for degustacion in degustaciones]
         # Devuelve el array de degustaciones
+        if cursor is not None:
+            return jsonify(_pagina_con_cursor(degustaciones, degustaciones_dict, limit)), 200
         return jsonify(degustaciones_dict), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @degustacion_bp.route("/degustaciones/<int:degustacion_id>/", methods=["GET"])
+@http_condicional.condicional(_validador_degustacion)
 def obtener_degustacion_por_id(degustacion_id: int):
     """
     Obtiene una degustación por su ID
@@ -147,13 +167,18 @@ def obtener_actividad_amigos(usuario_id: int):
     try:
         skip = request.args.get('skip', 0, type=int)
         limit = request.args.get('limit', 50, type=int)
+        cursor = request.args.get('cursor')
         
         degustaciones = degustacion_servicio.obtener_actividad_amigos(
-            db=g.db, usuario_id=usuario_id, skip=skip, limit=limit
+            db=g.db, usuario_id=usuario_id, skip=skip, limit=limit, cursor=cursor
         )
         
         degustaciones_dict = [degustacion.to_dict() for degustacion in degustaciones]
+        if cursor is not None:
+            return jsonify(_pagina_con_cursor(degustaciones, degustaciones_dict, limit)), 200
         return jsonify(degustaciones_dict), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -180,6 +205,7 @@ def agregar_comentario_degustacion(degustacion_id: int):
         abort(500, description=str(e))
 
 @degustacion_bp.route("/degustaciones/<int:degustacion_id>/comentarios/", methods=["GET"])
+@http_condicional.condicional()
 def obtener_comentarios_degustacion(degustacion_id: int):
     """
     Obtiene todos los comentarios de una degustación
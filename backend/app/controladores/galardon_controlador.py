@@ -1,10 +1,13 @@
 from flask import Blueprint, jsonify, request, abort, g
 from sqlalchemy.orm import Session
 from typing import List
-from app.servicios import galardon_servicio
+from app import cache, http_condicional
+from app.servicios import galardon_servicio, tokens
 
 # Blueprint para las rutas de galardones
 galardon_bp = Blueprint('galardon_bp', __name__)
+# Verifica el token de acceso de la petición, si trae uno (ver servicios/tokens)
+galardon_bp.before_request(tokens.cargar_token)
 
 @galardon_bp.route("/galardones/", methods=["POST"])
 def crear_nuevo_galardon():
@@ -30,6 +33,8 @@ def crear_nuevo_galardon():
         return jsonify({"error": str(e)}), 500
 
 @galardon_bp.route("/galardones/", methods=["GET"])
+@http_condicional.condicional()
+@cache.cacheada(galardon_servicio.CACHE_GALARDONES)
 def leer_galardones():
     """
     Obtiene una lista de todos los tipos de galardones
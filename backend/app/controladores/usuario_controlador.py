@@ -1,11 +1,25 @@
 from flask import Blueprint, jsonify, request, abort, g
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List
 from ..servicios.usuario_servicio import UsuarioServicio
+from ..servicios import autocompletado, hash_contrasenas, tokens
+from ..objetos.usuario import UsuarioDB
 
 # --- Inicialización ---
 
 usuario_bp = Blueprint('usuario_bp', __name__)
+# Verifica el token de acceso de la petición, si trae uno (ver servicios/tokens)
+usuario_bp.before_request(tokens.cargar_token)
+
+# Segundos que se pide esperar al cliente cuando el pool de bcrypt está lleno
+REINTENTAR_TRAS_SEGUNDOS = 1
+
+def _demasiadas_peticiones(error):
+    """429 con Retry-After cuando no hay sitio en el pool de hash de contraseñas."""
+    respuesta = jsonify({"error": str(error)})
+    respuesta.headers["Retry-After"] = str(REINTENTAR_TRAS_SEGUNDOS)
+    return respuesta, 429
 
 # --- HTTP Endpoints ---
 
@@ -46,6 +60,8 @@ def create_new_user():
 
         return jsonify(db_user.to_dict()), 201
         
+    except hash_contrasenas.HashSaturado as e:
+        return _demasiadas_peticiones(e)
     except Exception as e:
         return jsonify({
             "error": f"Error interno del servidor: {e}"
@@ -56,20 +72,47 @@ def create_new_user():
 @usuario_bp.route("/usuarios/", methods=["GET"])
 def get_all_users():
     """
-    Obtener lista de todos los usuarios
+    Obtener lista de todos los usuarios.
+    Por defecto devuelve el resumen de cada usuario; admite
+    ?nivel=resumen|perfil|completo o ?fields=id,username,friends
     """
     try:
+        campos = UsuarioDB.resolver_campos(
+            nivel=request.args.get('nivel', 'resumen'),
+            fields=request.args.get('fields')
+        )
         # Llama la función que obtiene todos los usuarios
-        usersDB = UsuarioServicio.get_all_usuarios(db=g.db)
-        usuarios_response = [usuario.to_dict() for usuario in usersDB]    
+        usersDB = UsuarioServicio.get_all_usuarios(db=g.db, campos=campos)
+        usuarios_response = [usuario.to_dict(campos=campos) for usuario in usersDB]    
         return jsonify(usuarios_response), 200
         
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({
             "error": f"Error interno del servidor: {e}"
         }), 500
 
 
+# Autocompletado de nombres de usuario
+@usuario_bp.route("/usuarios/autocomplete/", methods=["GET"])
+def autocomplete_users():
+    """
+    Autocompletado de nombres de usuario (p. ej. al buscar amigos).
+    Devuelve hasta 'limite' (10 por defecto) coincidencias por prefijo de
+    'q' desde el índice en memoria, sin consultar la base de datos.
+    """
+    q = request.args.get('q', '')
+    limite = request.args.get('limite', default=autocompletado.LIMITE_POR_DEFECTO, type=int)
+    if limite is None or not 0 < limite <= autocompletado.LIMITE_MAXIMO:
+        return jsonify({"error": f"'limite' debe estar entre 1 y {autocompletado.LIMITE_MAXIMO}."}), 400
+    try:
+        coincidencias = autocompletado.autocompletar(g.db, "usuarios", q, limite)
+        return jsonify([{"id": id_fila, "username": texto} for id_fila, texto in coincidencias]), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 # 3. GET - Obtener un usuario específico por ID
 @usuario_bp.route("/usuarios/<int:user_id>/", methods=["GET"])
 def get_user_by_id(user_id: int):
@@ -92,7 +135,7 @@ def get_user_by_id(user_id: int):
             "birth_date": db_user.birth_date.isoformat() if db_user.birth_date else None,
             "password": "",
             "created_at": db_user.created_at.isoformat() if db_user.created_at else None,
-            "friends": [friend.id for friend in db_user.friends] if hasattr(db_user, 'friends') else []
+            "friends": UsuarioServicio.obtener_ids_amigos(g.db, db_user.id)
         }
         
         return jsonify(usuario_response), 200
@@ -129,7 +172,7 @@ def update_user_by_id(user_id: int):
             "email": db_user.email,
             "birth_date": db_user.birth_date.isoformat() if db_user.birth_date else None,
             "password": "",
-            "friends": [friend.id for friend in db_user.friends] if hasattr(db_user, 'friends') else []
+            "friends": UsuarioServicio.obtener_ids_amigos(g.db, db_user.id)
         }
         
         return jsonify(usuario_response), 200
@@ -255,7 +298,7 @@ def get_friend_info(user_id: int, friend_id: int):
             }), 404
         
         # Comprueba si realmente son amigos
-        is_friend = any(f.id == friend_id for f in db_user.friends)
+        is_friend = UsuarioServicio.son_amigos(g.db, user_id, friend_id)
         
         if not is_friend:
             return jsonify({
@@ -269,7 +312,7 @@ def get_friend_info(user_id: int, friend_id: int):
             "email": db_friend.email,
             "birth_date": db_friend.birth_date.isoformat() if db_friend.birth_date else None,
             "password": "",
-            "friends": [friend.id for friend in db_friend.friends] if hasattr(db_friend, 'friends') else []
+            "friends": UsuarioServicio.obtener_ids_amigos(g.db, db_friend.id)
         }
         
         return jsonify(friend_response), 200
@@ -280,6 +323,42 @@ def get_friend_info(user_id: int, friend_id: int):
         }), 500
 
 
+# GET - Número de amigos del usuario
+@usuario_bp.route("/usuarios/<int:user_id>/amigos/total/", methods=["GET"])
+def count_user_friends(user_id: int):
+    """
+    Número de amigos del usuario, sin cargar la lista
+    """
+    try:
+        if UsuarioServicio.get_usuario_by_id(db=g.db, user_id=user_id) is None:
+            return jsonify({"error": f"Usuario con ID {user_id} no encontrado."}), 404
+        return jsonify({"total": UsuarioServicio.contar_amigos(g.db, user_id)}), 200
+        
+    except Exception as e:
+        return jsonify({
+            "error": f"Error interno del servidor: {str(e)}"
+        }), 500
+
+
+# GET - Amigos en común de dos usuarios
+@usuario_bp.route("/usuarios/<int:user_id>/amigos/comunes/<int:other_id>/", methods=["GET"])
+def get_mutual_friends(user_id: int, other_id: int):
+    """
+    Ids de los amigos que tienen en común user_id y other_id
+    """
+    try:
+        for id_usuario in (user_id, other_id):
+            if UsuarioServicio.get_usuario_by_id(db=g.db, user_id=id_usuario) is None:
+                return jsonify({"error": f"Usuario con ID {id_usuario} no encontrado."}), 404
+        comunes = UsuarioServicio.amigos_en_comun(g.db, user_id, other_id)
+        return jsonify({"friends": comunes, "total": len(comunes)}), 200
+        
+    except Exception as e:
+        return jsonify({
+            "error": f"Error interno del servidor: {str(e)}"
+        }), 500
+
+
 # 9. DELETE - Eliminar amigo de usuario
 @usuario_bp.route("/usuarios/<int:user_id>/amigos/<int:friend_id>/", methods=["DELETE"])
 def remove_friend(user_id: int, friend_id: int):
@@ -332,8 +411,8 @@ def login():
         if not usuario:
             return jsonify({"error": "El usuario indicado no existe"}), 401
         
-        # Comprueba si la contraseña coincide
-        if not (UsuarioServicio.verify_password(password, usuario.password_hash)):
+        # Comprueba si la contraseña coincide (y rehashea si cambió el coste)
+        if not UsuarioServicio.autenticar(g.db, usuario, password):
             return jsonify({"error": "Contraseña incorrecta"}), 401
                 
         # Preparar respuesta
@@ -342,12 +421,67 @@ def login():
             "username": usuario.username,
             "email": usuario.email,
             "birth_date": usuario.birth_date.isoformat() if usuario.birth_date else None,
-            "friends": [friend.id for friend in usuario.friends] 
-                if hasattr(usuario, 'friends') else []
+            "friends": UsuarioServicio.obtener_ids_amigos(g.db, usuario.id)
         }
+        # Token de acceso firmado (y de refresco) para las rutas con sesión
+        response_data.update(tokens.emitir(usuario.id, usuario.username))
         
         return jsonify(response_data), 200
         
+    except hash_contrasenas.HashSaturado as e:
+        return _demasiadas_peticiones(e)
+    except Exception as e:
+        return jsonify({"error": f"Error interno del servidor: {str(e)}"}), 500
+
+@usuario_bp.route("/usuarios/token/refrescar/", methods=["POST"])
+def refresh_token():
+    """
+    Cambia un refresh_token válido por un par de tokens nuevo.
+    El refresh_token usado queda revocado (solo vale una vez, también
+    entre workers y con peticiones simultáneas: ver tokens.consumir).
+    El uso se confirma antes de emitir el par nuevo: si el commit falla,
+    el cliente no recibe tokens y el refresco sigue sin gastar.
+    """
+    data = request.json
+    if not data or 'refresh_token' not in data:
+        return jsonify({"error": "El campo 'refresh_token' es obligatorio"}), 400
+
+    try:
+        datos = tokens.verificar(data['refresh_token'], "refresco")
+        tokens.consumir(g.db, datos)
+        try:
+            g.db.commit()
+        except IntegrityError:
+            # Otra transacción ha gastado el mismo refresco y ha confirmado antes
+            g.db.rollback()
+            raise tokens.TokenInvalido("El token ha sido revocado.")
+        return jsonify(tokens.emitir(datos["sub"], datos["usr"])), 200
+
+    except tokens.TokenInvalido as e:
+        return jsonify({"error": str(e)}), 401
+    except Exception as e:
+        return jsonify({"error": f"Error interno del servidor: {str(e)}"}), 500
+
+@usuario_bp.route("/usuarios/logout/", methods=["POST"])
+@tokens.requiere_token
+def logout():
+    """
+    Cierra la sesión: revoca el token de acceso de la petición y, si se
+    envía en el cuerpo, también el refresh_token.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        tokens.revocar(g.db, g.token)
+        if data.get('refresh_token'):
+            try:
+                refresco = tokens.verificar(data['refresh_token'], "refresco")
+            except tokens.TokenInvalido:
+                refresco = None # Ya no vale: no hace falta revocarlo
+            if refresco is not None and refresco["sub"] == g.token["sub"]:
+                tokens.revocar(g.db, refresco)
+
+        return jsonify({"message": "Sesión cerrada correctamente."}), 200
+
     except Exception as e:
         return jsonify({"error": f"Error interno del servidor: {str(e)}"}), 500
 
@@ -355,8 +489,12 @@ def login():
 @usuario_bp.route("/usuarios/<int:user_id>/actividad/", methods=["GET"])
 def get_user_activity(user_id: int):
     """
-    Obtener actividad reciente (degustaciones) de los amigos del usuario
+    Obtener actividad reciente (degustaciones) de los amigos del usuario.
+    ?limit= entre 1 y 50 (5 por defecto)
     """
+    limit = request.args.get('limit', default=5, type=int)
+    if limit is None or not 0 < limit <= 50:
+        return jsonify({"error": "'limit' debe estar entre 1 y 50."}), 400
     try:
         # Verificar que el usuario existe
         user = UsuarioServicio.get_usuario_by_id(g.db, user_id)
@@ -364,7 +502,7 @@ def get_user_activity(user_id: int):
              return jsonify({"error": f"Usuario {user_id} no encontrado"}), 404
 
         # Llamar al servicio
-        recent_tastings = UsuarioServicio.get_recent_friends_activity(g.db, user_id, limit=5)
+        recent_tastings = UsuarioServicio.get_recent_friends_activity(g.db, user_id, limit=limit)
         
         # Formatear respuesta
         response = []
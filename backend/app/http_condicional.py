@@ -0,0 +1,97 @@
+"""
+Peticiones HTTP condicionales (ETag / Last-Modified) para las rutas GET.
+
+El decorador condicional() añade a las respuestas 200 un ETag fuerte y
+responde 304 Not Modified (sin cuerpo) cuando el cliente envía
+If-None-Match con ese ETag, o If-Modified-Since con una fecha igual o
+posterior a Last-Modified. Hay dos formas de calcular el ETag:
+
+  - Con 'validador': una función (db, **argumentos de la ruta) que hace
+    una consulta barata (p. ej. la columna 'version' de la fila) y
+    devuelve (token, última modificación), o None si la fila no existe.
+    La fecha es opcional y solo debe darse si cambia con todo lo que cubre
+    el token (si el token incluye datos de otras tablas, None): si no, un
+    If-Modified-Since respondería 304 con datos viejos. El 304 se decide
+    antes de ejecutar la vista: ni consulta principal ni serialización.
+  - Sin validador: hash del cuerpo de la respuesta. Se ejecuta la vista,
+    pero el 304 ahorra enviar el cuerpo (p. ej. a la app móvil).
+
+Las respuestas llevan Cache-Control: no-cache: el cliente puede guardarlas
+pero debe revalidarlas en cada uso.
+"""
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, g, request
+from sqlalchemy import select
+from werkzeug.http import is_resource_modified
+
+# Súbelo si cambia el formato de las respuestas (p. ej. un to_dict() con
+# campos nuevos), para que los ETag de filas sin cambios dejen de valer
+VERSION_REPRESENTACION = "1"
+
+
+def etag_de(*partes) -> str:
+    """ETag (sin comillas) a partir de los valores que determinan la respuesta."""
+    texto = "\x1f".join(str(parte) for parte in (VERSION_REPRESENTACION, request.path) + partes)
+    return hashlib.sha1(texto.encode("utf-8")).hexdigest()
+
+
+def version_de_fila(modelo, parametro: str):
+    """
+    Validador para rutas de detalle de 'modelo' (con columna 'version'):
+    lee solo la versión de la fila cuyo id llega en el argumento 'parametro'.
+    """
+    def validador(db, **argumentos):
+        version = db.execute(select(modelo.version)
+            .where(modelo.id == argumentos[parametro])).scalar()
+        if version is None:
+            return None
+        return etag_de(version), None
+    return validador
+
+
+def _utc(fecha: datetime):
+    if fecha is None:
+        return None
+    # Las columnas TIMESTAMP de SQLite vuelven sin zona: son UTC (CURRENT_TIMESTAMP)
+    return fecha.replace(tzinfo=timezone.utc, microsecond=0) if fecha.tzinfo is None \
+        else fecha.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def _con_validadores(respuesta, etag: str, modificado: datetime = None):
+    respuesta.set_etag(etag)
+    if modificado is not None:
+        respuesta.last_modified = modificado
+    respuesta.cache_control.no_cache = True
+    return respuesta
+
+
+def condicional(validador=None):
+    """
+    Decorador para rutas GET que añade ETag/Last-Modified y responde 304
+    cuando el cliente ya tiene la versión actual (ver el docstring del módulo).
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltorio(*args, **kwargs):
+            if validador is not None:
+                resultado = validador(g.db, **kwargs)
+                if resultado is None:
+                    # La fila no existe: la vista responde (404)
+                    return vista(*args, **kwargs)
+                etag, modificado = resultado[0], _utc(resultado[1])
+                if not is_resource_modified(request.environ, etag=etag, last_modified=modificado):
+                    return _con_validadores(current_app.response_class(status=304), etag, modificado)
+                respuesta = current_app.make_response(vista(*args, **kwargs))
+                if respuesta.status_code == 200:
+                    _con_validadores(respuesta, etag, modificado)
+                return respuesta
+
+            respuesta = current_app.make_response(vista(*args, **kwargs))
+            if respuesta.status_code == 200:
+                _con_validadores(respuesta, hashlib.sha1(respuesta.get_data()).hexdigest())
+                respuesta.make_conditional(request)
+            return respuesta
+        return envoltorio
+    return decorador
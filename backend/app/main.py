@@ -1,50 +1,315 @@
-from flask import Flask, jsonify, g 
+import os
+import time
+import click
+from flask import Flask, jsonify, g, request, current_app, has_request_context
 from flask_cors import CORS
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.local import LocalProxy
 
+from app import base_datos
 from app.base_datos import SessionLocal, init_db
 from app.controladores.cerveza_controlador import cerveza_bp
 from app.controladores.galardon_controlador import galardon_bp
 from app.controladores.usuario_controlador import usuario_bp
 from app.controladores.degustacion_controlador import degustacion_bp
 from app.controladores.cerveceria_controlador import cerveceria_bp
+from app.controladores.admin_controlador import admin_bp
+from app.servicios import trabajos
 
-# --- Configuración de la App ---
-app = Flask(__name__)
-CORS(app)
+# --- Réplica de lectura ---
+# Blueprints cuyas peticiones GET pueden leer de la réplica
+BLUEPRINTS_REPLICA = {cerveza_bp.name, cerveceria_bp.name, degustacion_bp.name, galardon_bp.name}
+# Tras una escritura, el cliente lee de la primaria durante este tiempo
+# para ver sus propios cambios aunque la réplica vaya con retraso
+SEGUNDOS_LECTURA_PRIMARIA = float(os.getenv("REPLICA_LECTURA_PRIMARIA_SEGUNDOS", "5"))
+COOKIE_LECTURA_PRIMARIA = "lectura_primaria_hasta"
+METODOS_ESCRITURA = {"POST", "PUT", "PATCH", "DELETE"}
+
+def puede_leer_de_replica() -> bool:
+    """
+    Indica si la petición actual puede leerse de la réplica: GET de un
+    blueprint de BLUEPRINTS_REPLICA, sin escrituras recientes del cliente
+    y que no vaya a guardarse en la caché de respuestas (ver app/cache).
+    """
+    if request.method != "GET" or request.blueprint not in BLUEPRINTS_REPLICA:
+        return False
+    if g.get("cache_leer_de_primaria"):
+        return False
+    try:
+        hasta = float(request.cookies.get(COOKIE_LECTURA_PRIMARIA, 0))
+    except ValueError:
+        hasta = 0
+    return time.time() >= hasta
+
+def abrir_sesion_peticion():
+    """
+    Abre la sesión de BD de la petición la primera vez que se usa g.db
+    y devuelve siempre la misma durante el resto de la petición.
+    """
+    db = g.get("_db_sesion")
+    if db is None:
+        # La sesión enruta sus lecturas a la réplica (si la hay) solo cuando se permite
+        db = SessionLocal(info={"replica": puede_leer_de_replica()})
+        g._db_sesion = db
+        g.bd_sesiones_abiertas = g.get("bd_sesiones_abiertas", 0) + 1
+    return db
 
-@app.before_request
 def get_db_session():
     """
     Se ejecuta ANTES de cada petición.
-    Crea una sesión de BD única para esta petición y la guarda en 'g'.
-    'g' es un objeto temporal de Flask.
+    Deja en 'g.db' un proxy perezoso: la sesión de BD solo se crea si el
+    endpoint la usa, así "/" o las peticiones OPTIONS de CORS no abren
+    ninguna. 'g' es un objeto temporal de Flask.
+    """
+    g.db = LocalProxy(abrir_sesion_peticion)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def contar_sentencia(conn, cursor, statement, parameters, context, executemany):
+    """Cuenta las sentencias SQL que ejecuta la petición en curso."""
+    if has_request_context():
+        g.bd_sentencias = g.get("bd_sentencias", 0) + 1
+
+def marcar_lectura_primaria(response):
+    """
+    Se ejecuta DESPUÉS de cada petición con respuesta.
+    Tras una escritura correcta, fija la cookie que hace que las lecturas
+    del cliente vayan a la primaria durante SEGUNDOS_LECTURA_PRIMARIA.
+    """
+    if request.method in METODOS_ESCRITURA and response.status_code < 400:
+        hasta = time.time() + SEGUNDOS_LECTURA_PRIMARIA
+        response.set_cookie(COOKIE_LECTURA_PRIMARIA, f"{hasta:.3f}",
+            max_age=int(SEGUNDOS_LECTURA_PRIMARIA) + 1, httponly=True, samesite="Lax")
+    return response
+
+def registrar_estado_respuesta(response):
     """
-    g.db = SessionLocal() # Llama a la "fábrica" para crear una sesión
+    Guarda el código de la respuesta para que el cierre de la sesión sepa
+    si confirmar o deshacer y, en modo debug, añade las cabeceras con
+    las sesiones abiertas y las sentencias SQL de la petición.
+    """
+    g.estado_respuesta = response.status_code
+    if current_app.debug:
+        response.headers["X-BD-Sesiones"] = str(g.get("bd_sesiones_abiertas", 0))
+        response.headers["X-BD-Sentencias"] = str(g.get("bd_sentencias", 0))
+    return response
 
-@app.teardown_request
 def close_db_session(exception=None):
     """
     Se ejecuta DESPUÉS de cada petición, incluso si hay un error.
-    Cierra la sesión de la BD para liberar la conexión.
+    Si la petición llegó a abrir sesión: confirma lo pendiente si todo fue
+    bien (sin excepción y respuesta < 400), deshace si no, y la cierra
+    para liberar la conexión.
     """
-    db = g.pop('db', None) # Saca la sesión de 'g'
-    if db is not None:
+    g.pop('db', None)
+    db = g.pop('_db_sesion', None) # Saca la sesión de 'g' (None si no se abrió)
+    if db is None:
+        return
+    try:
+        if exception is None and g.get("estado_respuesta", 500) < 400:
+            db.commit()
+        else:
+            db.rollback()
+    finally:
         db.close() # Cierra la sesión (¡muy importante!)
 
-# --- Registro del Blueprint ---
-# Le decimos a la app que use todas las rutas de los controladores
-# y que todas ellas empiecen por "/api"
-app.register_blueprint(cerveza_bp, url_prefix='/api')
-app.register_blueprint(galardon_bp, url_prefix='/api')
-app.register_blueprint(usuario_bp, url_prefix='/api')
-app.register_blueprint(degustacion_bp, url_prefix='/api')
-app.register_blueprint(cerveceria_bp, url_prefix='/api')
-
 # --- Ruta de prueba (la que tenías) ---
-@app.route("/")
 def home():
     return jsonify(message="Hello from Python backend!")
 
+# --- Comandos de mantenimiento (flask --app app.main <comando>) ---
+@click.command("init-db")
+def init_db_command():
+    """
+    Crea las tablas, columnas e índices que falten. En producción se
+    ejecuta una sola vez antes de arrancar los workers.
+    """
+    init_db()
+
+@click.command("reconciliar-valoraciones")
+def reconciliar_valoraciones():
+    """
+    Reconstruye en bloque la suma, total y promedio de valoraciones
+    de todas las cervezas a partir de sus degustaciones.
+    """
+    from app.servicios.cerveza_servicio import CervezaService
+    db = SessionLocal()
+    try:
+        actualizadas = CervezaService.reconciliar_valoraciones(db)
+        print(f"Valoraciones reconciliadas en {actualizadas} cervezas.")
+    finally:
+        db.close()
+
+@click.command("simetrizar-amistades")
+def simetrizar_amistades():
+    """
+    Añade la fila inversa a las amistades guardadas en un solo sentido
+    en user_friends (datos anteriores a guardarlas siempre por pares).
+    """
+    from app.servicios.usuario_servicio import UsuarioServicio
+    db = SessionLocal()
+    try:
+        anadidas = UsuarioServicio.simetrizar_amistades(db)
+        print(f"Filas inversas añadidas en user_friends: {anadidas}.")
+    finally:
+        db.close()
+
+@click.command("reconstruir-actividad")
+def reconstruir_actividad():
+    """
+    Rehace el feed de actividad de amigos (tabla actividad_amigos) a
+    partir de las amistades y degustaciones existentes.
+    """
+    from app.servicios import actividad_servicio
+    db = SessionLocal()
+    try:
+        escritas = actividad_servicio.reconstruir(db)
+        print(f"Feed de actividad reconstruido: {escritas} entradas.")
+    finally:
+        db.close()
+
+@click.command("ejecutar-trabajos")
+@click.option("--continuo", is_flag=True,
+    help="Sigue esperando trabajos nuevos en vez de salir al vaciar la cola.")
+def ejecutar_trabajos(continuo):
+    """
+    Ejecuta los trabajos en segundo plano pendientes (ver
+    servicios/trabajos). Con TRABAJOS_HILO=0 hace de worker aparte.
+    """
+    from app.servicios import trabajos
+    while True:
+        db = SessionLocal()
+        try:
+            ejecutados = trabajos.ejecutar_pendientes(db)
+        finally:
+            db.close()
+        if ejecutados:
+            print(f"Trabajos ejecutados: {ejecutados}.")
+        if not continuo:
+            break
+        if not ejecutados:
+            time.sleep(trabajos.SONDEO_SEGUNDOS)
+
+@click.command("recalcular-galardones")
+@click.option("--desde-usuario", type=int, default=0,
+    help="Primer id de usuario; para seguir un recálculo interrumpido.")
+@click.option("--galardon", "galardon_ids", type=int, multiple=True,
+    help="Solo este galardón (se puede repetir). Por defecto, todos.")
+@click.option("--lote", type=int, default=None,
+    help="Usuarios por transacción (GALARDONES_USUARIOS_POR_LOTE).")
+def recalcular_galardones(desde_usuario, galardon_ids, lote):
+    """
+    Recalcula los contadores y el progreso de galardones de todos los
+    usuarios a partir de sus degustaciones, por lotes de usuarios con un
+    commit por lote. Los niveles ya obtenidos no bajan.
+    """
+    from app.servicios import reglas_galardones
+    totales = {"usuarios": 0, "degustaciones": 0, "galardones": 0, "segundos": 0.0}
+    db = SessionLocal()
+    try:
+        siguiente = desde_usuario
+        while siguiente is not None:
+            inicio = time.monotonic()
+            resultado = reglas_galardones.recalcular_lote(db, siguiente, list(galardon_ids) or None, lote)
+            db.commit()
+            totales["segundos"] += time.monotonic() - inicio
+            for clave in ("usuarios", "degustaciones", "galardones"):
+                totales[clave] += resultado[clave]
+            siguiente = resultado["siguiente"]
+            if siguiente is not None:
+                print(f"{reglas_galardones.resumen_recalculo(totales)}; sigue en --desde-usuario {siguiente}")
+        print(f"Galardones recalculados: {reglas_galardones.resumen_recalculo(totales)}")
+    finally:
+        db.close()
+
+@click.command("exportar-esquema")
+@click.option("--comprobar", is_flag=True,
+    help="No escribe nada; falla si algún script no coincide con los modelos.")
+def exportar_esquema(comprobar):
+    """
+    Regenera los scripts de init_beersp/ (MySQL y PostgreSQL) a partir
+    de los modelos, conservando sus datos de ejemplo.
+    """
+    from app.base_datos import SCRIPTS_ESQUEMA, componer_script_esquema
+    desactualizados = []
+    for dialecto, ruta in SCRIPTS_ESQUEMA.items():
+        actual = open(ruta, encoding="utf-8").read() if os.path.exists(ruta) else ""
+        nuevo = componer_script_esquema(dialecto, actual)
+        if nuevo == actual:
+            continue
+        desactualizados.append(ruta)
+        if not comprobar:
+            with open(ruta, "w", encoding="utf-8") as fichero:
+                fichero.write(nuevo)
+            print(f"Esquema {dialecto} escrito en {ruta}")
+    if comprobar and desactualizados:
+        raise click.ClickException("Esquema desactualizado en: " + ", ".join(desactualizados))
+
+@click.command("sincronizar-replica")
+@click.option("--intervalo", type=float, default=0,
+    help="Segundos entre copias; 0 = copiar una sola vez.")
+def sincronizar_replica(intervalo):
+    """
+    Copia la BD primaria sobre la réplica cuando ambas son ficheros
+    SQLite (desarrollo y pruebas).
+    """
+    from app.base_datos import sincronizar_replica_sqlite
+    while True:
+        sincronizar_replica_sqlite()
+        print("Réplica sincronizada.")
+        if intervalo <= 0:
+            break
+        time.sleep(intervalo)
+
+# --- Fábrica de la App ---
+def create_app() -> Flask:
+    """
+    Crea y configura la aplicación Flask.
+    La usan el servidor de desarrollo (python -m app.main) y los
+    servidores de producción: gunicorn -c gunicorn.conf.py "app.main:create_app()"
+    """
+    app = Flask(__name__)
+    CORS(app)
+
+    # El engine se crea aquí y no al importar base_datos (las pruebas lo
+    # apuntan antes a otra base de datos, ver tests/bd_memoria.py)
+    if base_datos.engine is None:
+        base_datos.configurar_engine()
+
+    # Sesión de BD perezosa por petición
+    app.before_request(get_db_session)
+    app.after_request(marcar_lectura_primaria)
+    app.after_request(registrar_estado_respuesta)
+    app.teardown_request(close_db_session)
+    # Hilo de trabajos en segundo plano: lo arranca la primera petición
+    # de cada proceso (tras el fork de gunicorn, no en el master)
+    app.before_request(trabajos.iniciar_hilo)
+
+    # --- Registro del Blueprint ---
+    # Le decimos a la app que use todas las rutas de los controladores
+    # y que todas ellas empiecen por "/api"
+    app.register_blueprint(cerveza_bp, url_prefix='/api')
+    app.register_blueprint(galardon_bp, url_prefix='/api')
+    app.register_blueprint(usuario_bp, url_prefix='/api')
+    app.register_blueprint(degustacion_bp, url_prefix='/api')
+    app.register_blueprint(cerveceria_bp, url_prefix='/api')
+    app.register_blueprint(admin_bp, url_prefix='/api')
+
+    app.add_url_rule("/", view_func=home)
+
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(reconciliar_valoraciones)
+    app.cli.add_command(simetrizar_amistades)
+    app.cli.add_command(reconstruir_actividad)
+    app.cli.add_command(ejecutar_trabajos)
+    app.cli.add_command(recalcular_galardones)
+    app.cli.add_command(exportar_esquema)
+    app.cli.add_command(sincronizar_replica)
+    return app
+
+# Instancia por defecto (python -m app.main y flask --app app.main)
+app = create_app()
+
 # --- Arranque de la aplicación ---
 if __name__ == "__main__":
     
@@ -81,4 +346,6 @@ if __name__ == "__main__":
     print(f"GET    http://localhost:8000/api/degustaciones/<id>/")
     print("...")
     
-    app.run(host="0.0.0.0", port=8000, debug=True) # Añadido debug=True
+    # Servidor de desarrollo de Werkzeug (un proceso, depurador activo).
+    # Para producción usar gunicorn (ver gunicorn.conf.py)
+    app.run(host="0.0.0.0", port=int(os.getenv("PORT", "8000")), debug=True) # Añadido debug=True
@@ -0,0 +1,26 @@
+from sqlalchemy import TIMESTAMP, Column, ForeignKey, Index, Integer
+from app.base_datos import Base
+
+class ActividadAmigoDB(Base):
+    """
+    Entrada del feed de actividad de amigos (RF-3.8) ya calculado: la
+    degustación 'degustacion_id' de 'autor_id' aparece en el feed de
+    'usuario_id'. Se escribe una fila por amigo al crear la degustación
+    (ver servicios/actividad_servicio), así que leer el feed de un usuario
+    es un rango de ix_actividad_usuario_fecha sin mirar sus amistades.
+    """
+    __tablename__ = "actividad_amigos" # Nombre de la tabla
+    __table_args__ = (
+        # Lectura del feed: WHERE usuario_id = ? ORDER BY fecha_creacion DESC, degustacion_id DESC
+        Index("ix_actividad_usuario_fecha", "usuario_id", "fecha_creacion", "degustacion_id"),
+        # Al dejar de ser amigos se quitan las entradas de ese autor
+        Index("ix_actividad_usuario_autor", "usuario_id", "autor_id"),
+    )
+
+    # Usuario que ve la actividad en su feed
+    usuario_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    degustacion_id = Column(Integer, ForeignKey("degustaciones.id"), primary_key=True, index=True)
+    # Amigo que hizo la degustación
+    autor_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Copia de degustaciones.fecha_creacion, para ordenar sin leer la degustación
+    fecha_creacion = Column(TIMESTAMP, nullable=False)
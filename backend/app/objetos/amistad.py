@@ -1,7 +1,7 @@
 # Entidad que modela amistad entre usuarios 
 from dataclasses import dataclass
 from sqlalchemy.orm import relationship
-from sqlalchemy import TIMESTAMP, Boolean, Column, Integer, ForeignKey, text
+from sqlalchemy import TIMESTAMP, Boolean, Column, Index, Integer, ForeignKey, text
 from app.base_datos import Base
 
 @dataclass
@@ -26,6 +26,11 @@ class FriendDB:
     
 class FriendRequestDB(Base):
     __tablename__ = "friend_requests" # Nombre de la tabla
+    # La clave primaria (user_id, friend_id) resuelve las solicitudes
+    # enviadas; este índice, las recibidas (friend_id = receptor)
+    __table_args__ = (
+        Index("ix_friend_requests_friend_user", "friend_id", "user_id"),
+    )
     # user_id BIGINT
     user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
     # friend_id BIGINT
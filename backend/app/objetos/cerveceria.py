@@ -1,6 +1,6 @@
 # Entidad de cervecería con sus campos
-from sqlalchemy import Column, Integer, String, Float
-from app.base_datos import Base
+from sqlalchemy import Column, Integer, String, Text, Float
+from app.base_datos import Base, columna_version
 from sqlalchemy.orm import relationship
 
 # Si vas a usar otro manejador de conexiones, cambiar la importación.
@@ -13,14 +13,22 @@ class Cerveceria(Base):
     __tablename__ = "cervecerias"
 
     id = Column(Integer, primary_key=True, index=True)
-    nombre = Column(String, unique=True, index=True, nullable=False)
-    direccion = Column(String, nullable=False)
-    ciudad = Column(String, index=True)
-    pais = Column(String, index=True)
-    descripcion = Column(String)
-    telefono = Column(String)
-    horario = Column(String)
-    foto = Column(String)
+    nombre = Column(String(150), unique=True, index=True, nullable=False)
+    direccion = Column(String(255), nullable=False)
+    ciudad = Column(String(100), index=True)
+    pais = Column(String(100), index=True)
+    descripcion = Column(Text)
+    telefono = Column(String(30))
+    horario = Column(String(255))
+    foto = Column(Text)
+
+    # Geolocalización (RNF-8). 'geohash' se calcula a partir de lat/lon
+    # (ver cerveceria_servicio) y su índice B-tree permite buscar por zona
+    lat = Column(Float, nullable=True)
+    lon = Column(Float, nullable=True)
+    geohash = Column(String(12), nullable=True, index=True)
+    # Sube con cada cambio (ETag del detalle)
+    version = columna_version()
 
     # Relaciones
     degustaciones = relationship("DegustacionDB",  back_populates="cerveceria",
@@ -44,4 +52,6 @@ class Cerveceria(Base):
             "telefono": self.telefono,
             "horario": self.horario,
             "foto": self.foto,
+            "lat": self.lat,
+            "lon": self.lon,
         }
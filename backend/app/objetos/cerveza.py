@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float
-from app.base_datos import Base
+from sqlalchemy import Column, Integer, String, Text, Float, text
+from app.base_datos import Base, columna_version
 from sqlalchemy.orm import relationship
 
 #Si vas a usar otro manejador de conexiones, cambiar la importación.
@@ -12,24 +12,29 @@ class Cerveza(Base):
     __tablename__ = "cervezas"
 
     id = Column(Integer, primary_key=True, index=True)
-    nombre = Column(String, unique=True, index=True, nullable=False)
-    descripcion = Column(String)
-    foto = Column(String)
-    estilo = Column(String, index=True)
-    pais_procedencia = Column(String, index=True)
-    tamano = Column(String)
-    formato = Column(String)
+    nombre = Column(String(150), unique=True, index=True, nullable=False)
+    descripcion = Column(Text)
+    foto = Column(Text)
+    estilo = Column(String(100), index=True)
+    pais_procedencia = Column(String(100), index=True)
+    tamano = Column(String(50))
+    formato = Column(String(50))
     porcentaje_alcohol = Column(Float)
     ibu = Column(Integer) # Amargor (%IBU)
-    color = Column(String)
+    color = Column(String(50))
+
+    # Agregados de valoración (RF-3.4), mantenidos en O(1) por
+    # degustacion_servicio en cada alta/edición/baja de una degustación
+    suma_valoraciones = Column(Float, nullable=False, default=0, server_default=text("0"))
+    total_valoraciones = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    valoracion_promedio = Column(Float, nullable=True)
+    # Sube con cada cambio, también de los agregados (ETag del detalle)
+    version = columna_version()
 
     # Relaciones
     degustaciones = relationship("DegustacionDB",  back_populates="cerveza",
         cascade="all, delete-orphan"
     )
-    
-    # Nota: 'valoracion_promedio' (RF-3.4) no es una columna
-    # sino un valor calculado en el servicio.
 
     def to_dict(self):
         """
@@ -47,5 +52,8 @@ class Cerveza(Base):
             "porcentaje_alcohol": self.porcentaje_alcohol,
             "ibu": self.ibu,
             "color": self.color,
+            "valoracion_promedio": round(self.valoracion_promedio, 2)
+                if self.valoracion_promedio is not None else 0.0,
+            "total_valoraciones": self.total_valoraciones or 0,
         }
 
@@ -1,8 +1,8 @@
 # Entidad de la calificación de una cerveza
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, TIMESTAMP, Float, func
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, TIMESTAMP, Float, Index, func
 from sqlalchemy.orm import relationship
-from app.base_datos import Base
+from app.base_datos import Base, columna_version
 
 class DegustacionDB(Base):
     """
@@ -10,6 +10,12 @@ class DegustacionDB(Base):
     RF-3.1, RF-3.3, RF-3.5, RF-3.8
     """
     __tablename__ = "degustaciones"
+    # Índices compuestos para la paginación por cursor (fecha_creacion, id)
+    __table_args__ = (
+        Index("ix_degustaciones_fecha_id", "fecha_creacion", "id"),
+        Index("ix_degustaciones_usuario_fecha_id", "usuario_id", "fecha_creacion", "id"),
+        Index("ix_degustaciones_cerveza_fecha_id", "cerveza_id", "fecha_creacion", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     usuario_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
@@ -19,6 +25,8 @@ class DegustacionDB(Base):
     comentario = Column(Text, nullable=True)
     fecha_creacion = Column(TIMESTAMP, server_default=func.now())
     fecha_actualizacion = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+    # Sube con cada cambio (ETag del detalle; fecha_actualizacion solo tiene segundos)
+    version = columna_version()
 
     # Relaciones
     usuario = relationship("UsuarioDB", back_populates="degustaciones")
@@ -70,5 +78,6 @@ class ComentarioDegustacion(Base):
             "usuario_id": self.usuario_id,
             "comentario": self.comentario,
             "fecha_creacion": self.fecha_creacion.isoformat() if self.fecha_creacion else None,
-            "usuario": self.usuario.to_dict() if self.usuario else None
+            # Solo el resumen del autor: no carga amigos, galardones ni degustaciones
+            "usuario": self.usuario.to_dict(nivel="resumen") if self.usuario else None
         }
\ No newline at end of file
@@ -67,3 +67,31 @@ class UsuarioGalardon(Base):
             "progreso_actual": self.progreso_actual,
             "obtenido_en": self.obtenido_en
         }
+
+class UsuarioContador(Base):
+    """
+    Contador de actividad de un usuario que evalúan los galardones
+    (degustaciones, cervezas distintas, países distintos...). Se mantiene
+    incremental en cada degustación o comentario (ver
+    servicios/reglas_galardones), así que evaluar un galardón no recorre
+    el historial del usuario.
+    """
+    __tablename__ = "usuario_contadores"
+
+    usuario_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    contador = Column(String(30), primary_key=True)
+    valor = Column(Integer, nullable=False, default=0)
+
+class UsuarioDistinto(Base):
+    """
+    Cuántas degustaciones tiene un usuario de cada valor de una dimensión
+    (una cerveza, un país, un estilo...). Sirve para saber en O(1) si una
+    degustación nueva suma un valor distinto (pasa de 0 a 1) o si al
+    borrarse lo quita (pasa de 1 a 0).
+    """
+    __tablename__ = "usuario_distintos"
+
+    usuario_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    dimension = Column(String(20), primary_key=True)
+    clave = Column(String(150), primary_key=True)
+    veces = Column(Integer, nullable=False, default=1)
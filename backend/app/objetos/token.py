@@ -0,0 +1,16 @@
+from sqlalchemy import TIMESTAMP, Column, String, text
+from app.base_datos import Base
+
+class TokenRevocadoDB(Base):
+    """
+    Token (de acceso o de refresco) revocado antes de caducar, por logout
+    o por rotación del refresco. Solo hace falta guardarlo hasta que
+    caduca; a partir de ahí la firma ya lo rechaza (ver servicios/tokens).
+    """
+    __tablename__ = "tokens_revocados" # Nombre de la tabla
+
+    # Identificador único del token (claim "jti")
+    jti = Column(String(36), primary_key=True)
+    # Momento en que el token caduca (UTC); después se puede borrar la fila
+    expira = Column(TIMESTAMP, nullable=False, index=True)
+    created_at = Column(TIMESTAMP, nullable=False, server_default=text("CURRENT_TIMESTAMP"))
@@ -0,0 +1,48 @@
+from sqlalchemy import JSON, TIMESTAMP, Column, Index, Integer, String, Text, text
+from app.base_datos import Base
+
+class TrabajoDB(Base):
+    """
+    Trabajo en segundo plano: un efecto secundario de una escritura
+    (evaluar galardones, difundir una degustación al feed...) que se
+    encola en la misma transacción y se ejecuta después de responder
+    (ver servicios/trabajos). Los que agotan sus intentos se quedan en
+    estado "fallido" para revisarlos en /api/admin/jobs/.
+    """
+    __tablename__ = "trabajos" # Nombre de la tabla
+    __table_args__ = (
+        # Siguiente trabajo a ejecutar: WHERE estado IN (...) AND ejecutar_en <= ? ORDER BY ejecutar_en
+        Index("ix_trabajos_estado_ejecutar", "estado", "ejecutar_en"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # Nombre de la tarea registrada con @trabajos.tarea
+    tipo = Column(String(50), nullable=False)
+    # Argumentos de la tarea
+    datos = Column(JSON, nullable=False)
+    # pendiente, en_curso, hecho o fallido
+    estado = Column(String(20), nullable=False, default="pendiente")
+    intentos = Column(Integer, nullable=False, default=0)
+    max_intentos = Column(Integer, nullable=False, default=5)
+    # Cuándo se puede (re)intentar (UTC). En curso: cuándo vence su plazo
+    ejecutar_en = Column(TIMESTAMP, nullable=False)
+    ultimo_error = Column(Text, nullable=True)
+    created_at = Column(TIMESTAMP, nullable=False, server_default=text("CURRENT_TIMESTAMP"))
+    terminado_en = Column(TIMESTAMP, nullable=True)
+
+    def to_dict(self):
+        """
+        Convierte el trabajo en un diccionario para la API.
+        """
+        return {
+            "id": self.id,
+            "tipo": self.tipo,
+            "datos": self.datos,
+            "estado": self.estado,
+            "intentos": self.intentos,
+            "max_intentos": self.max_intentos,
+            "ejecutar_en": self.ejecutar_en.isoformat() if self.ejecutar_en else None,
+            "ultimo_error": self.ultimo_error,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "terminado_en": self.terminado_en.isoformat() if self.terminado_en else None,
+        }
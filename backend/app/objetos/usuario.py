@@ -1,17 +1,23 @@
 from dataclasses import dataclass
 from uuid import UUID, uuid4
 from datetime import date
-from sqlalchemy import TIMESTAMP, Column, Date, ForeignKey, Integer, String, Table, text
+from sqlalchemy import TIMESTAMP, CheckConstraint, Column, Date, ForeignKey, Index, Integer, String, Table, text
 from sqlalchemy.orm import relationship
 from app.base_datos import Base
 
-# Tabla auxiliar de amistades
+# Tabla auxiliar de amistades. Cada amistad se guarda en los dos sentidos,
+# (A, B) y (B, A), y UsuarioServicio siempre inserta y borra las dos filas
+# juntas: así los amigos de A son un rango de la clave primaria
+# (user_id = A) sin OR ni UNION. El índice inverso sirve a las búsquedas
+# por friend_id (p. ej. al borrar un usuario, quitar sus filas de los demás).
 user_friends = Table(
     'user_friends',
     Base.metadata,
     Column('user_id', Integer, ForeignKey('users.id'), primary_key=True),
     Column('friend_id', Integer, ForeignKey('users.id'), primary_key=True),
-    Column('created_at', TIMESTAMP, nullable=False, server_default=text("CURRENT_TIMESTAMP"))
+    Column('created_at', TIMESTAMP, nullable=False, server_default=text("CURRENT_TIMESTAMP")),
+    CheckConstraint('user_id <> friend_id', name='ck_user_friends_distintos'),
+    Index('ix_user_friends_friend_user', 'friend_id', 'user_id'),
 )
 
 @dataclass
@@ -63,19 +69,57 @@ class UsuarioDB(Base):
         cascade="all, delete-orphan"
     )
 
-    def to_dict(self):
-        """Convierte el usuario a un dict para respuestas de la API"""
-        return {
-            "id": self.id,
-            "username": self.username,
-            "email": self.email,
-            "birth_date": self.birth_date.isoformat() if self.birth_date else None,
-            "created_at": self.created_at.isoformat() if self.created_at else None,
-            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
-            "friends": [friend.id for friend in self.friends],
-            "galardones_obtenidos": [galardon.to_dict() for galardon in self.galardones_obtenidos],
-            "degustaciones": [degustacion.to_dict() for degustacion in self.degustaciones] 
-        }
+    # Niveles de serialización: cada uno amplía el anterior.
+    # 'resumen' solo lee columnas (no carga relaciones), por eso es el que
+    # se usa en listados y dentro de otros objetos (p. ej. comentarios).
+    CAMPOS_RESUMEN = ("id", "username", "email")
+    CAMPOS_PERFIL = CAMPOS_RESUMEN + ("birth_date", "created_at", "updated_at", "friends")
+    CAMPOS_COMPLETO = CAMPOS_PERFIL + ("galardones_obtenidos", "degustaciones")
+    NIVELES = {
+        "resumen": CAMPOS_RESUMEN,
+        "perfil": CAMPOS_PERFIL,
+        "completo": CAMPOS_COMPLETO,
+    }
+
+    # Cómo se obtiene cada campo (solo se evalúan los que se piden)
+    _SERIALIZADORES = {
+        "id": lambda u: u.id,
+        "username": lambda u: u.username,
+        "email": lambda u: u.email,
+        "birth_date": lambda u: u.birth_date.isoformat() if u.birth_date else None,
+        "created_at": lambda u: u.created_at.isoformat() if u.created_at else None,
+        "updated_at": lambda u: u.updated_at.isoformat() if u.updated_at else None,
+        "friends": lambda u: [friend.id for friend in u.friends],
+        "galardones_obtenidos": lambda u: [galardon.to_dict() for galardon in u.galardones_obtenidos],
+        "degustaciones": lambda u: [degustacion.to_dict() for degustacion in u.degustaciones],
+    }
+
+    @classmethod
+    def resolver_campos(cls, nivel: str = "completo", fields: str = None) -> tuple:
+        """
+        Devuelve los campos a serializar: los del parámetro 'fields'
+        ("id,username,friends") si viene, o si no los del nivel indicado.
+        Lanza ValueError si el nivel o algún campo no existen.
+        """
+        if not fields:
+            if nivel not in cls.NIVELES:
+                raise ValueError(f"Nivel de detalle desconocido: '{nivel}'")
+            return cls.NIVELES[nivel]
+        campos = tuple(c.strip() for c in fields.split(",") if c.strip())
+        desconocidos = [c for c in campos if c not in cls._SERIALIZADORES]
+        if desconocidos:
+            raise ValueError(f"Campos desconocidos: {', '.join(desconocidos)}")
+        return campos
+
+    def to_dict(self, nivel: str = "completo", campos: tuple = None):
+        """
+        Convierte el usuario a un dict para respuestas de la API.
+        nivel: 'resumen', 'perfil' o 'completo' (por defecto, el grafo entero).
+        campos: lista explícita de campos; tiene prioridad sobre el nivel.
+        """
+        if campos is None:
+            campos = self.NIVELES[nivel]
+        return {campo: self._SERIALIZADORES[campo](self) for campo in campos}
 
 
 # Uso
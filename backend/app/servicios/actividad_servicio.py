@@ -0,0 +1,244 @@
+# Feed de actividad de amigos materializado (RF-3.8, RF-5.3)
+#
+# En vez de calcular el feed en cada lectura (cargar los amigos y buscar
+# sus degustaciones con un IN que crece con el número de amigos), cada
+# degustación se copia al crearse en la tabla actividad_amigos, una fila
+# por cada amigo del autor ("fan-out" en escritura). Leer el feed de un
+# usuario es entonces un rango del índice (usuario_id, fecha_creacion,
+# degustacion_id), con el mismo coste tenga 10 amigos o 10.000.
+#
+# Todo se escribe en la transacción de la operación que lo provoca, así
+# que el feed se confirma (o se deshace) a la vez que ella, salvo la
+# difusión de una degustación nueva, que escribe una fila por amigo y va
+# en un trabajo en segundo plano encolado en esa transacción (ver
+# servicios/trabajos): llega al feed unos milisegundos después.
+#   - crear_degustacion:      difundir_en_segundo_plano()
+#   - borrar una degustación: se quitan sus filas (evento before_delete)
+#   - crear_amistad:          anadir_amistad() trae lo reciente de cada uno
+#   - eliminar_amistad:       quitar_amistad()
+#   - delete_usuario:         quitar_usuario()
+# Para datos anteriores al feed (o si se desincroniza) está el comando
+# flask --app app.main reconstruir-actividad (ver reconstruir()).
+import heapq
+import os
+from datetime import datetime
+from itertools import groupby, islice
+from typing import List, Optional, Tuple
+from sqlalchemy import Integer, and_, delete, desc, event, func, insert, literal, or_, select, tuple_
+from sqlalchemy.orm import Session
+from app.objetos.actividad import ActividadAmigoDB
+from app.objetos.degustacion import DegustacionDB
+from app.objetos.usuario import user_friends
+from app.servicios import perfiles_carga, trabajos
+
+# Cómo se sirve el feed (ACTIVIDAD_FEED):
+#   - "materializado" (por defecto): tabla actividad_amigos escrita al crear
+#     cada degustación; la lectura es un rango de índice.
+#   - "calculado": no escribe nada al crear degustaciones y cada lectura
+#     mezcla las degustaciones de los amigos (calcular_actividad). Menos
+#     escrituras a cambio de lecturas algo más caras. Al volver a
+#     "materializado" hay que ejecutar reconstruir-actividad.
+MODO = os.getenv("ACTIVIDAD_FEED", "materializado")
+if MODO not in ("materializado", "calculado"):
+    raise ValueError(f"ACTIVIDAD_FEED no válido: {MODO!r} (materializado o calculado)")
+
+# Degustaciones recientes de cada uno que se copian al hacerse amigos
+RELLENO_AL_HACERSE_AMIGOS = 100
+# Autores por lote al reconstruir el feed
+AUTORES_POR_LOTE = 500
+
+actividad = ActividadAmigoDB.__table__
+degustaciones = DegustacionDB.__table__
+
+def _filas_feed(lector):
+    """
+    SELECT de las columnas del feed (en el orden de _COLUMNAS) para que
+    'lector' (una columna o un valor) vea las degustaciones seleccionadas.
+    """
+    return select(lector, degustaciones.c.id, degustaciones.c.usuario_id,
+        func.coalesce(degustaciones.c.fecha_creacion, func.now()))
+
+_COLUMNAS = ["usuario_id", "degustacion_id", "autor_id", "fecha_creacion"]
+# Cada degustación con los amigos de su autor (rango de la clave primaria de user_friends)
+_DEGUSTACIONES_Y_AMIGOS = degustaciones.join(user_friends, user_friends.c.user_id == degustaciones.c.usuario_id)
+
+def difundir_degustacion(db: Session, degustacion_id: int) -> int:
+    """
+    Añade la degustación (ya insertada) al feed de todos los amigos de su
+    autor con un solo INSERT ... SELECT. Salta los que ya la tienen (p. ej.
+    copiada por anadir_amistad), así que repetirla no falla. Devuelve
+    cuántas filas se han escrito.
+    """
+    if MODO != "materializado":
+        return 0
+    ya_esta = select(actividad.c.usuario_id).where(actividad.c.usuario_id == user_friends.c.friend_id,
+        actividad.c.degustacion_id == degustaciones.c.id)
+    filas = _filas_feed(user_friends.c.friend_id).select_from(_DEGUSTACIONES_Y_AMIGOS)\
+        .where(degustaciones.c.id == degustacion_id, ~ya_esta.exists())
+    return db.execute(insert(actividad).from_select(_COLUMNAS, filas)).rowcount
+
+def difundir_en_segundo_plano(db: Session, degustacion_id: int):
+    """
+    Encola difundir_degustacion en la transacción de 'db'; se ejecuta
+    tras el commit, fuera del tiempo de respuesta.
+    """
+    if MODO == "materializado":
+        trabajos.encolar(db, "difundir_degustacion", degustacion_id=degustacion_id)
+
+@trabajos.tarea("difundir_degustacion")
+def _tarea_difundir(db: Session, degustacion_id: int):
+    # Si la degustación se borró antes de ejecutarse, no escribe nada
+    difundir_degustacion(db, degustacion_id)
+
+def anadir_amistad(db: Session, user_id: int, friend_id: int):
+    """
+    Al hacerse amigos, cada uno recibe en su feed las últimas
+    RELLENO_AL_HACERSE_AMIGOS degustaciones del otro.
+    """
+    if MODO != "materializado":
+        return
+    # Por si quedaban filas de una amistad anterior
+    quitar_amistad(db, user_id, friend_id)
+    for lector, autor in ((user_id, friend_id), (friend_id, user_id)):
+        # Rango de ix_degustaciones_usuario_fecha_id
+        recientes = select(degustaciones.c.id).where(degustaciones.c.usuario_id == autor)\
+            .order_by(desc(degustaciones.c.fecha_creacion), desc(degustaciones.c.id))\
+            .limit(RELLENO_AL_HACERSE_AMIGOS).subquery()
+        filas = _filas_feed(literal(lector, Integer))\
+            .where(degustaciones.c.id.in_(select(recientes.c.id)))
+        db.execute(insert(actividad).from_select(_COLUMNAS, filas))
+
+def quitar_amistad(db: Session, user_id: int, friend_id: int):
+    """Quita del feed de cada uno las degustaciones del otro."""
+    db.execute(delete(actividad).where(or_(
+        and_(actividad.c.usuario_id == user_id, actividad.c.autor_id == friend_id),
+        and_(actividad.c.usuario_id == friend_id, actividad.c.autor_id == user_id),
+    )))
+
+def quitar_usuario(db: Session, usuario_id: int):
+    """
+    Vacía el feed de un usuario que se va a borrar. Sus degustaciones
+    salen del feed de los demás al borrarse (evento before_delete).
+    """
+    db.execute(delete(actividad).where(actividad.c.usuario_id == usuario_id))
+
+@event.listens_for(DegustacionDB, "before_delete")
+def _quitar_degustacion_del_feed(mapper, conexion, degustacion):
+    conexion.execute(delete(actividad).where(actividad.c.degustacion_id == degustacion.id))
+
+def _antes_del_cursor(tabla_fecha, tabla_id, antes_de):
+    """
+    Condición "más antigua que la degustación del cursor" (keyset sobre
+    fecha_creacion, id). La fecha se toma de la propia fila (mismo formato
+    que la columna); la del cursor solo si esa fila se ha borrado.
+    """
+    ultimo_id, ultima_fecha = antes_de
+    fecha_ref = func.coalesce(select(degustaciones.c.fecha_creacion)
+        .where(degustaciones.c.id == ultimo_id).scalar_subquery(), ultima_fecha)
+    # Comparación de filas para que el índice se busque desde el cursor
+    # (la cota sobre la fecha sola, para motores sin rangos con tuplas)
+    return and_(tabla_fecha <= fecha_ref, tuple_(tabla_fecha, tabla_id) < tuple_(fecha_ref, ultimo_id))
+
+def obtener_actividad(db: Session, usuario_id: int, skip: int = 0, limit: int = 5,
+    antes_de: Optional[Tuple[int, Optional[datetime]]] = None) -> List[DegustacionDB]:
+    """
+    Degustaciones de los amigos del usuario, de la más reciente a la más
+    antigua: 'limit' a partir de la posición 'skip' o, con 'antes_de'
+    (id, fecha_creacion) de la última vista, las siguientes a ella.
+    Según ACTIVIDAD_FEED se lee del feed materializado o se calcula con
+    calcular_actividad(); el resultado es el mismo.
+    """
+    if MODO == "calculado":
+        return calcular_actividad(db, usuario_id, skip, limit, antes_de)
+
+    # Rango de ix_actividad_usuario_fecha más la búsqueda de cada degustación
+    # por su clave primaria (con usuario y cerveza en el mismo SELECT)
+    query = db.query(DegustacionDB).options(*perfiles_carga.degustacion_listado())\
+        .join(ActividadAmigoDB, ActividadAmigoDB.degustacion_id == DegustacionDB.id)\
+        .filter(ActividadAmigoDB.usuario_id == usuario_id)
+    if antes_de is not None:
+        query = query.filter(_antes_del_cursor(ActividadAmigoDB.fecha_creacion,
+            ActividadAmigoDB.degustacion_id, antes_de))
+    return query.order_by(desc(ActividadAmigoDB.fecha_creacion), desc(ActividadAmigoDB.degustacion_id))\
+        .offset(skip).limit(limit).all()
+
+def calcular_actividad(db: Session, usuario_id: int, skip: int = 0, limit: int = 5,
+    antes_de: Optional[Tuple[int, Optional[datetime]]] = None) -> List[DegustacionDB]:
+    """
+    El mismo feed que obtener_actividad() pero sin la tabla materializada:
+    mezcla (k-way merge) las degustaciones de cada amigo, que en
+    ix_degustaciones_usuario_fecha_id ya están ordenadas por fecha. Son
+    tres consultas, tenga el usuario 10 amigos o 10.000:
+
+      1. La degustación más reciente ("cabeza") de cada amigo, buscando
+         en el índice con LIMIT 1 por amigo, y las n = skip + limit
+         cabezas más recientes. Solo esos n amigos pueden aportar algo a
+         las n primeras: los demás tienen n degustaciones más nuevas que
+         todas las suyas.
+      2. Las n primeras de cada uno de esos amigos, sin bajar de la
+         n-ésima cabeza (ROW_NUMBER por amigo sobre el mismo índice).
+      3. Las degustaciones elegidas tras mezclar esas listas con heapq.
+    """
+    n = skip + limit
+    if n <= 0:
+        return []
+    amigo = user_friends.c.friend_id
+    filtro = [] if antes_de is None else [_antes_del_cursor(degustaciones.c.fecha_creacion,
+        degustaciones.c.id, antes_de)]
+
+    # 1. Cabeza de cada amigo y las n más recientes
+    cabeza = select(degustaciones.c.id).where(degustaciones.c.usuario_id == amigo, *filtro)\
+        .order_by(desc(degustaciones.c.fecha_creacion), desc(degustaciones.c.id))\
+        .limit(1).correlate(user_friends).scalar_subquery()
+    cabezas = select(amigo.label("amigo_id"), cabeza.label("cabeza_id"))\
+        .where(user_friends.c.user_id == usuario_id).subquery()
+    primeras = db.execute(select(cabezas.c.amigo_id, cabezas.c.cabeza_id, degustaciones.c.fecha_creacion)
+        .join(degustaciones, degustaciones.c.id == cabezas.c.cabeza_id)
+        .order_by(desc(degustaciones.c.fecha_creacion), desc(degustaciones.c.id))
+        .limit(n)).all()
+    if not primeras:
+        return []
+
+    # 2. Las n primeras de cada amigo candidato (listas ya ordenadas)
+    candidatos = [fila.amigo_id for fila in primeras]
+    if len(primeras) == n and primeras[-1].fecha_creacion is not None:
+        # Fecha leída de la fila (en SQLite un datetime de Python no tiene el
+        # mismo formato de texto que las fechas puestas por el servidor)
+        filtro.append(degustaciones.c.fecha_creacion >= select(degustaciones.c.fecha_creacion)
+            .where(degustaciones.c.id == primeras[-1].cabeza_id).scalar_subquery())
+    posicion = func.row_number().over(partition_by=degustaciones.c.usuario_id,
+        order_by=(desc(degustaciones.c.fecha_creacion), desc(degustaciones.c.id))).label("posicion")
+    listas = select(degustaciones.c.usuario_id, degustaciones.c.id, degustaciones.c.fecha_creacion, posicion)\
+        .where(degustaciones.c.usuario_id.in_(candidatos), *filtro).subquery()
+    filas = db.execute(select(listas.c.usuario_id, listas.c.id, listas.c.fecha_creacion)
+        .where(listas.c.posicion <= n)
+        .order_by(listas.c.usuario_id, listas.c.posicion)).all()
+
+    # 3. Mezcla de las listas (cada una de más reciente a más antigua)
+    por_amigo = [[(fila.fecha_creacion or datetime.min, fila.id) for fila in grupo]
+        for _, grupo in groupby(filas, key=lambda fila: fila.usuario_id)]
+    elegidas = [id_fila for _, id_fila in islice(heapq.merge(*por_amigo, reverse=True), skip, n)]
+    if not elegidas:
+        return []
+    cargadas = {d.id: d for d in db.query(DegustacionDB).options(*perfiles_carga.degustacion_listado())
+        .filter(DegustacionDB.id.in_(elegidas))}
+    return [cargadas[id_fila] for id_fila in elegidas if id_fila in cargadas]
+
+def reconstruir(db: Session) -> int:
+    """
+    Rehace el feed entero a partir de user_friends y degustaciones, por
+    lotes de AUTORES_POR_LOTE autores (una transacción por lote, para no
+    bloquear la tabla durante toda la carga). Devuelve las filas escritas.
+    """
+    db.execute(delete(actividad))
+    db.commit()
+    autores = db.execute(select(degustaciones.c.usuario_id).distinct()
+        .order_by(degustaciones.c.usuario_id)).scalars().all()
+    escritas = 0
+    for inicio in range(0, len(autores), AUTORES_POR_LOTE):
+        lote = autores[inicio:inicio + AUTORES_POR_LOTE]
+        filas = _filas_feed(user_friends.c.friend_id).select_from(_DEGUSTACIONES_Y_AMIGOS)\
+            .where(degustaciones.c.usuario_id.in_(lote))
+        escritas += db.execute(insert(actividad).from_select(_COLUMNAS, filas)).rowcount
+        db.commit()
+    return escritas
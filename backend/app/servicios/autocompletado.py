@@ -0,0 +1,194 @@
+"""
+Autocompletado (typeahead) de cervezas, cervecerías y usuarios.
+
+Cada índice vive en memoria del proceso: dos arrays ordenados de claves
+normalizadas (minúsculas, sin tildes) que se consultan por prefijo con
+bisect, en O(log n + k) y sin tocar la base de datos:
+
+  - nombres: el nombre completo ("mahou cinco estrellas")
+  - palabras: lo que queda desde cada palabra interior ("cinco estrellas",
+    "estrellas"), para que "estre" también encuentre la cerveza
+
+Los que casan por el principio del nombre van primero. El índice se
+construye con una sola consulta la primera vez que se usa y después los
+servicios lo mantienen al crear, editar y borrar (actualizar / quitar).
+Como cada worker tiene su copia, se reconstruye entera cada
+AUTOCOMPLETADO_REFRESCO_SEGUNDOS para recoger lo escrito por los demás.
+
+La reconstrucción lee siempre de la primaria (aunque la sesión de la
+petición vaya a la réplica) y fuera del cerrojo: los cambios que llegan
+mientras tanto se apuntan y se repiten sobre el índice nuevo antes de
+instalarlo, para que no se pierdan con el cambio.
+"""
+import os
+import threading
+import time
+import unicodedata
+import weakref
+from bisect import bisect_left, insort
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.base_datos import Base
+
+# índice -> (tabla, columna con el texto)
+INDICES_AUTOCOMPLETADO = {
+    "cervezas": ("cervezas", "nombre"),
+    "cervecerias": ("cervecerias", "nombre"),
+    "usuarios": ("users", "username"),
+}
+
+LIMITE_POR_DEFECTO = 10
+LIMITE_MAXIMO = 50
+REFRESCO_SEGUNDOS = float(os.getenv("AUTOCOMPLETADO_REFRESCO_SEGUNDOS", "300"))
+
+# Índices ya construidos, por engine (primaria) y nombre de índice
+_indices = weakref.WeakKeyDictionary()
+# Cambios recibidos durante las reconstrucciones en curso, por engine y nombre
+_pendientes = weakref.WeakKeyDictionary()
+_cerrojo = threading.Lock()
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sin tildes y con los espacios colapsados."""
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    sin_tildes = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return " ".join(sin_tildes.casefold().split())
+
+
+class IndicePrefijos:
+    """Arrays ordenados de (clave, id) con el texto original de cada id."""
+
+    def __init__(self, filas=()):
+        self.textos = {}
+        self.nombres = []
+        self.palabras = []
+        for id_fila, texto in filas:
+            if texto:
+                self.textos[id_fila] = texto
+        # Construcción en bloque: ordenar una vez es más rápido que insertar
+        for id_fila, texto in self.textos.items():
+            nombre, palabras = self._claves(texto)
+            self.nombres.append((nombre, id_fila))
+            self.palabras.extend((palabra, id_fila) for palabra in palabras)
+        self.nombres.sort()
+        self.palabras.sort()
+        self.creado = time.monotonic()
+
+    @staticmethod
+    def _claves(texto: str) -> tuple[str, list[str]]:
+        nombre = normalizar(texto)
+        partes = nombre.split(" ")
+        return nombre, [" ".join(partes[i:]) for i in range(1, len(partes))]
+
+    def __len__(self):
+        return len(self.textos)
+
+    def anadir(self, id_fila: int, texto: str):
+        self.quitar(id_fila)
+        if not texto:
+            return
+        self.textos[id_fila] = texto
+        nombre, palabras = self._claves(texto)
+        insort(self.nombres, (nombre, id_fila))
+        for palabra in palabras:
+            insort(self.palabras, (palabra, id_fila))
+
+    def quitar(self, id_fila: int):
+        texto = self.textos.pop(id_fila, None)
+        if texto is None:
+            return
+        nombre, palabras = self._claves(texto)
+        for array, clave in [(self.nombres, nombre)] + [(self.palabras, p) for p in palabras]:
+            posicion = bisect_left(array, (clave, id_fila))
+            if posicion < len(array) and array[posicion] == (clave, id_fila):
+                del array[posicion]
+
+    def buscar(self, prefijo: str, limite: int) -> list[tuple[int, str]]:
+        """Hasta 'limite' (id, texto): primero por nombre y luego por palabra."""
+        prefijo = normalizar(prefijo)
+        if not prefijo or limite <= 0:
+            return []
+        encontrados = []
+        vistos = set()
+        for array in (self.nombres, self.palabras):
+            posicion = bisect_left(array, (prefijo,))
+            while posicion < len(array) and len(encontrados) < limite:
+                clave, id_fila = array[posicion]
+                if not clave.startswith(prefijo):
+                    break
+                if id_fila not in vistos:
+                    vistos.add(id_fila)
+                    encontrados.append((id_fila, self.textos[id_fila]))
+                posicion += 1
+        return encontrados
+
+
+def _engine(db: Session):
+    # Siempre la primaria (Session.get_bind sin el enrutado a la réplica):
+    # lecturas y escrituras comparten índice
+    return Session.get_bind(db)
+
+
+def _obtener_indice(db: Session, nombre: str) -> IndicePrefijos:
+    """Índice del engine de 'db', construyéndolo si falta o ha caducado."""
+    engine = _engine(db)
+    with _cerrojo:
+        indice = _indices.get(engine, {}).get(nombre)
+        if indice is not None and time.monotonic() - indice.creado < REFRESCO_SEGUNDOS:
+            return indice
+        cambios = []
+        _pendientes.setdefault(engine, {}).setdefault(nombre, []).append(cambios)
+
+    tabla, columna = INDICES_AUTOCOMPLETADO[nombre]
+    columnas = Base.metadata.tables[tabla].c
+    try:
+        # Conexión de la primaria aunque la sesión esté enrutada a la réplica
+        # (connection() con bind explícito no pasa por SesionEnrutada.get_bind)
+        filas = db.connection(bind_arguments={"bind": engine}).execute(
+            select(columnas.id, columnas[columna])).all()
+    finally:
+        with _cerrojo:
+            _pendientes[engine][nombre].remove(cambios)
+    indice = IndicePrefijos(filas)
+    with _cerrojo:
+        # Lo escrito desde que empezó la consulta puede no estar en 'filas'
+        for id_fila, texto in cambios:
+            if texto is None:
+                indice.quitar(id_fila)
+            else:
+                indice.anadir(id_fila, texto)
+        _indices.setdefault(engine, {})[nombre] = indice
+    return indice
+
+
+def autocompletar(db: Session, nombre: str, prefijo: str,
+                  limite: int = LIMITE_POR_DEFECTO) -> list[tuple[int, str]]:
+    """Las 'limite' primeras coincidencias (id, texto) del índice 'nombre'."""
+    indice = _obtener_indice(db, nombre)
+    with _cerrojo:
+        return indice.buscar(prefijo, min(limite, LIMITE_MAXIMO))
+
+
+def _aplicar(db: Session, nombre: str, id_fila: int, texto):
+    """Aplica el cambio al índice construido y lo apunta en las reconstrucciones en curso."""
+    engine = _engine(db)
+    with _cerrojo:
+        for cambios in _pendientes.get(engine, {}).get(nombre, ()):
+            cambios.append((id_fila, texto))
+        indice = _indices.get(engine, {}).get(nombre)
+        if indice is None:
+            return
+        if texto is None:
+            indice.quitar(id_fila)
+        else:
+            indice.anadir(id_fila, texto)
+
+
+def actualizar(db: Session, nombre: str, id_fila: int, texto: str):
+    """Añade o renombra una fila en el índice, si ya está construido o construyéndose."""
+    _aplicar(db, nombre, id_fila, texto or "")
+
+
+def quitar(db: Session, nombre: str, id_fila: int):
+    """Quita una fila borrada del índice, si ya está construido o construyéndose."""
+    _aplicar(db, nombre, id_fila, None)
@@ -0,0 +1,106 @@
+"""
+Búsqueda de texto completo (RF-3.1) sobre cervezas y cervecerías con FTS5.
+
+Cada tabla tiene un índice FTS5 de "contenido externo" (no duplica los
+datos, solo guarda el índice invertido) que se mantiene con triggers en
+cada INSERT, UPDATE y DELETE, también los que no pasan por el ORM. El
+tokenizador unicode61 con remove_diacritics ignora mayúsculas y tildes:
+"cerveceria" encuentra "Cervecería".
+
+FTS5 es de SQLite; con MySQL/PostgreSQL (o un SQLite sin FTS5) los
+servicios vuelven al filtro ilike('%q%').
+"""
+import re
+import weakref
+from sqlalchemy import Float, Integer, inspect, text
+
+# tabla -> (tabla FTS, columnas indexadas, peso de cada columna en bm25)
+INDICES_BUSQUEDA = {
+    "cervezas": ("cervezas_fts", ("nombre", "descripcion", "estilo", "pais_procedencia"),
+                 (10.0, 1.0, 4.0, 2.0)),
+    "cervecerias": ("cervecerias_fts", ("nombre", "descripcion", "ciudad", "pais"),
+                    (10.0, 1.0, 4.0, 2.0)),
+}
+
+# Caché por engine de si tiene los índices creados (se consulta en cada búsqueda)
+_disponible = weakref.WeakKeyDictionary()
+
+
+def _sentencias_indice(tabla: str) -> list[str]:
+    """DDL de la tabla FTS5 y de los triggers que la mantienen al día."""
+    fts, columnas, _ = INDICES_BUSQUEDA[tabla]
+    lista = ", ".join(columnas)
+    nuevos = ", ".join(f"new.{c}" for c in columnas)
+    viejos = ", ".join(f"old.{c}" for c in columnas)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({lista}, content='{tabla}', "
+        f"content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {tabla} BEGIN "
+        f"INSERT INTO {fts}(rowid, {lista}) VALUES (new.id, {nuevos}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {tabla} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {lista}) VALUES ('delete', old.id, {viejos}); END",
+        # Solo al cambiar columnas indexadas (no con los agregados de valoración)
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {lista} ON {tabla} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {lista}) VALUES ('delete', old.id, {viejos}); "
+        f"INSERT INTO {fts}(rowid, {lista}) VALUES (new.id, {nuevos}); END",
+    ]
+
+
+def crear_indices_busqueda(engine) -> list[str]:
+    """
+    Crea los índices FTS5 y sus triggers si faltan, y los rellena con las
+    filas existentes. No hace nada fuera de SQLite. Devuelve las tablas
+    FTS creadas.
+    """
+    if engine.dialect.name != "sqlite":
+        return []
+    creadas = []
+    inspector = inspect(engine)
+    with engine.begin() as conexion:
+        for tabla, (fts, _, _) in INDICES_BUSQUEDA.items():
+            if inspector.has_table(fts):
+                continue
+            for sentencia in _sentencias_indice(tabla):
+                conexion.execute(text(sentencia))
+            conexion.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+            creadas.append(fts)
+    _disponible.pop(engine, None)
+    return creadas
+
+
+def busqueda_disponible(db, tabla: str) -> bool:
+    """Indica si la BD de la sesión tiene el índice FTS5 de 'tabla'."""
+    engine = db.get_bind()
+    if engine not in _disponible:
+        _disponible[engine] = engine.dialect.name == "sqlite" and all(
+            inspect(engine).has_table(fts) for fts, _, _ in INDICES_BUSQUEDA.values())
+    return _disponible[engine]
+
+
+def consulta_fts(q: str) -> str | None:
+    """
+    Convierte el texto del usuario en una consulta FTS5 segura: cada
+    palabra como prefijo ("ipa" encuentra "IPAs") y todas obligatorias.
+    Devuelve None si no hay ninguna palabra.
+    """
+    palabras = re.findall(r"\w+", q)
+    if not palabras:
+        return None
+    return " ".join(f'"{palabra}"*' for palabra in palabras)
+
+
+def subconsulta_ranking(tabla: str, q: str):
+    """
+    Subconsulta (id, rango) con las filas de 'tabla' que casan con q y su
+    relevancia bm25 (menor = más relevante), para unirla con el modelo.
+    Devuelve None si q no tiene ninguna palabra.
+    """
+    consulta = consulta_fts(q)
+    if consulta is None:
+        return None
+    fts, _, pesos = INDICES_BUSQUEDA[tabla]
+    argumentos = ", ".join(str(peso) for peso in pesos)
+    return text(
+        f"SELECT rowid AS id, bm25({fts}, {argumentos}) AS rango "
+        f"FROM {fts} WHERE {fts} MATCH :consulta"
+    ).bindparams(consulta=consulta).columns(id=Integer, rango=Float).subquery(f"{fts}_rango")
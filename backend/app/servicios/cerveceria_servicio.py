@@ -1,8 +1,32 @@
 from typing import Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import func, distinct
+from sqlalchemy import func, distinct, event, and_, or_
 from app.objetos.cerveceria import Cerveceria
-import math
+from app.servicios import autocompletado, busqueda, geolocalizacion
+
+# Columnas que calcula el servidor y no se aceptan del cliente
+CAMPOS_CALCULADOS = {"geohash", "version"}
+
+def validar_coordenadas(lat, lon):
+    """Lanza ValueError si lat/lon no son coordenadas válidas."""
+    if lat is None and lon is None:
+        return
+    if lat is None or lon is None:
+        raise ValueError("'lat' y 'lon' deben indicarse juntas.")
+    if isinstance(lat, bool) or isinstance(lon, bool) \
+            or not isinstance(lat, (int, float)) or not isinstance(lon, (int, float)):
+        raise ValueError("'lat' y 'lon' deben ser números.")
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        raise ValueError("Coordenadas fuera de rango (lat: -90..90, lon: -180..180).")
+
+@event.listens_for(Cerveceria, "before_insert")
+@event.listens_for(Cerveceria, "before_update")
+def _actualizar_geohash(mapper, conexion, cerveceria):
+    """Mantiene 'geohash' al día con lat/lon en cada alta o edición."""
+    if cerveceria.lat is None or cerveceria.lon is None:
+        cerveceria.geohash = None
+    else:
+        cerveceria.geohash = geolocalizacion.codificar_geohash(cerveceria.lat, cerveceria.lon)
 
 class CerveceriaService:
 
@@ -15,25 +39,39 @@ class CerveceriaService:
         if db_existente:
             raise ValueError(f"La cervecería '{cerveceria_data['nombre']}' ya existe.")
 
-        atributos_modelo = Cerveceria.__table__.columns.keys()
+        atributos_modelo = set(Cerveceria.__table__.columns.keys()) - CAMPOS_CALCULADOS
         data_limpia = {k: v for k, v in cerveceria_data.items() if k in atributos_modelo}
+        validar_coordenadas(data_limpia.get('lat'), data_limpia.get('lon'))
 
         db_cerveceria = Cerveceria(**data_limpia)
         db.add(db_cerveceria)
         db.commit()
         db.refresh(db_cerveceria)
+        autocompletado.actualizar(db, "cervecerias", db_cerveceria.id, db_cerveceria.nombre)
         return db_cerveceria
 
     @staticmethod
     def buscar_cervecerias(db: Session, q: str = None, ciudad: str = None, pais: str = None) -> list[Cerveceria]:
+        """
+        Busca y filtra cervecerías. 'q' busca en nombre, descripción, ciudad
+        y país con el índice FTS5 (sin distinguir mayúsculas ni tildes, por
+        prefijo) y ordena por relevancia; sin FTS5 se filtra el nombre con ilike.
+        """
         query = db.query(Cerveceria)
+        orden = [Cerveceria.nombre]
         if q:
-            query = query.filter(Cerveceria.nombre.ilike(f"%{q}%"))
+            ranking = busqueda.subconsulta_ranking("cervecerias", q) \
+                if busqueda.busqueda_disponible(db, "cervecerias") else None
+            if ranking is not None:
+                query = query.join(ranking, ranking.c.id == Cerveceria.id)
+                orden = [ranking.c.rango, Cerveceria.nombre]
+            else:
+                query = query.filter(Cerveceria.nombre.ilike(f"%{q}%"))
         if ciudad:
             query = query.filter(Cerveceria.ciudad == ciudad)
         if pais:
             query = query.filter(Cerveceria.pais == pais)
-        return query.order_by(Cerveceria.nombre).all()
+        return query.order_by(*orden).all()
 
     @staticmethod
     def get_cerveceria_por_id(db: Session, cerveceria_id: int) -> Cerveceria | None:
@@ -48,14 +86,17 @@ class CerveceriaService:
         db_cerveceria = CerveceriaService.get_cerveceria_por_id(db, cerveceria_id)
         if not db_cerveceria:
             return None
+        validar_coordenadas(cerveza_data.get('lat', db_cerveceria.lat),
+            cerveza_data.get('lon', db_cerveceria.lon))
         # Actualizar campos
         for key, value in cerveza_data.items():
-            if hasattr(db_cerveceria, key):
+            if hasattr(db_cerveceria, key) and key not in CAMPOS_CALCULADOS:
                 setattr(db_cerveceria, key, value)
         # Actualiza en base de datos
         db.add(db_cerveceria)
         db.commit()
         db.refresh(db_cerveceria)
+        autocompletado.actualizar(db, "cervecerias", db_cerveceria.id, db_cerveceria.nombre)
         return db_cerveceria
 
     @staticmethod
@@ -69,31 +110,81 @@ class CerveceriaService:
         if db_cerveceria:
             db.delete(db_cerveceria)
             db.commit()
+            autocompletado.quitar(db, "cervecerias", cerveceria_id)
             return True
         return False
 
     @staticmethod
-    def get_cervecerias_cercanas(db: Session, lat: float, lon: float, radio: float = 5) -> list[Cerveceria]:
+    def get_cervecerias_cercanas(db: Session, lat: float, lon: float, radio: float = 5,
+                                 limite: Optional[int] = None) -> list[tuple[Cerveceria, float]]:
         """
-        Devuelve cervecerías dentro de un radio en km usando coordenadas.
-        Requiere que Cerveceria tenga columnas lat/lon.
+        Devuelve (cervecería, distancia en km) de las cervecerías a menos de
+        'radio' km, ordenadas de la más cercana a la más lejana.
+
+        1. Rangos del índice de geohash que cubren la caja del círculo
+           (solo se leen las filas de esa zona, no toda la tabla).
+        2. Prefiltro por la caja lat/lon.
+        3. Distancia exacta (haversine) solo sobre esos candidatos.
         """
-        # Placeholder: si no tienes lat/lon, devuelve todas
-        if not hasattr(Cerveceria, 'lat') or not hasattr(Cerveceria, 'lon'):
-            return db.query(Cerveceria).order_by(Cerveceria.nombre).all()
-
-        def distancia_km(lat1, lon1, lat2, lon2):
-            R = 6371  # radio de la tierra en km
-            phi1, phi2 = math.radians(lat1), math.radians(lat2)
-            d_phi = math.radians(lat2 - lat1)
-            d_lambda = math.radians(lon2 - lon1)
-            a = math.sin(d_phi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(d_lambda/2)**2
-            c = 2*math.atan2(math.sqrt(a), math.sqrt(1-a))
-            return R * c
-
-        todas = db.query(Cerveceria).all()
-        cercanas = [
-            c for c in todas
-            if c.lat is not None and c.lon is not None and distancia_km(lat, lon, c.lat, c.lon) <= radio
-        ]
-        return sorted(cercanas, key=lambda x: x.nombre)
+        lat_min, lat_max, lon_min, lon_max = geolocalizacion.caja_alrededor(lat, lon, radio)
+        prefijos = geolocalizacion.prefijos_caja(lat_min, lat_max, lon_min, lon_max)
+
+        filtro_lon = Cerveceria.lon.between(lon_min, lon_max)
+        if lon_min < -180:
+            # La caja cruza el antimeridiano por el oeste
+            filtro_lon = or_(Cerveceria.lon >= lon_min + 360, Cerveceria.lon <= lon_max)
+        elif lon_max > 180:
+            filtro_lon = or_(Cerveceria.lon >= lon_min, Cerveceria.lon <= lon_max - 360)
+
+        rangos = []
+        for prefijo in prefijos:
+            fin = geolocalizacion.fin_prefijo(prefijo)
+            rangos.append(and_(Cerveceria.geohash >= prefijo, Cerveceria.geohash < fin)
+                          if fin else Cerveceria.geohash >= prefijo)
+
+        candidatas = db.query(Cerveceria).filter(
+            or_(*rangos),
+            Cerveceria.lat.between(lat_min, lat_max),
+            filtro_lon,
+        ).all()
+
+        cercanas = []
+        for cerveceria in candidatas:
+            distancia = geolocalizacion.distancia_km(lat, lon, cerveceria.lat, cerveceria.lon)
+            if distancia <= radio:
+                cercanas.append((cerveceria, distancia))
+        cercanas.sort(key=lambda par: (par[1], par[0].nombre))
+        return cercanas[:limite] if limite else cercanas
+
+    @staticmethod
+    def get_cervecerias_cercanas_lote(db: Session, puntos: list[tuple[float, float]], radio: float = 5,
+                                      k: int = 10) -> list[list[tuple[Cerveceria, float]]]:
+        """
+        Versión en lote de get_cervecerias_cercanas (p. ej. campañas para
+        muchos usuarios): para cada punto (lat, lon), las k cervecerías más
+        cercanas a menos de 'radio' km con su distancia, ordenadas.
+
+        Hace 2 consultas sea cual sea el número de puntos: las coordenadas
+        (id, lat, lon) de la caja que cubre todos los puntos, como arrays
+        para calcular las distancias con NumPy, y las cervecerías elegidas.
+        """
+        if not puntos:
+            return []
+        cajas = [geolocalizacion.caja_alrededor(lat, lon, radio) for lat, lon in puntos]
+        query = db.query(Cerveceria.id, Cerveceria.lat, Cerveceria.lon).filter(
+            Cerveceria.lat.between(min(c[0] for c in cajas), max(c[1] for c in cajas)),
+            Cerveceria.lon.isnot(None))
+        lon_min, lon_max = min(c[2] for c in cajas), max(c[3] for c in cajas)
+        if lon_min >= -180 and lon_max <= 180:
+            query = query.filter(Cerveceria.lon.between(lon_min, lon_max))
+        filas = query.all()
+        if not filas:
+            return [[] for _ in puntos]
+
+        ids, lats, lons = zip(*filas)
+        vecinos = geolocalizacion.k_mas_cercanos(
+            [lat for lat, _ in puntos], [lon for _, lon in puntos], lats, lons, k, radio)
+
+        elegidas = {ids[indice] for fila in vecinos for indice, _ in fila}
+        por_id = {c.id: c for c in db.query(Cerveceria).filter(Cerveceria.id.in_(elegidas))} if elegidas else {}
+        return [[(por_id[ids[indice]], distancia) for indice, distancia in fila] for fila in vecinos]
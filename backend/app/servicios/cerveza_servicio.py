@@ -1,10 +1,20 @@
 from typing import Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, func, distinct
+from sqlalchemy import desc, func, distinct, inspect, select, update
 from app.objetos.cerveza import Cerveza
 from app.objetos.degustacion import DegustacionDB
+from app import cache
+from app.servicios import autocompletado, busqueda, reglas_galardones
 import pdb
 
+# Columnas que solo mantiene el servidor (no editables por la API)
+CAMPOS_AGREGADOS = {'suma_valoraciones', 'total_valoraciones', 'valoracion_promedio', 'version'}
+
+# Etiquetas de caché de los endpoints de catálogo de cervezas (ver app/cache.py)
+CACHE_LISTADO = "cervezas_listado"
+CACHE_ESTILOS = "cervezas_estilos"
+CACHE_PAISES = "cervezas_paises"
+
 class CervezaService:
 
     @staticmethod
@@ -22,44 +32,46 @@ class CervezaService:
 
         # Filtramos data_cerveza para incluir solo columnas del modelo
         atributos_modelo = Cerveza.__table__.columns.keys()
-        data_limpia = {k: v for k, v in cerveza_data.items() if k in atributos_modelo}
+        data_limpia = {k: v for k, v in cerveza_data.items() 
+            if k in atributos_modelo and k not in CAMPOS_AGREGADOS}
         
         db_cerveza = Cerveza(**data_limpia)
         
         db.add(db_cerveza)
+        cache.invalidar_al_confirmar(db, CACHE_LISTADO, CACHE_ESTILOS, CACHE_PAISES)
         db.commit()
         db.refresh(db_cerveza)
+        autocompletado.actualizar(db, "cervezas", db_cerveza.id, db_cerveza.nombre)
         return db_cerveza
 
     @staticmethod
-    def buscar_cervezas(db: Session, q: str = None, estilo: str = None, pais: str = None) -> list[tuple[Cerveza, float | None]]:
+    def buscar_cervezas(db: Session, q: str = None, estilo: str = None, pais: str = None) -> list[Cerveza]:
         """
         Busca y filtra cervezas (RF-3.1, RF-5.7).
-        AHORA INCLUYE LA VALORACIÓN PROMEDIO EN 1 SOLA CONSULTA.
-        """
-        # pdb.set_trace()
+        La valoración promedio y el total de valoraciones se leen de las
+        columnas agregadas de Cerveza, sin JOIN ni GROUP BY por petición.
 
-        # El query ahora pide la Cerveza y el promedio de Degustacion.rating
-        query = db.query(
-            Cerveza,
-            func.avg(DegustacionDB.puntuacion).label("valoracion_promedio")
-        )
-        
-        # Usamos un LEFT JOIN (isouter=True)
-        # Si una cerveza no tiene degustaciones, el join no la descarta.
-        query = query.join(DegustacionDB, DegustacionDB.cerveza_id == Cerveza.id, isouter=True)
+        'q' busca en nombre, descripción, estilo y país con el índice FTS5
+        (sin distinguir mayúsculas ni tildes, por prefijo) y ordena por
+        relevancia; sin índice FTS5 se filtra el nombre con ilike.
+        """
+        query = db.query(Cerveza)
+        orden = [Cerveza.nombre]
         
         if q:
-            query = query.filter(Cerveza.nombre.ilike(f"%{q}%"))
+            ranking = busqueda.subconsulta_ranking("cervezas", q) \
+                if busqueda.busqueda_disponible(db, "cervezas") else None
+            if ranking is not None:
+                query = query.join(ranking, ranking.c.id == Cerveza.id)
+                orden = [ranking.c.rango, Cerveza.nombre]
+            else:
+                query = query.filter(Cerveza.nombre.ilike(f"%{q}%"))
         if estilo:
             query = query.filter(Cerveza.estilo == estilo)
         if pais:
             query = query.filter(Cerveza.pais_procedencia == pais)
             
-        # Agrupamos por Cerveza para que func.avg() funcione por cada cerveza
-        query = query.group_by(Cerveza.id)
-            
-        return query.order_by(Cerveza.nombre).all()
+        return query.order_by(*orden).all()
 
     @staticmethod
     def get_cerveza_por_id(db: Session, cerveza_id: int) -> Cerveza | None:
@@ -77,12 +89,22 @@ class CervezaService:
             return None
         # Actualizar campos
         for key, value in cerveza_data.items():
-            if hasattr(db_cerveza, key):
+            if hasattr(db_cerveza, key) and key not in CAMPOS_AGREGADOS:
                 setattr(db_cerveza, key, value)
+        # Los países y estilos distintos de quienes la probaron se recuentan
+        estado = inspect(db_cerveza).attrs
+        if estado.estilo.history.has_changes() or estado.pais_procedencia.history.has_changes():
+            reglas_galardones.registrar_cambio_cerveza(db, cerveza_id)
         # Actualiza en base de datos
         db.add(db_cerveza)
+        cache.invalidar_al_confirmar(db, CACHE_LISTADO)
+        if 'estilo' in cerveza_data:
+            cache.invalidar_al_confirmar(db, CACHE_ESTILOS)
+        if 'pais_procedencia' in cerveza_data:
+            cache.invalidar_al_confirmar(db, CACHE_PAISES)
         db.commit()
         db.refresh(db_cerveza)
+        autocompletado.actualizar(db, "cervezas", db_cerveza.id, db_cerveza.nombre)
         return db_cerveza
 
     @staticmethod
@@ -95,21 +117,53 @@ class CervezaService:
             return None
         if db_cerveza:
             db.delete(db_cerveza)
+            cache.invalidar_al_confirmar(db, CACHE_LISTADO, CACHE_ESTILOS, CACHE_PAISES)
             db.commit()
+            autocompletado.quitar(db, "cervezas", cerveza_id)
             return True
         return False
 
     @staticmethod
     def get_valoracion_promedio(db: Session, cerveza_id: int) -> float:
         """
-        Calcula la valoración promedio (RF-3.4).
+        Devuelve la valoración promedio almacenada (RF-3.4).
         """
-        resultado = db.query(func.avg(DegustacionDB.puntuacion))\
-            .filter(DegustacionDB.cerveza_id == cerveza_id)\
+        resultado = db.query(Cerveza.valoracion_promedio)\
+            .filter(Cerveza.id == cerveza_id)\
             .scalar()
         
         return round(resultado, 2) if resultado is not None else 0.0
 
+    @staticmethod
+    def reconciliar_valoraciones(db: Session, cerveza_id: int = None) -> int:
+        """
+        Reconstruye en bloque los agregados de valoración (suma, total y
+        promedio) a partir de las degustaciones. Si se indica cerveza_id
+        solo se recalcula esa cerveza. Devuelve el número de cervezas
+        actualizadas.
+        """
+        # Subconsultas correlacionadas: 1 solo UPDATE para todas las cervezas
+        puntuadas = (DegustacionDB.cerveza_id == Cerveza.id) & DegustacionDB.puntuacion.isnot(None)
+        suma = select(func.coalesce(func.sum(DegustacionDB.puntuacion), 0))\
+            .where(puntuadas).scalar_subquery()
+        total = select(func.count(DegustacionDB.puntuacion))\
+            .where(puntuadas).scalar_subquery()
+        promedio = select(func.avg(DegustacionDB.puntuacion))\
+            .where(puntuadas).scalar_subquery()
+
+        sentencia = update(Cerveza).values(
+            suma_valoraciones=suma,
+            total_valoraciones=total,
+            valoracion_promedio=promedio
+        )
+        if cerveza_id is not None:
+            sentencia = sentencia.where(Cerveza.id == cerveza_id)
+
+        resultado = db.execute(sentencia.execution_options(synchronize_session=False))
+        cache.invalidar_al_confirmar(db, CACHE_LISTADO)
+        db.commit()
+        return resultado.rowcount
+
     @staticmethod
     def get_favoritas_usuario(db: Session, usuario_id: int) -> list[dict]:
         """
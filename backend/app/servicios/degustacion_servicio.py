@@ -1,11 +1,20 @@
 # Funciones relacionadas con el RF-3 (Degustaciones)
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+import base64
+from datetime import datetime
+from sqlalchemy.orm import Session, Query, object_session
+from sqlalchemy import func, desc, event, inspect, update, case, select, tuple_
 from typing import List, Optional, Dict, Any
 from app.objetos.degustacion import DegustacionDB, ComentarioDegustacion
 from app.objetos.cerveza import Cerveza
 from app.objetos.cerveceria import Cerveceria
+from app.objetos.usuario import UsuarioDB
+from app import cache
 from app.servicios import galardon_servicio
+from app.servicios.cerveza_servicio import CervezaService, CACHE_LISTADO
+from app.servicios import actividad_servicio, perfiles_carga
+
+# Columnas que solo mantiene el servidor (no editables por la API)
+CAMPOS_SERVIDOR = {'version'}
 
 # --- CRUD para Degustaciones ---
 
@@ -37,44 +46,114 @@ def crear_degustacion(db: Session, degustacion_data: dict) -> DegustacionDB:
             raise ValueError("La cervecería especificada no existe")
     
     # Crear la degustación
-    db_degustacion = DegustacionDB(**degustacion_data)
+    db_degustacion = DegustacionDB(**{k: v for k, v in degustacion_data.items()
+        if k not in CAMPOS_SERVIDOR})
+    # Los agregados de la cerveza (RF-3.4) se actualizan en el mismo flush
     db.add(db_degustacion)
+    db.flush()
+    # El feed de los amigos y los galardones del autor se encolan en la misma
+    # transacción y se calculan después de responder (ver servicios/trabajos)
+    actividad_servicio.difundir_en_segundo_plano(db, db_degustacion.id)
+    galardon_servicio.verificar_y_otorgar_galardones_por_degustacion(
+        db=db,
+        usuario_id=db_degustacion.usuario_id,
+        degustacion_nueva=db_degustacion
+    )
     db.commit()
     db.refresh(db_degustacion)
     
-    # Actualizar la valoración promedio de la cerveza (RF-3.4)
-    actualizar_valoracion_promedio_cerveza(db, degustacion_data['cerveza_id'])
-    
     return db_degustacion
 
 def obtener_degustacion(db: Session, degustacion_id: int) -> Optional[DegustacionDB]:
     """
     Obtiene una degustación por ID
     """
-    return db.query(DegustacionDB).filter(DegustacionDB.id == degustacion_id).first()
+    return db.query(DegustacionDB).options(*perfiles_carga.degustacion_listado())\
+        .filter(DegustacionDB.id == degustacion_id).first()
+
+def version_degustacion(db: Session, degustacion_id: int):
+    """
+    Lo que determina el detalle de una degustación sin cargarla: su
+    versión, el nombre del usuario y el de la cerveza. None si no existe.
+    """
+    return db.query(DegustacionDB.version, UsuarioDB.username, Cerveza.nombre)\
+        .outerjoin(UsuarioDB, UsuarioDB.id == DegustacionDB.usuario_id)\
+        .outerjoin(Cerveza, Cerveza.id == DegustacionDB.cerveza_id)\
+        .filter(DegustacionDB.id == degustacion_id).first()
 
-def obtener_todas_degustaciones(db: Session, skip: int = 0, limit: int = 100) -> List[DegustacionDB]:
+def obtener_todas_degustaciones(db: Session, skip: int = 0, limit: int = 100,
+    cursor: Optional[str] = None) -> List[DegustacionDB]:
     """
     Obtiene todas las degustaciones en la base de datos
     """
-    return db.query(DegustacionDB).order_by(desc(DegustacionDB.fecha_creacion))\
-        .offset(skip).limit(limit).all()
+    query = db.query(DegustacionDB).options(*perfiles_carga.degustacion_listado())
+    return _paginar_por_fecha(query, skip, limit, cursor).all()
 
-def obtener_degustaciones_por_usuario(db: Session, usuario_id: int, skip: int = 0, limit: int = 100) -> List[DegustacionDB]:
+def obtener_degustaciones_por_usuario(db: Session, usuario_id: int, skip: int = 0, limit: int = 100,
+    cursor: Optional[str] = None) -> List[DegustacionDB]:
     """
     Obtiene todas las degustaciones de un usuario
     """
-    return db.query(DegustacionDB).filter(
-        DegustacionDB.usuario_id == usuario_id
-    ).order_by(desc(DegustacionDB.fecha_creacion)).offset(skip).limit(limit).all()
+    query = db.query(DegustacionDB).options(*perfiles_carga.degustacion_listado())\
+        .filter(DegustacionDB.usuario_id == usuario_id)
+    return _paginar_por_fecha(query, skip, limit, cursor).all()
 
-def obtener_degustaciones_por_cerveza(db: Session, cerveza_id: int, skip: int = 0, limit: int = 100) -> List[DegustacionDB]:
+def obtener_degustaciones_por_cerveza(db: Session, cerveza_id: int, skip: int = 0, limit: int = 100,
+    cursor: Optional[str] = None) -> List[DegustacionDB]:
     """
     Obtiene todas las degustaciones de una cerveza
     """
-    return db.query(DegustacionDB).filter(
-        DegustacionDB.cerveza_id == cerveza_id
-    ).order_by(desc(DegustacionDB.fecha_creacion)).offset(skip).limit(limit).all()
+    query = db.query(DegustacionDB).options(*perfiles_carga.degustacion_listado())\
+        .filter(DegustacionDB.cerveza_id == cerveza_id)
+    return _paginar_por_fecha(query, skip, limit, cursor).all()
+
+# --- Paginación por cursor (keyset) sobre (fecha_creacion, id) ---
+
+def codificar_cursor(degustacion: DegustacionDB) -> str:
+    """
+    Genera el cursor opaco que apunta justo después de una degustación.
+    """
+    fecha = degustacion.fecha_creacion.isoformat() if degustacion.fecha_creacion else ""
+    return base64.urlsafe_b64encode(f"{degustacion.id}|{fecha}".encode()).decode()
+
+def _decodificar_cursor(cursor: str):
+    """
+    Devuelve (id, fecha_creacion) de un cursor. Lanza ValueError si no es válido.
+    """
+    try:
+        texto = base64.urlsafe_b64decode(cursor.encode()).decode()
+        degustacion_id, fecha = texto.split("|", 1)
+        return int(degustacion_id), (datetime.fromisoformat(fecha) if fecha else None)
+    except Exception:
+        raise ValueError("Cursor de paginación no válido")
+
+def _paginar_por_fecha(query: Query, skip: int, limit: int, cursor: Optional[str]) -> Query:
+    """
+    Ordena de más reciente a más antigua y pagina la consulta.
+    - cursor None: modo clásico OFFSET skip LIMIT limit.
+    - cursor "" (primera página) o un cursor: modo keyset, que continúa
+      tras la última fila vista usando los índices (…, fecha_creacion, id),
+      sin OFFSET y sin que las filas nuevas desplacen las páginas.
+    """
+    query = query.order_by(desc(DegustacionDB.fecha_creacion), desc(DegustacionDB.id))
+    if cursor is None:
+        return query.offset(skip).limit(limit)
+    if cursor:
+        ultimo_id, ultima_fecha = _decodificar_cursor(cursor)
+        # La fecha se toma de la propia fila (mismo formato que la columna);
+        # la del cursor solo se usa si esa fila se ha borrado entretanto
+        fecha_ref = func.coalesce(
+            select(DegustacionDB.fecha_creacion).where(DegustacionDB.id == ultimo_id).scalar_subquery(),
+            ultima_fecha
+        )
+        # Comparación de filas: el índice se busca por (…, fecha_creacion < ref)
+        # en vez de recorrer todas las entradas más nuevas; la cota sobre la
+        # fecha sola es para los motores que no usan rangos con tuplas (MySQL)
+        query = query.filter(
+            DegustacionDB.fecha_creacion <= fecha_ref,
+            tuple_(DegustacionDB.fecha_creacion, DegustacionDB.id) < tuple_(fecha_ref, ultimo_id)
+        )
+    return query.limit(limit)
 
 def actualizar_degustacion(db: Session, degustacion_id: int, degustacion_data: dict) -> Optional[DegustacionDB]:
     """
@@ -91,17 +170,13 @@ def actualizar_degustacion(db: Session, degustacion_id: int, degustacion_data: d
     
     # Actualizar campos
     for key, value in degustacion_data.items():
-        if hasattr(db_degustacion, key):
+        if hasattr(db_degustacion, key) and key not in CAMPOS_SERVIDOR:
             setattr(db_degustacion, key, value)
     
     db.add(db_degustacion)
     db.commit()
     db.refresh(db_degustacion)
     
-    # Actualizar valoración promedio si cambió la puntuación
-    if 'puntuacion' in degustacion_data:
-        actualizar_valoracion_promedio_cerveza(db, db_degustacion.cerveza_id)
-    
     return db_degustacion
 
 def eliminar_degustacion(db: Session, degustacion_id: int) -> bool:
@@ -110,11 +185,8 @@ def eliminar_degustacion(db: Session, degustacion_id: int) -> bool:
     """
     db_degustacion = obtener_degustacion(db, degustacion_id)
     if db_degustacion:
-        cerveza_id = db_degustacion.cerveza_id
         db.delete(db_degustacion)
         db.commit()
-        # Actualizar valoración promedio después de eliminar
-        actualizar_valoracion_promedio_cerveza(db, cerveza_id)
         return True
     return False
 
@@ -122,32 +194,81 @@ def eliminar_degustacion(db: Session, degustacion_id: int) -> bool:
 
 def actualizar_valoracion_promedio_cerveza(db: Session, cerveza_id: int):
     """
-    Calcula y actualiza la valoración promedio de una cerveza (RF-3.4)
+    Recalcula desde cero los agregados de valoración de una cerveza (RF-3.4).
+    Solo hace falta para reparar datos; el alta, edición y baja de
+    degustaciones ya los mantienen en O(1).
     """
-    # Calcular promedio de puntuaciones no nulas
-    result = db.query(
-        func.count(DegustacionDB.id).label('total'),
-        func.avg(DegustacionDB.puntuacion).label('promedio')
-    ).filter(
-        DegustacionDB.cerveza_id == cerveza_id,
-        DegustacionDB.puntuacion.isnot(None)
-    ).first()
-    
-    promedio = result.promedio if result and result.total > 0 else None
-    
-    # Actualizar la cerveza
-    cerveza = db.query(Cerveza).filter(Cerveza.id == cerveza_id).first()
-    if cerveza:
-        cerveza.valoracion_promedio = promedio
-        cerveza.total_valoraciones = result.total if result else 0
-        db.add(cerveza)
-        db.commit()
+    CervezaService.reconciliar_valoraciones(db, cerveza_id=cerveza_id)
+
+# --- Mantenimiento incremental de la valoración de las cervezas (RF-3.4) ---
+
+def _aplicar_deltas_valoracion(conexion, deltas: Dict[int, List[float]], degustacion: DegustacionDB):
+    """
+    Suma a cada cerveza su delta [suma, total] con un UPDATE atómico,
+    sin recorrer sus degustaciones, y recalcula el promedio con otro
+    UPDATE sobre los valores ya guardados (MySQL evalúa las asignaciones
+    de un SET en orden, así que en el mismo UPDATE vería la suma nueva).
+    El listado de cervezas en caché se invalida cuando la sesión de
+    'degustacion' haga commit.
+    """
+    cache.invalidar_al_confirmar(object_session(degustacion), CACHE_LISTADO)
+    cervezas = Cerveza.__table__
+    for cerveza_id, (delta_suma, delta_total) in deltas.items():
+        if cerveza_id is None or (delta_suma == 0 and delta_total == 0):
+            continue
+        de_la_cerveza = cervezas.c.id == cerveza_id
+        conexion.execute(
+            update(cervezas).where(de_la_cerveza).values(
+                suma_valoraciones=cervezas.c.suma_valoraciones + delta_suma,
+                total_valoraciones=cervezas.c.total_valoraciones + delta_total,
+            )
+        )
+        conexion.execute(
+            update(cervezas).where(de_la_cerveza).values(
+                valoracion_promedio=case((cervezas.c.total_valoraciones > 0,
+                    cervezas.c.suma_valoraciones / cervezas.c.total_valoraciones), else_=None)
+            )
+        )
+
+@event.listens_for(DegustacionDB, "after_insert")
+def _valoracion_tras_insertar(mapper, conexion, degustacion):
+    if degustacion.puntuacion is not None:
+        _aplicar_deltas_valoracion(conexion, {degustacion.cerveza_id: [degustacion.puntuacion, 1]}, degustacion)
+
+@event.listens_for(DegustacionDB, "after_update")
+def _valoracion_tras_actualizar(mapper, conexion, degustacion):
+    estado = inspect(degustacion)
+    hist_puntuacion = estado.attrs.puntuacion.history
+    hist_cerveza = estado.attrs.cerveza_id.history
+    if not hist_puntuacion.has_changes() and not hist_cerveza.has_changes():
+        return
+
+    # Valores anteriores al cambio (o los actuales si ese campo no cambió)
+    puntuacion_antes = hist_puntuacion.deleted[0] if hist_puntuacion.deleted else degustacion.puntuacion
+    cerveza_antes = hist_cerveza.deleted[0] if hist_cerveza.deleted else degustacion.cerveza_id
+
+    deltas = {}
+    if puntuacion_antes is not None:
+        delta = deltas.setdefault(cerveza_antes, [0, 0])
+        delta[0] -= puntuacion_antes
+        delta[1] -= 1
+    if degustacion.puntuacion is not None:
+        delta = deltas.setdefault(degustacion.cerveza_id, [0, 0])
+        delta[0] += degustacion.puntuacion
+        delta[1] += 1
+    _aplicar_deltas_valoracion(conexion, deltas, degustacion)
+
+@event.listens_for(DegustacionDB, "before_delete")
+def _valoracion_antes_de_eliminar(mapper, conexion, degustacion):
+    # También cubre el borrado en cascada al eliminar un usuario
+    if degustacion.puntuacion is not None:
+        _aplicar_deltas_valoracion(conexion, {degustacion.cerveza_id: [-degustacion.puntuacion, -1]}, degustacion)
 
 def obtener_degustaciones_mas_valoradas(db: Session, estilo: str = None, pais: str = None, skip: int = 0, limit: int = 20) -> List[DegustacionDB]:
     """
     Obtiene las degustaciones más valoradas con filtros (RF-5.6, RF-5.7)
     """
-    query = db.query(DegustacionDB).join(Cerveza).filter(
+    query = db.query(DegustacionDB).options(*perfiles_carga.degustacion_listado()).join(Cerveza).filter(
         DegustacionDB.puntuacion.isnot(None)
     )
     
@@ -159,27 +280,16 @@ def obtener_degustaciones_mas_valoradas(db: Session, estilo: str = None, pais: s
     
     return query.order_by(desc(DegustacionDB.puntuacion)).offset(skip).limit(limit).all()
 
-def obtener_actividad_amigos(db: Session, usuario_id: int, skip: int = 0, limit: int = 50) -> List[DegustacionDB]:
+def obtener_actividad_amigos(db: Session, usuario_id: int, skip: int = 0, limit: int = 50,
+    cursor: Optional[str] = None) -> List[DegustacionDB]:
     """
-    Obtiene la actividad reciente de degustaciones de amigos (RF-3.8, RF-5.3)
+    Obtiene la actividad reciente de degustaciones de amigos (RF-3.8, RF-5.3).
+    Con cursor (keyset) devuelve las siguientes a la última vista, como el
+    resto de listados de degustaciones. El feed lo sirve actividad_servicio.
     """
-    # Esta función asume que existe una relación de amistad en el modelo de usuario
-    # Necesitarías implementar la lógica específica según tu modelo de amistades
-    from app.objetos.usuario import UsuarioDB
-    
-    usuario = db.query(UsuarioDB).filter(UsuarioDB.id == usuario_id).first()
-    if not usuario or not hasattr(usuario, 'amigos'):
-        return []
-    
-    # Obtener IDs de amigos
-    amigos_ids = [amigo.id for amigo in usuario.amigos]
-    
-    if not amigos_ids:
-        return []
-    
-    return db.query(DegustacionDB).filter(
-        DegustacionDB.usuario_id.in_(amigos_ids)
-    ).order_by(desc(DegustacionDB.fecha_creacion)).offset(skip).limit(limit).all()
+    antes_de = _decodificar_cursor(cursor) if cursor else None
+    return actividad_servicio.obtener_actividad(db, usuario_id, skip=0 if cursor is not None else skip,
+        limit=limit, antes_de=antes_de)
 
 # --- Gestión de comentarios en degustaciones ---
 
@@ -199,25 +309,23 @@ def agregar_comentario_degustacion(db: Session, comentario_data: dict) -> Coment
     
     db_comentario = ComentarioDegustacion(**comentario_data)
     db.add(db_comentario)
+    db.flush()
+    
+    # Verificar galardones por interacción social (se evalúan tras el commit)
+    galardon_servicio.verificar_y_otorgar_galardones_por_comentario(
+        db=db,
+        usuario_id=comentario_data['usuario_id']
+    )
     db.commit()
     db.refresh(db_comentario)
     
-    # Verificar galardones por interacción social
-    try:
-        galardon_servicio.verificar_y_otorgar_galardones_por_comentario(
-            db=db,
-            usuario_id=comentario_data['usuario_id']
-        )
-    except Exception as e:
-        print(f"Error verificando galardones por comentario: {e}")
-    
     return db_comentario
 
 def obtener_comentarios_degustacion(db: Session, degustacion_id: int, skip: int = 0, limit: int = 100) -> List[ComentarioDegustacion]:
     """
     Obtiene todos los comentarios de una degustación
     """
-    return db.query(ComentarioDegustacion).filter(
+    return db.query(ComentarioDegustacion).options(*perfiles_carga.comentario_listado()).filter(
         ComentarioDegustacion.degustacion_id == degustacion_id
     ).order_by(ComentarioDegustacion.fecha_creacion).offset(skip).limit(limit).all()
 
@@ -225,7 +333,8 @@ def obtener_todos_comentarios(db: Session, skip: int = 0, limit: int = 100) -> L
     """
     Obtiene todos los comentarios en el sisteam
     """
-    return db.query(ComentarioDegustacion).order_by(ComentarioDegustacion.fecha_creacion)\
+    return db.query(ComentarioDegustacion).options(*perfiles_carga.comentario_listado())\
+        .order_by(ComentarioDegustacion.fecha_creacion)\
         .offset(skip).limit(limit).all()
 
 def obtener_comentario_degustacion_id(db: Session, comentario_id: int) -> ComentarioDegustacion:
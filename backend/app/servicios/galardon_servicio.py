@@ -1,9 +1,15 @@
 from flask import g
+from sqlalchemy import inspect
 from sqlalchemy.orm import Session
+from app import cache
 from app.objetos.galardon import Galardon, UsuarioGalardon
 from app.objetos.usuario import UsuarioDB
+from app.servicios import reglas_galardones
 import pdb
 
+# Etiqueta de caché del listado de galardones (ver app/cache.py)
+CACHE_GALARDONES = "galardones"
+
 # --- CRUD para la entidad Galardon (RF-4.5 Admin) ---
 
 def crear_galardon(db: Session, galardon: dict):
@@ -14,8 +20,16 @@ def crear_galardon(db: Session, galardon: dict):
     db_galardon = Galardon(**data_limpia)
     if obtener_galardon_por_nombre(db, db_galardon.nombre):
         raise ValueError("Ya existe un galardón con ese nombre")
+    # Comprueba que las condiciones se pueden evaluar
+    reglas_galardones.compilar(db_galardon.condiciones)
     # Añade a la base de datos
     db.add(db_galardon)
+    db.flush()
+    if db_galardon.condiciones:
+        # Los usuarios que ya cumplen las condiciones lo reciben en segundo plano
+        reglas_galardones.encolar_recalculo(db, [db_galardon.id])
+    cache.invalidar_al_confirmar(db, CACHE_GALARDONES)
+    reglas_galardones.invalidar_al_confirmar(db)
     db.commit()
     db.refresh(db_galardon)
     return db_galardon
@@ -43,9 +57,16 @@ def actualizar_galardon(db: Session, galardon_id: int, galardon: dict):
         if hasattr(db_galardon, key):
             if key=="nombre" and obtener_galardon_por_nombre(db, value):
                 raise ValueError("No puedes cambiar el nombre al de un galardón que ya exista")
+            if key=="condiciones":
+                reglas_galardones.compilar(value)
             setattr(db_galardon, key, value)
+    # Si cambian las condiciones se recalcula el progreso de todos en segundo plano
+    if inspect(db_galardon).attrs.condiciones.history.has_changes():
+        reglas_galardones.encolar_recalculo(db, [galardon_id])
     # Añade a la base de datos
     db.add(db_galardon)
+    cache.invalidar_al_confirmar(db, CACHE_GALARDONES)
+    reglas_galardones.invalidar_al_confirmar(db)
     db.commit()
     
     db.refresh(db_galardon)
@@ -56,6 +77,8 @@ def eliminar_galardon(db: Session, galardon_id: int):
     db_galardon = obtener_galardon(db, galardon_id)
     if db_galardon:
         db.delete(db_galardon)
+        cache.invalidar_al_confirmar(db, CACHE_GALARDONES)
+        reglas_galardones.invalidar_al_confirmar(db)
         db.commit()
         return True
     return False
@@ -137,30 +160,21 @@ def eliminar_galardon_usuario(db: Session, user_id: int, galardon_id: int) -> bo
         return False
 
 # --- Lógica de Negocio ---
-# Esta función la llamarán tus compañeros desde sus servicios
+# La llaman los servicios de degustaciones y comentarios dentro de su
+# transacción; las reglas están en servicios/reglas_galardones
 
 def verificar_y_otorgar_galardones_por_degustacion(db: Session, usuario_id: int, degustacion_nueva):
     """
-    Servicio que llamará Diego (Degustación) cada vez que se cree una.
-    Aquí va la lógica para RF-4.1, RF-4.2, RF-4.3
+    Cuenta la degustación recién creada (ya con flush) en los contadores del
+    usuario y encola la actualización de los galardones que dependen de
+    ellos (RF-4.1, RF-4.2, RF-4.3), que se hace tras el commit. No hace commit.
     """
-    
-    # 1. Obtener todos los galardones de tipo 'cantidad_cervezas', 'pais', 'estilo'
-    # 2. Obtener el progreso actual del usuario para esos galardones
-    # 3. Lógica de ejemplo para "Maestro de IPA"
-    #    (Necesitarás info de la degustacion_nueva)
-    #    if degustacion_nueva.cerveza.estilo == "IPA":
-    #       ... incrementar progreso para galardón "Maestro de IPA"
-    
-    # (Implementar lógica de incremento y subida de nivel aquí)
-    print(f"Verificando galardones para usuario {usuario_id} por nueva degustación...")
-    pass
+    reglas_galardones.registrar_degustacion(db, degustacion_nueva)
 
 def verificar_y_otorgar_galardones_por_comentario(db: Session, usuario_id: int):
     """
-    Servicio que llamará Matías (Social) cada vez que se cree un comentario.
-    Lógica para RF-4.3 (interacciones sociales).
+    Cuenta el comentario recién creado (ya con flush) y encola la
+    actualización de los galardones de interacción social (RF-4.3), que
+    se hace tras el commit. No hace commit.
     """
-    print(f"Verificando galardones para usuario {usuario_id} por nuevo comentario...")
-    pass
-
+    reglas_galardones.registrar_comentario(db, usuario_id)
@@ -0,0 +1,218 @@
+"""
+Utilidades de geolocalización (RNF-8) para las búsquedas por cercanía.
+
+Las cervecerías guardan un geohash de sus coordenadas en una columna con
+índice B-tree: puntos cercanos comparten prefijo, así que "cervecerías en
+esta zona" se traduce en unos pocos rangos del índice
+(geohash >= prefijo AND geohash < siguiente prefijo) en vez de recorrer la tabla.
+
+Para consultas en lote (muchos puntos a la vez) las distancias se calculan
+con NumPy sobre arrays de coordenadas, sin bucles en Python.
+"""
+import math
+from typing import Optional
+import numpy as np
+
+RADIO_TIERRA_KM = 6371.0
+KM_POR_GRADO_LAT = 111.32
+
+# Precisión del geohash guardado: 9 caracteres son celdas de ~5 m
+PRECISION_GEOHASH = 9
+# Máximo de celdas (rangos del índice) con las que se cubre una zona
+MAX_CELDAS = 16
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Máximo de celdas de la matriz de distancias que se calculan de una vez
+# (float64: 2M celdas ~ 16 MB por cada array intermedio)
+MAX_CELDAS_MATRIZ = 2_000_000
+# Orígenes por bloque en las consultas en lote con radio
+TAM_BLOQUE_ORIGENES = 64
+
+
+def codificar_geohash(lat: float, lon: float, precision: int = PRECISION_GEOHASH) -> str:
+    """Codifica unas coordenadas como geohash de 'precision' caracteres."""
+    rango_lat = [-90.0, 90.0]
+    rango_lon = [-180.0, 180.0]
+    caracteres = []
+    bit, valor, es_lon = 0, 0, True
+    while len(caracteres) < precision:
+        rango = rango_lon if es_lon else rango_lat
+        coordenada = lon if es_lon else lat
+        medio = (rango[0] + rango[1]) / 2
+        valor <<= 1
+        if coordenada >= medio:
+            valor |= 1
+            rango[0] = medio
+        else:
+            rango[1] = medio
+        es_lon = not es_lon
+        bit += 1
+        if bit == 5:
+            caracteres.append(_BASE32[valor])
+            bit, valor = 0, 0
+    return "".join(caracteres)
+
+
+def fin_prefijo(prefijo: str) -> Optional[str]:
+    """
+    Primer geohash que ya no empieza por 'prefijo' (incrementando su último
+    carácter dentro del alfabeto), para el rango geohash >= prefijo AND
+    geohash < fin. Solo usa caracteres del alfabeto, que se ordenan igual
+    con cualquier collation (con prefijo + '~' el rango queda vacío en las
+    que ordenan '~' antes que letras y dígitos). None si no hay fin: el
+    prefijo es todo 'z'.
+    """
+    while prefijo:
+        posicion = _BASE32.index(prefijo[-1])
+        if posicion + 1 < len(_BASE32):
+            return prefijo[:-1] + _BASE32[posicion + 1]
+        prefijo = prefijo[:-1]
+    return None
+
+
+def tamano_celda(precision: int) -> tuple[float, float]:
+    """Alto y ancho en grados de una celda de geohash de esa precisión."""
+    bits = 5 * precision
+    bits_lon = (bits + 1) // 2
+    bits_lat = bits // 2
+    return 180.0 / (2 ** bits_lat), 360.0 / (2 ** bits_lon)
+
+
+def caja_alrededor(lat: float, lon: float, radio_km: float) -> tuple[float, float, float, float]:
+    """
+    Caja (lat_min, lat_max, lon_min, lon_max) que contiene el círculo de
+    radio_km alrededor del punto. Las longitudes pueden salirse de
+    [-180, 180] si la caja cruza el antimeridiano.
+    """
+    d_lat = radio_km / KM_POR_GRADO_LAT
+    lat_min, lat_max = max(lat - d_lat, -90.0), min(lat + d_lat, 90.0)
+    coseno = math.cos(math.radians(max(abs(lat_min), abs(lat_max))))
+    if coseno < 1e-6 or radio_km / (KM_POR_GRADO_LAT * coseno) >= 180:
+        # Cerca de los polos el círculo abarca todas las longitudes
+        return lat_min, lat_max, -180.0, 180.0
+    d_lon = radio_km / (KM_POR_GRADO_LAT * coseno)
+    return lat_min, lat_max, lon - d_lon, lon + d_lon
+
+
+def _normalizar_lon(lon: float) -> float:
+    return ((lon + 180.0) % 360.0) - 180.0
+
+
+def prefijos_caja(lat_min: float, lat_max: float, lon_min: float, lon_max: float,
+                  max_celdas: int = MAX_CELDAS) -> list[str]:
+    """
+    Prefijos de geohash cuyas celdas cubren la caja. Se usa la precisión
+    más fina que no supere max_celdas, para que cada prefijo sea un rango
+    corto del índice.
+    """
+    for precision in range(PRECISION_GEOHASH, 0, -1):
+        alto, ancho = tamano_celda(precision)
+        # La rejilla del geohash está alineada con (-90, -180), y esos
+        # valores son múltiplos exactos del tamaño de celda
+        filas = range(math.floor(lat_min / alto), math.floor(lat_max / alto) + 1)
+        columnas = range(math.floor(lon_min / ancho), math.floor(lon_max / ancho) + 1)
+        if len(columnas) * ancho >= 360.0:
+            columnas = range(math.floor(-180.0 / ancho), math.floor(180.0 / ancho))
+        if len(filas) * len(columnas) <= max_celdas or precision == 1:
+            break
+
+    prefijos = set()
+    for fila in filas:
+        lat_centro = min(max((fila + 0.5) * alto, -90.0), 90.0)
+        for columna in columnas:
+            lon_centro = _normalizar_lon((columna + 0.5) * ancho)
+            prefijos.add(codificar_geohash(lat_centro, lon_centro, precision))
+    return sorted(prefijos)
+
+
+def distancia_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distancia en km entre dos puntos (fórmula del haversine)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def matriz_distancias_km(lats_origen, lons_origen, lats_destino, lons_destino) -> np.ndarray:
+    """
+    Matriz M×N de distancias en km (haversine) entre M orígenes y N
+    destinos, calculada con NumPy por difusión (broadcasting).
+    """
+    phi1 = np.radians(np.asarray(lats_origen, dtype=np.float64))[:, None]
+    lambda1 = np.radians(np.asarray(lons_origen, dtype=np.float64))[:, None]
+    phi2 = np.radians(np.asarray(lats_destino, dtype=np.float64))[None, :]
+    lambda2 = np.radians(np.asarray(lons_destino, dtype=np.float64))[None, :]
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin((lambda2 - lambda1) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _k_menores(distancias: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Índices y valores de las k menores distancias de cada fila, ordenados."""
+    k = min(k, distancias.shape[1])
+    # argpartition elige los k menores en O(N); solo esos se ordenan
+    indices = np.argpartition(distancias, k - 1, axis=1)[:, :k]
+    valores = np.take_along_axis(distancias, indices, axis=1)
+    orden = np.argsort(valores, axis=1, kind="stable")
+    return np.take_along_axis(indices, orden, axis=1), np.take_along_axis(valores, orden, axis=1)
+
+
+def k_mas_cercanos(lats_origen, lons_origen, lats_destino, lons_destino,
+                   k: int, radio_km: float = None) -> list[list[tuple[int, float]]]:
+    """
+    Para cada origen, los k destinos más cercanos (dentro de radio_km si se
+    indica) como lista de (índice del destino, distancia km) ordenada por
+    distancia.
+
+    La matriz de distancias se calcula por bloques de orígenes sin pasar de
+    MAX_CELDAS_MATRIZ celdas. Con radio, los orígenes se agrupan por
+    geohash (bloques compactos en el mapa) y cada bloque solo se compara con
+    los destinos de su caja, no con todos.
+    """
+    lats_o = np.asarray(lats_origen, dtype=np.float64)
+    lons_o = np.asarray(lons_origen, dtype=np.float64)
+    lats_d = np.asarray(lats_destino, dtype=np.float64)
+    lons_d = np.asarray(lons_destino, dtype=np.float64)
+    resultados = [[] for _ in range(len(lats_o))]
+    if len(lats_d) == 0 or k <= 0:
+        return resultados
+
+    if radio_km is None:
+        orden = np.arange(len(lats_o))
+        bloque = max(1, MAX_CELDAS_MATRIZ // len(lats_d))
+    else:
+        orden = np.array(sorted(range(len(lats_o)),
+            key=lambda i: codificar_geohash(lats_o[i], lons_o[i], 6)), dtype=np.int64)
+        bloque = TAM_BLOQUE_ORIGENES
+
+    for inicio in range(0, len(orden), bloque):
+        origenes = orden[inicio:inicio + bloque]
+        destinos = np.arange(len(lats_d))
+        if radio_km is not None:
+            lat_min, _, _, _ = caja_alrededor(lats_o[origenes].min(), 0.0, radio_km)
+            _, lat_max, _, _ = caja_alrededor(lats_o[origenes].max(), 0.0, radio_km)
+            mascara = (lats_d >= lat_min) & (lats_d <= lat_max)
+            _, _, lon_min, _ = caja_alrededor(lat_max if abs(lat_max) > abs(lat_min) else lat_min,
+                                              lons_o[origenes].min(), radio_km)
+            _, _, _, lon_max = caja_alrededor(lat_max if abs(lat_max) > abs(lat_min) else lat_min,
+                                              lons_o[origenes].max(), radio_km)
+            if lon_min >= -180 and lon_max <= 180:
+                mascara &= (lons_d >= lon_min) & (lons_d <= lon_max)
+            destinos = np.nonzero(mascara)[0]
+            if len(destinos) == 0:
+                continue
+
+        # Si el bloque aún es grande, se parte para no pasar de MAX_CELDAS_MATRIZ
+        paso = max(1, MAX_CELDAS_MATRIZ // len(destinos))
+        for sub in range(0, len(origenes), paso):
+            filas = origenes[sub:sub + paso]
+            distancias = matriz_distancias_km(lats_o[filas], lons_o[filas],
+                                              lats_d[destinos], lons_d[destinos])
+            if radio_km is not None:
+                distancias[distancias > radio_km] = np.inf
+            indices, valores = _k_menores(distancias, k)
+            for fila, fila_indices, fila_valores in zip(filas.tolist(), indices.tolist(), valores.tolist()):
+                resultados[fila] = [(int(destinos[indice]), distancia) for indice, distancia
+                                    in zip(fila_indices, fila_valores) if distancia != math.inf]
+    return resultados
@@ -0,0 +1,83 @@
+"""
+Hash de contraseñas con bcrypt en un pool de hilos acotado.
+
+bcrypt es lento a propósito (~250 ms con coste 12), así que una ráfaga
+de logins podría ocupar todos los hilos del servidor calculando hashes.
+Aquí los hashes se calculan en un pool de BCRYPT_HILOS hilos (bcrypt
+libera el GIL, así que usan varios núcleos) con una cola de como mucho
+BCRYPT_COLA_MAXIMA trabajos entre pendientes y en curso. Si la cola está
+llena no se espera: se lanza HashSaturado y el controlador responde 429,
+de modo que el resto de endpoints siguen atendiéndose.
+
+El coste (BCRYPT_COSTE) se puede cambiar en cualquier momento: los
+hashes con otro coste se siguen aceptando y, en el siguiente login
+correcto, se recalculan con el coste actual (ver verificar()).
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+COSTE = int(os.getenv("BCRYPT_COSTE", "12"))
+HILOS = int(os.getenv("BCRYPT_HILOS", str(os.cpu_count() or 1)))
+COLA_MAXIMA = int(os.getenv("BCRYPT_COLA_MAXIMA", str(4 * HILOS)))
+
+
+class HashSaturado(Exception):
+    """El pool de hash tiene la cola llena: hay que reintentar más tarde."""
+
+
+def _crear_contexto(coste: int) -> CryptContext:
+    # min_rounds = max_rounds = coste: cualquier otro coste "necesita actualizarse"
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=coste,
+        bcrypt__min_rounds=coste, bcrypt__max_rounds=coste)
+
+
+pwd_context = None
+_pool = None
+_plazas = None
+
+
+def configurar(coste: int = COSTE, hilos: int = HILOS, cola_maxima: int = COLA_MAXIMA):
+    """(Re)crea el contexto de passlib y el pool con esa configuración."""
+    global pwd_context, _pool, _plazas
+    if not 4 <= coste <= 31:
+        raise ValueError("BCRYPT_COSTE debe estar entre 4 y 31")
+    anterior = _pool
+    pwd_context = _crear_contexto(coste)
+    _pool = ThreadPoolExecutor(max_workers=max(1, hilos), thread_name_prefix="bcrypt")
+    _plazas = threading.BoundedSemaphore(max(1, cola_maxima))
+    if anterior is not None:
+        anterior.shutdown(wait=False)
+
+
+configurar()
+
+
+def _ejecutar(funcion, *args):
+    """Ejecuta 'funcion' en el pool y espera el resultado, o lanza HashSaturado."""
+    plazas = _plazas
+    if not plazas.acquire(blocking=False):
+        raise HashSaturado("Demasiadas peticiones de autenticación en curso; reintenta en unos segundos.")
+    try:
+        return _pool.submit(funcion, *args).result()
+    finally:
+        plazas.release()
+
+
+def hashear(password: str) -> str:
+    """Hash bcrypt de la contraseña con el coste actual."""
+    return _ejecutar(pwd_context.hash, password)
+
+
+def verificar(password: str, hash_guardado: str) -> tuple[bool, str | None]:
+    """
+    Comprueba la contraseña. Devuelve (correcta, nuevo_hash): nuevo_hash
+    solo viene si es correcta y el hash guardado tiene otro coste.
+    """
+    return _ejecutar(pwd_context.verify_and_update, password, hash_guardado)
+
+
+def coste_de(hash_guardado: str) -> int:
+    """Coste con el que se calculó un hash bcrypt ($2b$<coste>$...)."""
+    return int(hash_guardado.split("$")[2])
@@ -0,0 +1,39 @@
+# Perfiles de carga de relaciones (eager loading) que aplican los servicios
+# para que serializar una lista cueste un número fijo de consultas (sin N+1).
+# Son funciones (y no constantes) para no configurar los mappers al importar.
+from sqlalchemy.orm import joinedload, selectinload
+from app.objetos.degustacion import DegustacionDB, ComentarioDegustacion
+from app.objetos.usuario import UsuarioDB
+
+def degustacion_listado() -> tuple:
+    """
+    Lo que lee DegustacionDB.to_dict(): el nombre del usuario y de la cerveza.
+    Son relaciones muchos-a-uno, así que se traen en el mismo SELECT (JOIN).
+    """
+    return (
+        joinedload(DegustacionDB.usuario),
+        joinedload(DegustacionDB.cerveza),
+    )
+
+def comentario_listado() -> tuple:
+    """
+    Lo que lee ComentarioDegustacion.to_dict(): el autor del comentario.
+    """
+    return (
+        joinedload(ComentarioDegustacion.usuario),
+    )
+
+def usuario_campos(campos: tuple) -> tuple:
+    """
+    Precarga solo las relaciones que necesitan los campos pedidos de
+    UsuarioDB.to_dict(). Son colecciones, así que se cargan con un SELECT
+    ... IN adicional por relación (selectinload) en vez de uno por usuario.
+    """
+    opciones = []
+    if "friends" in campos:
+        opciones.append(selectinload(UsuarioDB.friends))
+    if "galardones_obtenidos" in campos:
+        opciones.append(selectinload(UsuarioDB.galardones_obtenidos))
+    if "degustaciones" in campos:
+        opciones.append(selectinload(UsuarioDB.degustaciones).joinedload(DegustacionDB.cerveza))
+    return tuple(opciones)
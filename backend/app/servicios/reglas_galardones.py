@@ -0,0 +1,584 @@
+# Motor de reglas de galardones (RF-4.1, RF-4.2, RF-4.3)
+#
+# Las 'condiciones' de un galardón son umbrales sobre contadores del
+# usuario, p. ej. {"cervezas_minimas": 3} o {"paises_minimos": 2,
+# "ipas_minimas": 1} (todas a la vez). El nivel es cuántas veces se
+# alcanzan los umbrales (3 cervezas: nivel 1, 6 cervezas: nivel 2) y el
+# galardón se otorga al llegar a nivel 1; progreso_actual es el valor del
+# contador que más lejos está de su umbral.
+#
+# Las condiciones se compilan una vez por proceso en reglas indexadas por
+# contador (RegistroReglas). Una degustación o un comentario nuevo suma
+# a los contadores que mueve y solo evalúa los galardones que dependen de
+# ellos: el coste es O(reglas afectadas), no O(historial del usuario).
+#
+# Los contadores viven en usuario_contadores. Los de valores distintos
+# (cervezas, países, estilos, IPAs) se apoyan en usuario_distintos, que
+# guarda cuántas degustaciones tiene el usuario de cada valor. Los
+# contadores se escriben en la transacción de la operación que los mueve;
+# al crear una degustación o un comentario, la evaluación de los galardones
+# se encola en esa transacción y se hace tras responder (servicios/trabajos):
+#   - crear_degustacion:        registrar_degustacion()
+#   - agregar_comentario:       registrar_comentario()
+#   - borrar o editar degustaciones y borrar comentarios: eventos de mapper
+#   - delete_usuario:           quitar_usuario()
+# Un usuario sin contadores (datos anteriores a este motor) se siembra con
+# agregados de su historial la primera vez que se le toca. Los galardones
+# no se quitan: al borrar degustaciones baja el progreso, no el nivel.
+#
+# Las filas nuevas (un valor distinto o la siembra) se insertan en un
+# SAVEPOINT: si otra transacción simultánea del mismo usuario ha insertado
+# la misma clave y ha confirmado antes, se deshace solo el INSERT y se suma
+# a su fila, en vez de fallar la degustación entera.
+#
+# Al crear un galardón o cambiar sus condiciones se recalcula para todos
+# los usuarios en segundo plano (encolar_recalculo), por lotes de usuarios
+# y con SQL agrupado; también con flask --app app.main recalcular-galardones.
+import os
+import threading
+import time
+import weakref
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import String, and_, bindparam, cast, delete, event, func, insert, inspect, literal, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.objetos.cerveza import Cerveza
+from app.objetos.degustacion import ComentarioDegustacion, DegustacionDB
+from app.objetos.galardon import Galardon, UsuarioContador, UsuarioDistinto, UsuarioGalardon
+from app.objetos.usuario import UsuarioDB
+from app.servicios import trabajos
+
+RECARGA_REGLAS_SEGUNDOS = float(os.getenv("GALARDONES_RECARGA_SEGUNDOS", "60"))
+# Usuarios por transacción al recalcular en bloque
+USUARIOS_POR_LOTE = int(os.getenv("GALARDONES_USUARIOS_POR_LOTE", "2000"))
+
+# Clave de 'condiciones' -> contador del usuario que compara con su umbral
+CONDICIONES = {
+    "degustaciones_minimas": "degustaciones",
+    "cervezas_minimas": "cervezas",
+    "paises_minimos": "paises",
+    "estilos_minimos": "estilos",
+    "ipas_minimas": "ipas",
+    "comentarios_minimos": "comentarios",
+}
+# Dimensión de usuario_distintos -> contador de valores distintos
+DISTINTOS = {"cerveza": "cervezas", "pais": "paises", "estilo": "estilos", "ipa": "ipas"}
+CONTADORES = ("degustaciones", "comentarios") + tuple(DISTINTOS.values())
+
+contadores = UsuarioContador.__table__
+distintos = UsuarioDistinto.__table__
+usuario_galardones = UsuarioGalardon.__table__
+degustaciones = DegustacionDB.__table__
+cervezas = Cerveza.__table__
+comentarios = ComentarioDegustacion.__table__
+
+
+def es_ipa(estilo) -> bool:
+    """Cuenta como IPA todo estilo que lo lleve en el nombre (IPA, Double IPA...)."""
+    return bool(estilo) and "IPA" in estilo.upper()
+
+
+def _claves_degustacion(cerveza_id: int, pais, estilo) -> Dict[str, str]:
+    """Valor de cada dimensión de usuario_distintos que aporta una degustación."""
+    claves = {"cerveza": str(cerveza_id)}
+    if pais:
+        claves["pais"] = pais
+    if estilo:
+        claves["estilo"] = estilo
+    if es_ipa(estilo):
+        claves["ipa"] = str(cerveza_id)
+    return claves
+
+
+def _claves_sql():
+    """Lo mismo que _claves_degustacion en SQL: dimensión -> (clave, filtro)."""
+    return {
+        "cerveza": (cast(degustaciones.c.cerveza_id, String), None),
+        "pais": (cervezas.c.pais_procedencia, func.coalesce(cervezas.c.pais_procedencia, "") != ""),
+        "estilo": (cervezas.c.estilo, func.coalesce(cervezas.c.estilo, "") != ""),
+        "ipa": (cast(degustaciones.c.cerveza_id, String), func.upper(cervezas.c.estilo).like("%IPA%")),
+    }
+
+
+# --- Compilación de reglas ---
+
+def compilar(condiciones) -> List[Tuple[str, int]]:
+    """
+    [(contador, umbral)] de las 'condiciones' de un galardón ([] si no
+    tiene: se asigna a mano). Lanza ValueError si alguna no se entiende.
+    """
+    if not condiciones:
+        return []
+    if not isinstance(condiciones, dict):
+        raise ValueError("Las condiciones del galardón deben ser un objeto JSON")
+    umbrales = []
+    for clave, umbral in condiciones.items():
+        if clave not in CONDICIONES:
+            raise ValueError(f"Condición de galardón desconocida: '{clave}' "
+                             f"(válidas: {', '.join(CONDICIONES)})")
+        if isinstance(umbral, bool) or not isinstance(umbral, int) or umbral < 1:
+            raise ValueError(f"La condición '{clave}' debe ser un entero positivo")
+        umbrales.append((CONDICIONES[clave], umbral))
+    return umbrales
+
+
+class Regla:
+    """Condiciones de un galardón ya compiladas."""
+
+    def __init__(self, galardon_id: int, condiciones):
+        self.galardon_id = galardon_id
+        self.umbrales = compilar(condiciones)
+
+    def evaluar(self, valores: Dict[str, int]) -> Tuple[int, int]:
+        """(nivel, progreso) con los contadores del usuario 'valores'."""
+        nivel, progreso = None, 0
+        for contador, umbral in self.umbrales:
+            valor = valores.get(contador, 0)
+            if nivel is None or valor // umbral < nivel:
+                nivel, progreso = valor // umbral, valor
+        return nivel or 0, progreso
+
+
+class RegistroReglas:
+    """Reglas de todos los galardones, indexadas por los contadores que miran."""
+
+    def __init__(self, filas=()):
+        self.por_contador = {}
+        for galardon_id, condiciones in filas:
+            try:
+                regla = Regla(galardon_id, condiciones)
+            except ValueError as e:
+                print(f"AVISO: el galardón {galardon_id} no se evalúa: {e}")
+                continue
+            for contador in {contador for contador, _ in regla.umbrales}:
+                self.por_contador.setdefault(contador, []).append(regla)
+        self.cargado = time.monotonic()
+
+    def todas(self) -> List[Regla]:
+        """Todas las reglas, una por galardón."""
+        return self.afectadas(self.por_contador)
+
+    def afectadas(self, contadores_movidos: Iterable[str]) -> List[Regla]:
+        """Reglas que dependen de alguno de esos contadores, sin repetir."""
+        reglas = {}
+        for contador in contadores_movidos:
+            for regla in self.por_contador.get(contador, ()):
+                reglas[regla.galardon_id] = regla
+        return list(reglas.values())
+
+
+# Registros ya compilados, por engine
+_registros = weakref.WeakKeyDictionary()
+_cerrojo = threading.Lock()
+
+
+def _engine(ejecutor):
+    return ejecutor.get_bind() if isinstance(ejecutor, Session) else ejecutor.engine
+
+
+def _registro(ejecutor) -> RegistroReglas:
+    """Registro del engine de 'ejecutor', recompilándolo si ha caducado."""
+    engine = _engine(ejecutor)
+    with _cerrojo:
+        registro = _registros.get(engine)
+    if registro is not None and time.monotonic() - registro.cargado < RECARGA_REGLAS_SEGUNDOS:
+        return registro
+    registro = RegistroReglas(ejecutor.execute(select(Galardon.id, Galardon.condiciones)).all())
+    with _cerrojo:
+        _registros[engine] = registro
+    return registro
+
+
+def invalidar_al_confirmar(db: Session):
+    """Las reglas se recompilan cuando 'db' confirme (galardón creado, editado o borrado)."""
+    db.info["reglas_galardones"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidar_tras_commit(sesion):
+    if sesion.info.pop("reglas_galardones", None):
+        with _cerrojo:
+            _registros.pop(sesion.get_bind(), None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_tras_rollback(sesion):
+    sesion.info.pop("reglas_galardones", None)
+
+
+# --- Contadores ---
+
+def _sumar(ejecutor, usuario_id: int, deltas: Dict[str, int]) -> bool:
+    """
+    Suma a cada contador del usuario su delta. Devuelve False (sin tocar
+    nada más) si el usuario todavía no tiene contadores.
+    """
+    for contador, delta in deltas.items():
+        if delta == 0:
+            continue
+        resultado = ejecutor.execute(update(contadores)
+            .where(contadores.c.usuario_id == usuario_id, contadores.c.contador == contador)
+            .values(valor=contadores.c.valor + delta))
+        if resultado.rowcount == 0:
+            return False
+    return True
+
+
+def _conexion(ejecutor):
+    # SAVEPOINT en la conexión y no en la sesión: deshacerlo no dispara los
+    # after_rollback de la sesión (que descartan trabajos e invalidaciones)
+    return ejecutor.connection() if isinstance(ejecutor, Session) else ejecutor
+
+
+def _insertar_nueva(ejecutor, insercion) -> bool:
+    """
+    Ejecuta 'insercion' en un SAVEPOINT. Devuelve False, sin haber escrito
+    nada, si otra transacción ya ha confirmado la misma clave.
+    """
+    conexion = _conexion(ejecutor)
+    try:
+        with conexion.begin_nested():
+            conexion.execute(insercion)
+        return True
+    except IntegrityError:
+        return False
+
+
+def _anotar_distintos(ejecutor, usuario_id: int, claves: Dict[str, str], signo: int) -> Dict[str, int]:
+    """
+    Suma (signo 1) o resta (signo -1) una degustación a cada valor de
+    'claves' y devuelve el delta de los contadores de distintos: +1 si
+    el valor es nuevo para el usuario, -1 si era su última degustación.
+    """
+    deltas = {}
+    for dimension, clave in claves.items():
+        fila = and_(distintos.c.usuario_id == usuario_id, distintos.c.dimension == dimension,
+                    distintos.c.clave == clave)
+        actualizadas = ejecutor.execute(update(distintos).where(fila)
+            .values(veces=distintos.c.veces + signo)).rowcount
+        if signo > 0 and not actualizadas:
+            if _insertar_nueva(ejecutor, insert(distintos).values(usuario_id=usuario_id,
+                    dimension=dimension, clave=clave, veces=1)):
+                deltas[DISTINTOS[dimension]] = 1
+            else:
+                # Otra degustación simultánea del mismo valor lo ha anotado antes
+                ejecutor.execute(update(distintos).where(fila).values(veces=distintos.c.veces + 1))
+        elif signo < 0 and ejecutor.execute(delete(distintos).where(fila, distintos.c.veces <= 0)).rowcount:
+            deltas[DISTINTOS[dimension]] = -1
+    return deltas
+
+
+def sembrar(ejecutor, filtro_usuarios) -> None:
+    """
+    (Re)calcula desde el historial los contadores de los usuarios que
+    cumplen 'filtro_usuarios(columna_usuario_id)', con INSERT ... SELECT
+    agrupados (sin cargar degustaciones). Es lo que hace falta una vez por
+    usuario con datos anteriores a los contadores, o para repararlos.
+    """
+    usuarios = UsuarioDB.__table__
+    ejecutor.execute(delete(distintos).where(filtro_usuarios(distintos.c.usuario_id)))
+    ejecutor.execute(delete(contadores).where(filtro_usuarios(contadores.c.usuario_id)))
+
+    degustaciones_y_cervezas = degustaciones.join(cervezas, cervezas.c.id == degustaciones.c.cerveza_id)
+    for dimension, (clave, filtro) in _claves_sql().items():
+        consulta = select(degustaciones.c.usuario_id, literal(dimension), clave, func.count())\
+            .select_from(degustaciones_y_cervezas)\
+            .where(filtro_usuarios(degustaciones.c.usuario_id))\
+            .group_by(degustaciones.c.usuario_id, clave)
+        if filtro is not None:
+            consulta = consulta.where(filtro)
+        ejecutor.execute(insert(distintos).from_select(["usuario_id", "dimension", "clave", "veces"], consulta))
+
+    # Un contador por usuario y tipo, también los que valen 0
+    totales = {
+        "degustaciones": lambda u: select(func.count()).select_from(degustaciones)
+            .where(degustaciones.c.usuario_id == u),
+        "comentarios": lambda u: select(func.count()).select_from(comentarios)
+            .where(comentarios.c.usuario_id == u),
+    }
+    for dimension, contador in DISTINTOS.items():
+        totales[contador] = lambda u, dimension=dimension: select(func.count()).select_from(distintos)\
+            .where(distintos.c.usuario_id == u, distintos.c.dimension == dimension)
+    for contador, total in totales.items():
+        ejecutor.execute(insert(contadores).from_select(["usuario_id", "contador", "valor"],
+            select(usuarios.c.id, literal(contador), total(usuarios.c.id).scalar_subquery())
+            .where(filtro_usuarios(usuarios.c.id))))
+
+
+def _sembrar_usuario(ejecutor, usuario_id: int) -> bool:
+    """
+    Siembra los contadores de un usuario que aún no los tenía (su
+    historial ya incluye el cambio en curso). Devuelve False, sin haber
+    escrito nada, si otra transacción simultánea los ha sembrado antes.
+    """
+    conexion = _conexion(ejecutor)
+    try:
+        with conexion.begin_nested():
+            sembrar(conexion, lambda columna: columna == usuario_id)
+        return True
+    except IntegrityError:
+        return False
+
+
+def _sumar_o_sembrar(ejecutor, usuario_id: int, deltas: Dict[str, int]) -> bool:
+    """
+    Suma 'deltas' a los contadores del usuario o, si aún no tiene, los
+    siembra. Devuelve True si los ha sembrado (ya incluyen el cambio).
+    """
+    if _sumar(ejecutor, usuario_id, deltas):
+        return False
+    if _sembrar_usuario(ejecutor, usuario_id):
+        return True
+    # Los ha sembrado otra transacción, sin este cambio: se suma a los suyos
+    _sumar(ejecutor, usuario_id, deltas)
+    return False
+
+
+# --- Evaluación ---
+
+def _cambios(usuario_id: int, reglas: List[Regla], valores: Dict[str, int], actuales: Dict[int, Tuple[int, int]]):
+    """
+    Filas de usuario_galardones que hay que insertar y actualizar para
+    el usuario según sus contadores 'valores' y su estado 'actuales'
+    (galardon_id -> (nivel, progreso)).
+    """
+    nuevas, cambiadas = [], []
+    for regla in reglas:
+        nivel, progreso = regla.evaluar(valores)
+        fila = {"u": usuario_id, "g": regla.galardon_id, "n": nivel, "p": progreso}
+        if regla.galardon_id not in actuales:
+            if nivel >= 1:
+                nuevas.append(fila)
+            continue
+        nivel_actual, progreso_actual = actuales[regla.galardon_id]
+        # Un galardón ya ganado (o asignado por un admin) no baja de nivel
+        fila["n"] = max(nivel, nivel_actual)
+        if (fila["n"], progreso) != (nivel_actual, progreso_actual):
+            fila["subido"] = fila["n"] > nivel_actual
+            cambiadas.append(fila)
+    return nuevas, cambiadas
+
+
+def _escribir(ejecutor, nuevas: List[dict], cambiadas: List[dict]):
+    """Inserta y actualiza las filas de usuario_galardones (executemany)."""
+    if nuevas:
+        ejecutor.execute(insert(usuario_galardones).values(usuario_id=bindparam("u"),
+            galardon_id=bindparam("g"), nivel_actual=bindparam("n"), progreso_actual=bindparam("p")), nuevas)
+    if cambiadas:
+        ejecutor.execute(update(usuario_galardones).where(usuario_galardones.c.usuario_id == bindparam("u"),
+            usuario_galardones.c.galardon_id == bindparam("g"))
+            .values(nivel_actual=bindparam("n"), progreso_actual=bindparam("p")),
+            [{clave: fila[clave] for clave in "ugnp"} for fila in cambiadas])
+
+
+def evaluar(ejecutor, usuario_id: int, contadores_movidos: Iterable[str]) -> List[int]:
+    """
+    Recalcula nivel_actual y progreso_actual del usuario en los galardones
+    que dependen de 'contadores_movidos', otorgando los que alcance.
+    Devuelve los ids de los galardones otorgados o subidos de nivel.
+    """
+    reglas = _registro(ejecutor).afectadas(contadores_movidos)
+    if not reglas:
+        return []
+    necesarios = {contador for regla in reglas for contador, _ in regla.umbrales}
+    valores = dict(ejecutor.execute(select(contadores.c.contador, contadores.c.valor)
+        .where(contadores.c.usuario_id == usuario_id, contadores.c.contador.in_(necesarios))).all())
+    actuales = {galardon_id: (nivel, progreso) for galardon_id, nivel, progreso in ejecutor.execute(
+        select(usuario_galardones.c.galardon_id, usuario_galardones.c.nivel_actual,
+               usuario_galardones.c.progreso_actual)
+        .where(usuario_galardones.c.usuario_id == usuario_id,
+               usuario_galardones.c.galardon_id.in_([regla.galardon_id for regla in reglas]))).all()}
+
+    nuevas, cambiadas = _cambios(usuario_id, reglas, valores, actuales)
+    _escribir(ejecutor, nuevas, cambiadas)
+    return [fila["g"] for fila in nuevas] + [fila["g"] for fila in cambiadas if fila["subido"]]
+
+
+@trabajos.tarea("evaluar_galardones")
+def _tarea_evaluar(db: Session, usuario_id: int, contadores: List[str]):
+    # Lee los contadores al ejecutarse: repetirla da el mismo resultado
+    evaluar(db, usuario_id, contadores)
+
+
+def _evaluar_en_segundo_plano(db: Session, usuario_id: int, movidos: Iterable[str]):
+    trabajos.encolar(db, "evaluar_galardones", usuario_id=usuario_id, contadores=sorted(set(movidos)))
+
+
+# --- Operaciones ---
+
+def registrar_degustacion(db: Session, degustacion: DegustacionDB):
+    """
+    Cuenta una degustación recién creada (ya en la BD) y encola la
+    evaluación de los galardones afectados.
+    """
+    cerveza = db.get(Cerveza, degustacion.cerveza_id)
+    claves = _claves_degustacion(degustacion.cerveza_id, cerveza.pais_procedencia, cerveza.estilo)
+    if _sumar_o_sembrar(db, degustacion.usuario_id, {"degustaciones": 1}):
+        movidos = CONTADORES
+    else:
+        deltas = _anotar_distintos(db, degustacion.usuario_id, claves, 1)
+        _sumar(db, degustacion.usuario_id, deltas)
+        movidos = ["degustaciones", *deltas]
+    _evaluar_en_segundo_plano(db, degustacion.usuario_id, movidos)
+
+
+def registrar_comentario(db: Session, usuario_id: int):
+    """
+    Cuenta un comentario recién creado (ya en la BD) y encola la
+    evaluación de los galardones afectados.
+    """
+    movidos = CONTADORES if _sumar_o_sembrar(db, usuario_id, {"comentarios": 1}) else ["comentarios"]
+    _evaluar_en_segundo_plano(db, usuario_id, movidos)
+
+
+def quitar_usuario(db: Session, usuario_id: int):
+    """Borra los contadores de un usuario que se va a eliminar."""
+    db.execute(delete(distintos).where(distintos.c.usuario_id == usuario_id))
+    db.execute(delete(contadores).where(contadores.c.usuario_id == usuario_id))
+
+
+def _cambiar_degustacion(conexion, usuario_id: int, cerveza_id: int, signo: int) -> Iterable[str]:
+    """Suma o resta una degustación de 'cerveza_id' a los contadores (si el usuario los tiene)."""
+    if not _sumar(conexion, usuario_id, {"degustaciones": signo}):
+        return []
+    pais, estilo = conexion.execute(select(cervezas.c.pais_procedencia, cervezas.c.estilo)
+        .where(cervezas.c.id == cerveza_id)).first() or (None, None)
+    deltas = _anotar_distintos(conexion, usuario_id, _claves_degustacion(cerveza_id, pais, estilo), signo)
+    _sumar(conexion, usuario_id, deltas)
+    return ["degustaciones", *deltas]
+
+
+@event.listens_for(DegustacionDB, "before_delete")
+def _contadores_antes_de_eliminar(mapper, conexion, degustacion):
+    # También cubre el borrado en cascada al eliminar una cerveza
+    movidos = _cambiar_degustacion(conexion, degustacion.usuario_id, degustacion.cerveza_id, -1)
+    if movidos:
+        evaluar(conexion, degustacion.usuario_id, movidos)
+
+
+@event.listens_for(DegustacionDB, "after_update")
+def _contadores_tras_actualizar(mapper, conexion, degustacion):
+    historia = inspect(degustacion).attrs.cerveza_id.history
+    if not historia.has_changes() or not historia.deleted:
+        return
+    movidos = set(_cambiar_degustacion(conexion, degustacion.usuario_id, historia.deleted[0], -1))
+    movidos.update(_cambiar_degustacion(conexion, degustacion.usuario_id, degustacion.cerveza_id, 1))
+    if movidos:
+        evaluar(conexion, degustacion.usuario_id, movidos)
+
+
+@event.listens_for(ComentarioDegustacion, "before_delete")
+def _contadores_antes_de_eliminar_comentario(mapper, conexion, comentario):
+    if _sumar(conexion, comentario.usuario_id, {"comentarios": -1}):
+        evaluar(conexion, comentario.usuario_id, ["comentarios"])
+
+
+# --- Recálculo en bloque ---
+
+def recalcular_lote(db: Session, desde_usuario: int = 0, galardon_ids: Optional[List[int]] = None,
+    usuarios_por_lote: Optional[int] = None, cerveza_id: Optional[int] = None) -> dict:
+    """
+    Recalcula los siguientes 'usuarios_por_lote' usuarios (id >= desde_usuario;
+    con 'cerveza_id', solo los que la han probado): vuelve a sembrar sus
+    contadores con INSERT ... SELECT agrupados sobre degustaciones y cervezas
+    (sembrar) y aplica las reglas de 'galardon_ids' (todas si es None) a esos
+    contadores, leídos como tuplas, sin cargar objetos del ORM. No hace
+    commit. Devuelve {"usuarios", "degustaciones", "galardones" (filas
+    escritas), "siguiente"}; "siguiente" es el id desde el que seguir, o
+    None si era el último lote.
+    """
+    usuarios_por_lote = usuarios_por_lote or USUARIOS_POR_LOTE
+    if cerveza_id is None:
+        usuario_id = UsuarioDB.__table__.c.id
+        consulta = select(usuario_id)
+    else:
+        usuario_id = degustaciones.c.usuario_id
+        consulta = select(usuario_id).where(degustaciones.c.cerveza_id == cerveza_id).distinct()
+    ids = db.execute(consulta.where(usuario_id >= desde_usuario)
+        .order_by(usuario_id).limit(usuarios_por_lote)).scalars().all()
+    if not ids:
+        return {"usuarios": 0, "degustaciones": 0, "galardones": 0, "siguiente": None}
+    if cerveza_id is None:
+        en_lote = lambda columna: columna.between(ids[0], ids[-1])
+    else:
+        en_lote = lambda columna: columna.in_(ids)
+    sembrar(db, en_lote)
+
+    # Condiciones recién leídas: la caché de otro proceso puede ir con retraso
+    reglas = RegistroReglas(db.execute(select(Galardon.id, Galardon.condiciones)).all()).todas()
+    if galardon_ids is not None:
+        reglas = [regla for regla in reglas if regla.galardon_id in galardon_ids]
+
+    valores, degustaciones_lote = {}, 0
+    for usuario_id, contador, valor in db.execute(select(contadores.c.usuario_id, contadores.c.contador,
+            contadores.c.valor).where(en_lote(contadores.c.usuario_id))):
+        valores.setdefault(usuario_id, {})[contador] = valor
+        if contador == "degustaciones":
+            degustaciones_lote += valor
+    actuales = {}
+    if reglas:
+        for usuario_id, galardon_id, nivel, progreso in db.execute(select(usuario_galardones.c.usuario_id,
+                usuario_galardones.c.galardon_id, usuario_galardones.c.nivel_actual,
+                usuario_galardones.c.progreso_actual).where(en_lote(usuario_galardones.c.usuario_id),
+                usuario_galardones.c.galardon_id.in_([regla.galardon_id for regla in reglas]))):
+            actuales.setdefault(usuario_id, {})[galardon_id] = (nivel, progreso)
+
+    nuevas, cambiadas = [], []
+    for usuario_id in ids:
+        nuevas_usuario, cambiadas_usuario = _cambios(usuario_id, reglas,
+            valores.get(usuario_id, {}), actuales.get(usuario_id, {}))
+        nuevas += nuevas_usuario
+        cambiadas += cambiadas_usuario
+    _escribir(db, nuevas, cambiadas)
+    return {
+        "usuarios": len(ids),
+        "degustaciones": degustaciones_lote,
+        "galardones": len(nuevas) + len(cambiadas),
+        "siguiente": ids[-1] + 1 if len(ids) == usuarios_por_lote else None,
+    }
+
+
+def encolar_recalculo(db: Session, galardon_ids: Optional[List[int]] = None, cerveza_id: Optional[int] = None):
+    """
+    Encola (en la transacción de 'db') el recálculo de esos galardones
+    (todos si es None) para todos los usuarios o, con 'cerveza_id', para
+    los que han probado esa cerveza.
+    """
+    trabajos.encolar(db, "recalcular_galardones", desde_usuario=0, galardon_ids=galardon_ids,
+        cerveza_id=cerveza_id)
+
+
+def registrar_cambio_cerveza(db: Session, cerveza_id: int):
+    """
+    Tras cambiar el país o el estilo de una cerveza: los contadores de
+    distintos de quienes la probaron cuentan la clave anterior, así que
+    se vuelven a sembrar (en segundo plano) desde su historial.
+    """
+    encolar_recalculo(db, cerveza_id=cerveza_id)
+
+
+@trabajos.tarea("recalcular_galardones")
+def _tarea_recalcular(db: Session, desde_usuario: int, galardon_ids: Optional[List[int]] = None,
+    totales: Optional[dict] = None, cerveza_id: Optional[int] = None):
+    # Un lote por trabajo: el siguiente se encola en la misma transacción
+    # que confirma este, así que si el proceso muere se sigue desde ahí
+    inicio = time.monotonic()
+    lote = recalcular_lote(db, desde_usuario, galardon_ids, cerveza_id=cerveza_id)
+    totales = dict(totales or {"usuarios": 0, "degustaciones": 0, "galardones": 0, "segundos": 0.0})
+    for clave in ("usuarios", "degustaciones", "galardones"):
+        totales[clave] += lote[clave]
+    totales["segundos"] += time.monotonic() - inicio
+    if lote["siguiente"] is not None:
+        trabajos.encolar(db, "recalcular_galardones", desde_usuario=lote["siguiente"],
+            galardon_ids=galardon_ids, totales=totales, cerveza_id=cerveza_id)
+    else:
+        print(f"Galardones recalculados: {resumen_recalculo(totales)}")
+
+
+def resumen_recalculo(totales: dict) -> str:
+    """Totales de un recálculo con su ritmo en filas por segundo."""
+    segundos = max(totales["segundos"], 1e-9)
+    return (f"{totales['usuarios']} usuarios, {totales['degustaciones']} degustaciones y "
+            f"{totales['galardones']} galardones escritos en {totales['segundos']:.1f} s "
+            f"({totales['degustaciones'] / segundos:,.0f} degustaciones/s, "
+            f"{totales['usuarios'] / segundos:,.0f} usuarios/s)")
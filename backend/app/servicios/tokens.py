@@ -0,0 +1,277 @@
+"""
+Tokens de acceso firmados y sin estado para la API (Authorization: Bearer).
+
+El login devuelve dos tokens firmados con HMAC (itsdangerous) con la
+clave SECRET_KEY:
+
+  - access_token: dura TOKEN_ACCESO_SEGUNDOS (15 min). Lleva el id y el
+    nombre del usuario, así que comprobarlo no consulta la base de datos:
+    solo se recalcula la firma, que itsdangerous compara en tiempo
+    constante (hmac.compare_digest), y se mira la fecha de firma.
+  - refresh_token: dura TOKEN_REFRESCO_SEGUNDOS (30 días) y solo sirve
+    para pedir un par nuevo en /usuarios/token/refrescar/. Cada uso lo
+    revoca (rotación), así que un refresco robado solo vale una vez. Ese
+    uso se comprueba en la base de datos (consumir), no en la copia en
+    memoria de los revocados, para que valga entre workers y con
+    peticiones simultáneas.
+
+Los dos tipos se firman con "salt" distinto: un token de refresco no se
+acepta como token de acceso ni al revés.
+
+Para poder cerrar sesión antes de que caduquen, los tokens revocados se
+guardan en la tabla tokens_revocados hasta su caducidad, y cada proceso
+tiene una copia en memoria (jti -> caducidad) que relee entera cada
+TOKEN_REVOCADOS_RECARGA_SEGUNDOS. Un logout es inmediato en el worker que
+lo atiende y llega a los demás en ese tiempo como mucho.
+
+cargar_token() se registra como before_request en los blueprints: deja
+en g.token los datos del token válido (o None) sin rechazar nada; las
+rutas que exigen sesión usan el decorador requiere_token, y las de
+administración además requiere_admin (ids de ADMIN_USUARIOS).
+
+Sin SECRET_KEY se genera una clave aleatoria la primera vez que se firma
+o verifica un token (con un aviso en el log): vale para desarrollo, pero
+los tokens dejan de valer al reiniciar. Con gunicorn cada worker tendría
+la suya, así que gunicorn.conf.py no arranca sin ella.
+"""
+import logging
+import os
+import secrets
+import threading
+import time
+import uuid
+import weakref
+from datetime import datetime, timezone
+from functools import wraps
+from flask import g, jsonify, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import base_datos
+from app.objetos.token import TokenRevocadoDB
+
+SECRET_KEY = os.getenv("SECRET_KEY") or None
+ACCESO_SEGUNDOS = int(os.getenv("TOKEN_ACCESO_SEGUNDOS", "900"))
+REFRESCO_SEGUNDOS = int(os.getenv("TOKEN_REFRESCO_SEGUNDOS", str(30 * 24 * 3600)))
+RECARGA_REVOCADOS_SEGUNDOS = float(os.getenv("TOKEN_REVOCADOS_RECARGA_SEGUNDOS", "30"))
+# Ids de usuario con acceso a /admin/, separados por comas (ninguno por defecto)
+ADMINISTRADORES = {int(usuario_id) for usuario_id in os.getenv("ADMIN_USUARIOS", "").split(",")
+                   if usuario_id.strip()}
+
+# tipo de token -> (salt de la firma, duración en segundos)
+TIPOS_TOKEN = {
+    "acceso": ("beersp-token-acceso", ACCESO_SEGUNDOS),
+    "refresco": ("beersp-token-refresco", REFRESCO_SEGUNDOS),
+}
+
+
+class TokenInvalido(Exception):
+    """Token mal firmado, caducado, revocado o de otro tipo."""
+
+
+logger = logging.getLogger(__name__)
+
+# tipo -> firmador; vacío hasta el primer uso si no hay clave
+_serializadores = {}
+_cerrojo_clave = threading.Lock()
+
+
+def configurar(clave: str = None):
+    """
+    (Re)crea los firmadores con esa clave (SECRET_KEY si no se da). Sin
+    ninguna, se crean con una aleatoria en el primer uso (_serializador).
+    """
+    global _serializadores
+    clave = clave or SECRET_KEY
+    _serializadores = {tipo: URLSafeTimedSerializer(clave, salt=salt)
+                       for tipo, (salt, _) in TIPOS_TOKEN.items()} if clave else {}
+
+
+def _serializador(tipo: str) -> URLSafeTimedSerializer:
+    if not _serializadores:
+        with _cerrojo_clave:
+            if not _serializadores:
+                logger.warning("SECRET_KEY no está definida; se usa una clave aleatoria "
+                               "y los tokens no valdrán tras reiniciar.")
+                configurar(secrets.token_urlsafe(32))
+    return _serializadores[tipo]
+
+
+configurar()
+
+
+def _ahora_utc() -> datetime:
+    # Sin zona, como las columnas TIMESTAMP
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _firmar(tipo: str, usuario_id: int, username: str) -> str:
+    return _serializador(tipo).dumps(
+        {"sub": usuario_id, "usr": username, "jti": uuid.uuid4().hex})
+
+
+def emitir(usuario_id: int, username: str) -> dict:
+    """Par de tokens nuevo para el usuario, con el formato de la respuesta del login."""
+    return {
+        "access_token": _firmar("acceso", usuario_id, username),
+        "refresh_token": _firmar("refresco", usuario_id, username),
+        "token_type": "Bearer",
+        "expires_in": ACCESO_SEGUNDOS,
+    }
+
+
+def verificar(token: str, tipo: str = "acceso") -> dict:
+    """
+    Datos del token ({"sub", "usr", "jti", "exp"}) si la firma es buena,
+    es del tipo pedido, no ha caducado y no está revocado. Si no, lanza
+    TokenInvalido. No consulta la base de datos (salvo la recarga
+    periódica de la lista de revocados).
+    """
+    _, duracion = TIPOS_TOKEN[tipo]
+    try:
+        datos, firmado = _serializador(tipo).loads(token, max_age=duracion, return_timestamp=True)
+    except SignatureExpired:
+        raise TokenInvalido("El token ha caducado.")
+    except BadSignature:
+        raise TokenInvalido("El token no es válido.")
+    if not isinstance(datos, dict) or "jti" not in datos or "sub" not in datos:
+        raise TokenInvalido("El token no es válido.")
+    if _lista_revocados().contiene(datos["jti"]):
+        raise TokenInvalido("El token ha sido revocado.")
+    datos["exp"] = firmado.timestamp() + duracion
+    return datos
+
+
+# --- Lista de revocados ---
+
+class ListaRevocados:
+    """Copia en memoria de tokens_revocados: jti -> caducidad (epoch)."""
+
+    def __init__(self, filas=()):
+        self.jtis = {}
+        for jti, expira in filas:
+            self.jtis[jti] = expira.replace(tzinfo=timezone.utc).timestamp()
+        self.cargada = time.monotonic()
+
+    def contiene(self, jti: str) -> bool:
+        expira = self.jtis.get(jti)
+        return expira is not None and expira > time.time()
+
+    def anadir(self, jti: str, expira: float):
+        self.jtis[jti] = expira
+
+
+# Listas ya cargadas, por engine (primaria)
+_listas = weakref.WeakKeyDictionary()
+_cerrojo = threading.Lock()
+
+
+def _lista_revocados() -> ListaRevocados:
+    """Lista del engine actual, releyéndola de la BD si ha caducado."""
+    engine = base_datos.engine
+    with _cerrojo:
+        lista = _listas.get(engine)
+    if lista is not None and time.monotonic() - lista.cargada < RECARGA_REVOCADOS_SEGUNDOS:
+        return lista
+
+    with engine.connect() as conexion:
+        filas = conexion.execute(select(TokenRevocadoDB.jti, TokenRevocadoDB.expira)
+            .where(TokenRevocadoDB.expira > _ahora_utc())).all()
+    nueva = ListaRevocados(filas)
+    with _cerrojo:
+        # Lo revocado por este proceso mientras se leía no se pierde
+        if lista is not None:
+            for jti, expira in lista.jtis.items():
+                nueva.jtis.setdefault(jti, expira)
+        _listas[engine] = nueva
+    return nueva
+
+
+def revocar(db: Session, datos: dict):
+    """
+    Revoca el token de 'datos' (lo devuelto por verificar) al confirmar
+    'db'. De paso borra las filas de tokens que ya han caducado.
+    """
+    expira = datetime.fromtimestamp(datos["exp"], timezone.utc).replace(tzinfo=None)
+    db.execute(delete(TokenRevocadoDB).where(TokenRevocadoDB.expira <= _ahora_utc()))
+    db.merge(TokenRevocadoDB(jti=datos["jti"], expira=expira))
+    db.info.setdefault("tokens_revocados", {})[datos["jti"]] = datos["exp"]
+
+
+def consumir(db: Session, datos: dict):
+    """
+    Gasta un token de un solo uso (el de refresco al rotarlo): guarda su
+    jti en tokens_revocados con un INSERT simple. Si ya estaba (lo ha
+    usado otro worker, cuya revocación aún no ha llegado a la copia en
+    memoria de este, o una petición simultánea), la clave primaria lo
+    rechaza y se lanza TokenInvalido. Se confirma con 'db'.
+    """
+    expira = datetime.fromtimestamp(datos["exp"], timezone.utc).replace(tzinfo=None)
+    try:
+        db.execute(delete(TokenRevocadoDB).where(TokenRevocadoDB.expira <= _ahora_utc()))
+        db.execute(insert(TokenRevocadoDB).values(jti=datos["jti"], expira=expira))
+    except IntegrityError:
+        db.rollback()
+        raise TokenInvalido("El token ha sido revocado.")
+    db.info.setdefault("tokens_revocados", {})[datos["jti"]] = datos["exp"]
+
+
+@event.listens_for(Session, "after_commit")
+def _revocar_tras_commit(sesion):
+    revocados = sesion.info.pop("tokens_revocados", None)
+    if revocados:
+        lista = _lista_revocados()
+        with _cerrojo:
+            for jti, expira in revocados.items():
+                lista.anadir(jti, expira)
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_tras_rollback(sesion):
+    sesion.info.pop("tokens_revocados", None)
+
+
+# --- Middleware ---
+
+def cargar_token():
+    """
+    before_request de los blueprints: si la petición trae
+    "Authorization: Bearer <token>", lo verifica y deja sus datos en
+    g.token (o el motivo del rechazo en g.error_token). No responde nada:
+    las rutas públicas siguen funcionando con un token caducado.
+    """
+    g.token = None
+    g.error_token = None
+    esquema, _, token = request.headers.get("Authorization", "").partition(" ")
+    if esquema.lower() != "bearer" or not token.strip():
+        return
+    try:
+        g.token = verificar(token.strip(), "acceso")
+    except TokenInvalido as e:
+        g.error_token = str(e)
+
+
+def requiere_token(vista):
+    """Decorador de rutas que exigen un token de acceso válido (401 si no)."""
+    @wraps(vista)
+    def envoltorio(*args, **kwargs):
+        if g.get("token") is None:
+            respuesta = jsonify({"error": g.get("error_token") or "Se necesita un token de acceso."})
+            respuesta.headers["WWW-Authenticate"] = 'Bearer realm="api"'
+            return respuesta, 401
+        return vista(*args, **kwargs)
+    return envoltorio
+
+
+def requiere_admin(vista):
+    """
+    Decorador de las rutas de administración: el token (ya exigido por
+    requiere_token) debe ser de un usuario de ADMINISTRADORES (403 si no).
+    """
+    @wraps(vista)
+    def envoltorio(*args, **kwargs):
+        if g.token["sub"] not in ADMINISTRADORES:
+            return jsonify({"error": "Se necesitan permisos de administración."}), 403
+        return vista(*args, **kwargs)
+    return envoltorio
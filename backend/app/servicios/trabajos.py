@@ -0,0 +1,242 @@
+"""
+Cola de trabajos en segundo plano para los efectos secundarios de las
+escrituras (evaluar galardones, difundir una degustación al feed de los
+amigos...), para que no cuenten en el tiempo de respuesta.
+
+La cola es la tabla trabajos, en la misma base de datos:
+
+  - encolar(db, tipo, **datos) inserta el trabajo en la transacción de
+    quien lo pide. Si esa transacción se deshace, el trabajo no existe;
+    si se confirma, el trabajo queda guardado aunque el proceso muera.
+  - Un hilo por proceso (iniciar_hilo, lo arranca la primera petición)
+    reclama trabajos con un UPDATE condicional, así que varios workers de
+    gunicorn pueden compartir la cola sin ejecutar dos veces el mismo.
+    Cada trabajo se ejecuta y se marca "hecho" en la misma transacción.
+  - Si falla, se deshace lo que hiciera y se reintenta más tarde
+    (TRABAJOS_REINTENTO_SEGUNDOS * 2^(intento-1)). Al agotar
+    TRABAJOS_MAX_INTENTOS pasa a "fallido" (cola de muertos) con su error.
+  - Un trabajo "en_curso" cuyo proceso murió se vuelve a reclamar cuando
+    vence su plazo (TRABAJOS_PLAZO_SEGUNDOS).
+
+Las tareas deben ser idempotentes: un reintento tras un fallo no ve nada
+de lo que hizo el intento anterior, pero un trabajo reclamado de nuevo
+por plazo vencido puede llegar a ejecutarse dos veces.
+
+Con TRABAJOS_HILO=0 el proceso web no ejecuta trabajos; entonces hay que
+lanzar aparte "flask --app app.main ejecutar-trabajos".
+"""
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+from sqlalchemy import delete, event, func, insert, select, update
+from sqlalchemy.orm import Session
+from app import base_datos
+from app.objetos.trabajo import TrabajoDB
+
+MAX_INTENTOS = int(os.getenv("TRABAJOS_MAX_INTENTOS", "5"))
+REINTENTO_SEGUNDOS = float(os.getenv("TRABAJOS_REINTENTO_SEGUNDOS", "2"))
+PLAZO_SEGUNDOS = float(os.getenv("TRABAJOS_PLAZO_SEGUNDOS", "300"))
+SONDEO_SEGUNDOS = float(os.getenv("TRABAJOS_SONDEO_SEGUNDOS", "1"))
+RETENER_HECHOS_HORAS = float(os.getenv("TRABAJOS_RETENER_HECHOS_HORAS", "24"))
+HILO = os.getenv("TRABAJOS_HILO", "1") != "0"
+
+ESTADOS = ("pendiente", "en_curso", "hecho", "fallido")
+
+trabajos = TrabajoDB.__table__
+
+# tipo -> función(db, **datos)
+_tareas: Dict[str, Callable] = {}
+
+
+class TrabajoDescartado(Exception):
+    """El trabajo no se puede ejecutar y no merece la pena reintentarlo."""
+
+
+def tarea(tipo: str):
+    """Registra la función decorada como la tarea 'tipo'."""
+    def registrar(funcion):
+        _tareas[tipo] = funcion
+        return funcion
+    return registrar
+
+
+def _ahora_utc() -> datetime:
+    # Sin zona, como las columnas TIMESTAMP
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def encolar(db: Session, tipo: str, **datos):
+    """
+    Encola la tarea 'tipo' con esos argumentos (serializables a JSON) en
+    la transacción de 'db': se ejecutará cuando 'db' confirme.
+    """
+    if tipo not in _tareas:
+        raise ValueError(f"Tarea desconocida: {tipo}")
+    db.execute(insert(trabajos).values(tipo=tipo, datos=datos, estado="pendiente",
+        intentos=0, max_intentos=MAX_INTENTOS, ejecutar_en=_ahora_utc()))
+    db.info["trabajos_nuevos"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _avisar_tras_commit(sesion):
+    if sesion.info.pop("trabajos_nuevos", None):
+        _despertar.set()
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_tras_rollback(sesion):
+    sesion.info.pop("trabajos_nuevos", None)
+
+
+# --- Ejecución ---
+
+def _reclamar(db: Session):
+    """
+    Marca como "en_curso" el siguiente trabajo listo y lo devuelve
+    (id, tipo, datos, intentos, max_intentos). None si no hay ninguno.
+    """
+    while True:
+        ahora = _ahora_utc()
+        listos = (trabajos.c.estado.in_(("pendiente", "en_curso")), trabajos.c.ejecutar_en <= ahora)
+        trabajo_id = db.execute(select(trabajos.c.id).where(*listos)
+            .order_by(trabajos.c.ejecutar_en, trabajos.c.id).limit(1)).scalar()
+        if trabajo_id is None:
+            db.commit()
+            return None
+        # Si otro proceso lo ha reclamado antes, el UPDATE no cambia nada
+        reclamado = db.execute(update(trabajos).where(trabajos.c.id == trabajo_id, *listos)
+            .values(estado="en_curso", intentos=trabajos.c.intentos + 1,
+                    ejecutar_en=ahora + timedelta(seconds=PLAZO_SEGUNDOS))).rowcount
+        db.commit()
+        if reclamado:
+            return db.execute(select(trabajos.c.id, trabajos.c.tipo, trabajos.c.datos,
+                trabajos.c.intentos, trabajos.c.max_intentos).where(trabajos.c.id == trabajo_id)).one()
+
+
+def _terminar(db: Session, trabajo_id: int, **valores):
+    db.execute(update(trabajos).where(trabajos.c.id == trabajo_id).values(**valores))
+
+
+def _ejecutar(db: Session, trabajo) -> bool:
+    """Ejecuta un trabajo ya reclamado. Devuelve True si terminó bien."""
+    trabajo_id, tipo, datos, intentos, max_intentos = trabajo
+    try:
+        if tipo not in _tareas:
+            raise TrabajoDescartado(f"Tarea desconocida: {tipo}")
+        if intentos > max_intentos:
+            raise TrabajoDescartado("Plazo vencido en todos los intentos")
+        _tareas[tipo](db, **datos)
+        _terminar(db, trabajo_id, estado="hecho", terminado_en=_ahora_utc(), ultimo_error=None)
+        db.commit()
+        return True
+    except Exception as e:
+        db.rollback()
+        error = f"{type(e).__name__}: {e}"[:2000]
+        if intentos >= max_intentos or isinstance(e, TrabajoDescartado):
+            _terminar(db, trabajo_id, estado="fallido", terminado_en=_ahora_utc(), ultimo_error=error)
+        else:
+            espera = REINTENTO_SEGUNDOS * 2 ** (intentos - 1)
+            _terminar(db, trabajo_id, estado="pendiente", ultimo_error=error,
+                ejecutar_en=_ahora_utc() + timedelta(seconds=espera))
+        db.commit()
+        return False
+
+
+def ejecutar_pendientes(db: Session, limite: Optional[int] = None) -> int:
+    """
+    Ejecuta con 'db' los trabajos listos (hasta 'limite') y devuelve
+    cuántos ha intentado. Lo usa el hilo de cada proceso; también sirve
+    para ejecutarlos en el momento (pruebas, comando ejecutar-trabajos).
+    """
+    ejecutados = 0
+    while limite is None or ejecutados < limite:
+        trabajo = _reclamar(db)
+        if trabajo is None:
+            break
+        _ejecutar(db, trabajo)
+        ejecutados += 1
+    return ejecutados
+
+
+def purgar_hechos(db: Session) -> int:
+    """Borra los trabajos hechos hace más de RETENER_HECHOS_HORAS."""
+    limite = _ahora_utc() - timedelta(hours=RETENER_HECHOS_HORAS)
+    borrados = db.execute(delete(trabajos).where(trabajos.c.estado == "hecho",
+        trabajos.c.terminado_en < limite)).rowcount
+    db.commit()
+    return borrados
+
+
+def reintentar(db: Session, trabajo_id: int) -> bool:
+    """Devuelve a la cola un trabajo fallido, con los intentos a cero."""
+    if not db.execute(update(trabajos).where(trabajos.c.id == trabajo_id, trabajos.c.estado == "fallido")
+            .values(estado="pendiente", intentos=0, ejecutar_en=_ahora_utc(), terminado_en=None)).rowcount:
+        return False
+    db.info["trabajos_nuevos"] = True
+    return True
+
+
+def estadisticas(db: Session) -> dict:
+    """Trabajos por estado y el más antiguo pendiente."""
+    por_estado = dict(db.execute(select(trabajos.c.estado, func.count())
+        .group_by(trabajos.c.estado)).all())
+    mas_antiguo = db.execute(select(func.min(trabajos.c.created_at))
+        .where(trabajos.c.estado == "pendiente")).scalar()
+    return {
+        "estados": {estado: por_estado.get(estado, 0) for estado in ESTADOS},
+        "pendiente_mas_antiguo": mas_antiguo.isoformat() if mas_antiguo else None,
+        "hilo_activo": _hilo is not None and _hilo.is_alive() and _pid == os.getpid(),
+    }
+
+
+def obtener_trabajos(db: Session, estado: Optional[str] = None, skip: int = 0, limit: int = 50):
+    """Trabajos más recientes primero, opcionalmente de un estado."""
+    consulta = db.query(TrabajoDB)
+    if estado:
+        consulta = consulta.filter(TrabajoDB.estado == estado)
+    return consulta.order_by(TrabajoDB.id.desc()).offset(skip).limit(limit).all()
+
+
+# --- Hilo de cada proceso ---
+
+_despertar = threading.Event()
+_cerrojo = threading.Lock()
+_hilo: Optional[threading.Thread] = None
+_pid: Optional[int] = None
+
+
+def _bucle():
+    ultima_purga = datetime.min
+    while True:
+        ejecutados = 0
+        _despertar.clear()
+        db = base_datos.SessionLocal()
+        try:
+            ejecutados = ejecutar_pendientes(db, limite=100)
+            if _ahora_utc() - ultima_purga > timedelta(hours=1):
+                purgar_hechos(db)
+                ultima_purga = _ahora_utc()
+        except Exception as e:
+            print(f"AVISO: error en el hilo de trabajos: {e}")
+        finally:
+            db.close()
+        if not ejecutados:
+            _despertar.wait(SONDEO_SEGUNDOS)
+
+
+def iniciar_hilo():
+    """
+    Arranca el hilo de trabajos de este proceso si no está en marcha
+    (tras un fork el hilo del padre no existe en el hijo). Se llama en
+    cada petición: si ya está arrancado solo compara el pid.
+    """
+    global _hilo, _pid
+    if not HILO or (_pid == os.getpid() and _hilo.is_alive()):
+        return
+    with _cerrojo:
+        if _pid == os.getpid() and _hilo.is_alive():
+            return
+        _hilo = threading.Thread(target=_bucle, name="trabajos", daemon=True)
+        _hilo.start()
+        _pid = os.getpid()
@@ -1,12 +1,13 @@
 from datetime import date, datetime
 from uuid import uuid4
-from sqlalchemy import Connection, MetaData, Table, create_engine, select, text, except_
+from sqlalchemy import Connection, MetaData, Table, and_, create_engine, delete, func, insert, or_, select, text, except_
 from sqlalchemy.orm import sessionmaker, Session, declarative_base
 
 from app.objetos.amistad import FriendRequestDB
 from app.objetos.degustacion import DegustacionDB
+from app.servicios import actividad_servicio, autocompletado, perfiles_carga, reglas_galardones
 
-from ..objetos.usuario import UsuarioDB, UsuarioCreate
+from ..objetos.usuario import UsuarioDB, UsuarioCreate, user_friends
 
 table_name = "users"
 
@@ -14,10 +15,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import exc
 from typing import List, Optional
 from uuid import UUID
-from passlib.context import CryptContext # Para hashear contraseñas
-
-# Configuración del contexto de hasheo de contraseñas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.servicios import hash_contrasenas # Para hashear contraseñas (bcrypt en un pool acotado)
 
 
 class UsuarioServicio:
@@ -28,13 +26,33 @@ class UsuarioServicio:
 
     @staticmethod
     def get_password_hash(password: str) -> str:
-        """Hashea una contraseña en texto plano."""
-        return pwd_context.hash(password)
+        """
+        Hashea una contraseña en texto plano.
+        Lanza hash_contrasenas.HashSaturado si el pool de hash está lleno.
+        """
+        return hash_contrasenas.hashear(password)
 
     @staticmethod   
     def verify_password(plain_password: str, hashed_password: str) -> bool:
         """Verifica una contraseña en texto plano contra un hash."""
-        return pwd_context.verify(plain_password, hashed_password)
+        return hash_contrasenas.verificar(plain_password, hashed_password)[0]
+
+    @staticmethod
+    def autenticar(db: Session, usuario: UsuarioDB, password: str) -> bool:
+        """
+        Comprueba la contraseña del usuario. Si es correcta y su hash se
+        calculó con otro coste de bcrypt, lo guarda recalculado con el
+        coste actual (sin que el usuario tenga que hacer nada).
+        """
+        correcta, nuevo_hash = hash_contrasenas.verificar(password, usuario.password_hash)
+        if correcta and nuevo_hash:
+            usuario.password_hash = nuevo_hash
+            try:
+                db.commit()
+            except exc.SQLAlchemyError:
+                # El login no falla por no poder actualizar el hash
+                db.rollback()
+        return correcta
 
     # --- Funciones CRUD (Llamadas por el controlador) ---
 
@@ -61,11 +79,12 @@ class UsuarioServicio:
         return db.query(UsuarioDB).filter(UsuarioDB.id == user_id).first()
 
     @staticmethod
-    def get_all_usuarios(db: Session) -> List[UsuarioDB]:
+    def get_all_usuarios(db: Session, campos: tuple = UsuarioDB.CAMPOS_RESUMEN) -> List[UsuarioDB]:
         """
-        (GET /) Devuelve una lista de todos los usuarios.
+        (GET /) Devuelve una lista de todos los usuarios, precargando solo
+        las relaciones que necesitan los campos que se van a serializar.
         """
-        return db.query(UsuarioDB).all()
+        return db.query(UsuarioDB).options(*perfiles_carga.usuario_campos(campos)).all()
 
     @staticmethod
     def create_usuario(db: Session, usuario: dict) -> UsuarioDB:
@@ -94,6 +113,7 @@ class UsuarioServicio:
         try:
             db.commit()
             db.refresh(db_user)
+            autocompletado.actualizar(db, "usuarios", db_user.id, db_user.username)
             return db_user
         except exc.SQLAlchemyError as e:
             db.rollback()
@@ -138,6 +158,7 @@ class UsuarioServicio:
         try:
             db.commit()
             db.refresh(db_user)
+            autocompletado.actualizar(db, "usuarios", db_user.id, db_user.username)
             return db_user
         except exc.SQLAlchemyError as e:
             db.rollback()
@@ -153,9 +174,12 @@ class UsuarioServicio:
         if not db_user:
             return False # No encontrado
 
+        actividad_servicio.quitar_usuario(db, user_id)
+        reglas_galardones.quitar_usuario(db, user_id)
         db.delete(db_user)
         try:
             db.commit()
+            autocompletado.quitar(db, "usuarios", user_id)
             return True
         except exc.SQLAlchemyError as e:
             db.rollback()
@@ -164,26 +188,33 @@ class UsuarioServicio:
     @staticmethod      
     def crear_amistad(db: Session, user_id: int, friend_id: int) -> bool:
         """
-        Crea una relación de amistad entre dos usuarios
+        Crea una relación de amistad entre dos usuarios, guardando las dos
+        filas (user_id, friend_id) y (friend_id, user_id) en la misma transacción
         """
         try:
-            # Comprueba si existen los usuarios
-            user = UsuarioServicio.get_usuario_by_id(db, user_id)
-            friend = UsuarioServicio.get_usuario_by_id(db, friend_id)
-            
-            if not user or not friend:
+            # Comprueba si existen los usuarios (y que no son el mismo)
+            existentes = db.execute(select(func.count()).select_from(UsuarioDB)
+                .where(UsuarioDB.id.in_((user_id, friend_id)))).scalar()
+            if user_id == friend_id or existentes != 2:
                 return False
             
             # Comprueba si ya son amigos
-            if friend_id in user.friends:
+            if UsuarioServicio.son_amigos(db, user_id, friend_id):
                 return True
             
-            # Añade relación
-            user.friends.append(friend)
-            friend.friends.append(user)
+            # Añade relación en los dos sentidos
+            db.execute(insert(user_friends), [
+                {"user_id": user_id, "friend_id": friend_id},
+                {"user_id": friend_id, "friend_id": user_id},
+            ])
+            actividad_servicio.anadir_amistad(db, user_id, friend_id)
             db.commit()
             return True
-            
+
+        except exc.IntegrityError:
+            # Otra petición creó la misma amistad a la vez
+            db.rollback()
+            return UsuarioServicio.son_amigos(db, user_id, friend_id)
         except Exception as e:
             db.rollback()
             raise e
@@ -198,24 +229,64 @@ class UsuarioServicio:
             return []
         return user.friends
 
+    @staticmethod
+    def obtener_ids_amigos(db: Session, user_id: int) -> List[int]:
+        """
+        Ids de los amigos de un usuario, leídos solo de user_friends.
+        No carga las filas UsuarioDB de los amigos (como haría user.friends):
+        la consulta se resuelve con el índice de la clave primaria
+        (user_id, friend_id), así que con miles de amigos sigue siendo barata.
+        """
+        return db.execute(select(user_friends.c.friend_id)
+            .where(user_friends.c.user_id == user_id)
+            .order_by(user_friends.c.friend_id)).scalars().all()
+
+    @staticmethod
+    def son_amigos(db: Session, user_id: int, friend_id: int) -> bool:
+        """
+        Indica si dos usuarios son amigos: una búsqueda por clave primaria
+        en user_friends, sin cargar a ninguno de los dos.
+        """
+        return db.execute(select(user_friends.c.user_id)
+            .where(user_friends.c.user_id == user_id, user_friends.c.friend_id == friend_id)
+            .limit(1)).first() is not None
+
+    @staticmethod
+    def amigos_en_comun(db: Session, user_id: int, otro_id: int) -> List[int]:
+        """
+        Ids de los amigos que tienen en común dos usuarios: cruza los dos
+        rangos de la clave primaria (user_id = A y user_id = B) por friend_id.
+        """
+        amigos_a = user_friends.alias("amigos_a")
+        amigos_b = user_friends.alias("amigos_b")
+        return db.execute(select(amigos_a.c.friend_id)
+            .join(amigos_b, and_(amigos_b.c.friend_id == amigos_a.c.friend_id,
+                                 amigos_b.c.user_id == otro_id))
+            .where(amigos_a.c.user_id == user_id)
+            .order_by(amigos_a.c.friend_id)).scalars().all()
+
+    @staticmethod
+    def contar_amigos(db: Session, user_id: int) -> int:
+        """
+        Número de amigos de un usuario (COUNT sobre el índice de la clave primaria).
+        """
+        return db.execute(select(func.count()).select_from(user_friends)
+            .where(user_friends.c.user_id == user_id)).scalar()
+
     @staticmethod  
     def eliminar_amistad(db: Session, user_id: int, friend_id: int) -> bool:
         """
-        Remove friend relationship
+        Elimina la amistad en los dos sentidos.
+        Devuelve False si no eran amigos.
         """
         try:
-            user = UsuarioServicio.get_usuario_by_id(db, user_id)
-            friend = UsuarioServicio.get_usuario_by_id(db, friend_id)
-            
-            if not user or not friend:
-                return False
-            
-            # Remove friend relationship
-            if friend in user.friends:
-                user.friends.remove(friend)
-                db.commit()
-                return True
-            return False
+            resultado = db.execute(delete(user_friends).where(or_(
+                and_(user_friends.c.user_id == user_id, user_friends.c.friend_id == friend_id),
+                and_(user_friends.c.user_id == friend_id, user_friends.c.friend_id == user_id),
+            )))
+            actividad_servicio.quitar_amistad(db, user_id, friend_id)
+            db.commit()
+            return resultado.rowcount > 0
             
         except Exception as e:
             db.rollback()
@@ -223,26 +294,29 @@ class UsuarioServicio:
             return False
 
     @staticmethod
-    def get_recent_friends_activity(db: Session, user_id: int, limit: int = 5) -> List[DegustacionDB]:
+    def simetrizar_amistades(db: Session) -> int:
         """
-        Obtiene las últimas degustaciones creadas por los amigos del usuario.
+        Añade la fila inversa que falte a las amistades guardadas en un solo
+        sentido (datos anteriores a guardar siempre las dos filas, o el
+        antiguo eliminar_amistad, que solo borraba una). Devuelve cuántas
+        filas ha añadido.
         """
-        # Obtenemos el usuario para acceder a su lista de amigos
-        user = UsuarioServicio.get_usuario_by_id(db, user_id)
-        if not user or not user.friends:
-            return []
-
-        # Obtenemos lista de IDs de los amigos
-        friend_ids = [friend.id for friend in user.friends]
+        directa = user_friends.alias("directa")
+        inversa = user_friends.alias("inversa")
+        faltan = select(directa.c.friend_id, directa.c.user_id).where(~select(inversa.c.user_id)
+            .where(inversa.c.user_id == directa.c.friend_id, inversa.c.friend_id == directa.c.user_id)
+            .exists())
+        resultado = db.execute(insert(user_friends).from_select(["user_id", "friend_id"], faltan))
+        db.commit()
+        return resultado.rowcount
 
-        # Filtramos donde el usuario_id esté en la lista de amigos
-        activity = db.query(DegustacionDB)\
-                     .filter(DegustacionDB.usuario_id.in_(friend_ids))\
-                     .order_by(DegustacionDB.fecha_creacion.desc())\
-                     .limit(limit)\
-                     .all()
-        
-        return activity
+    @staticmethod
+    def get_recent_friends_activity(db: Session, user_id: int, limit: int = 5) -> List[DegustacionDB]:
+        """
+        Obtiene las últimas degustaciones creadas por los amigos del usuario
+        (el mismo feed que /usuarios/<id>/actividad-amigos/; ver actividad_servicio).
+        """
+        return actividad_servicio.obtener_actividad(db, user_id, limit=limit)
     
     # Lógica de Solicitudes de Amistad
 
@@ -258,14 +332,13 @@ class UsuarioServicio:
         if not sender or not receiver:
             raise ValueError("Uno de los usuarios no existe")
 
-        if receiver in sender.friends:
+        if UsuarioServicio.son_amigos(db, sender_id, receiver_id):
             raise ValueError("Ya son amigos")
 
-        # Verifica que no exista ya una solicitud pendiente (en cualquier dirección)
-        existing_req = db.query(FriendRequestDB).filter(
-            ((FriendRequestDB.user_id == sender_id) & (FriendRequestDB.friend_id == receiver_id)) |
-            ((FriendRequestDB.user_id == receiver_id) & (FriendRequestDB.friend_id == sender_id))
-        ).first()
+        # Verifica que no exista ya una solicitud pendiente (en cualquier dirección):
+        # dos búsquedas por clave primaria en vez de un OR sobre la tabla
+        existing_req = db.get(FriendRequestDB, (sender_id, receiver_id)) \
+            or db.get(FriendRequestDB, (receiver_id, sender_id))
 
         if existing_req:
             raise ValueError("Ya existe una solicitud pendiente entre estos usuarios")
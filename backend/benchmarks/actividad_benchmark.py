@@ -0,0 +1,114 @@
+import os
+import sys
+import tempfile
+import time
+
+# --- Configuración ---
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+TAMANOS = [int(n) for n in os.getenv("BENCH_AMIGOS", "10,1000,10000").split(",")]
+DEGUSTACIONES_POR_AMIGO = int(os.getenv("BENCH_DEGUSTACIONES_POR_AMIGO", "5"))
+REPETICIONES = int(os.getenv("BENCH_REPETICIONES", "50"))
+LIMITE = 20
+
+from datetime import datetime, timedelta
+from sqlalchemy import desc, insert
+from sqlalchemy.orm import sessionmaker
+from app.base_datos import Base, crear_engine, importar_modelos
+importar_modelos()
+from app.objetos.cerveza import Cerveza
+from app.objetos.degustacion import DegustacionDB
+from app.objetos.usuario import UsuarioDB, user_friends
+from app.servicios import actividad_servicio, perfiles_carga
+from app.servicios.usuario_servicio import UsuarioServicio
+
+
+class ActividadBenchmark:
+    """
+    Latencia de GET /usuarios/<id>/actividad/ según el número de amigos:
+    el feed calculado como antes (cargar amigos + IN), el calculado con
+    k-way merge (ACTIVIDAD_FEED=calculado) y el materializado en
+    actividad_amigos
+    """
+
+    def print_header(self, titulo):
+        """Imprime un cabezal bonito"""
+        print("\n" + "="*60)
+        print(f" BENCHMARK: {titulo}")
+        print("="*60)
+
+    def poblar(self, engine, num_amigos):
+        """
+        Crea un lector con 'num_amigos' amigos (amistad en los dos sentidos)
+        y DEGUSTACIONES_POR_AMIGO degustaciones de cada amigo. Devuelve su id.
+        """
+        prefijo = f"a{num_amigos}_"
+        with engine.begin() as conexion:
+            conexion.execute(insert(UsuarioDB), [{"username": f"{prefijo}{i}",
+                "email": f"{prefijo}{i}@test.com", "password_hash": "x"} for i in range(num_amigos + 1)])
+            ids = conexion.execute(UsuarioDB.__table__.select().with_only_columns(UsuarioDB.id)
+                .where(UsuarioDB.username.like(f"{prefijo}%")).order_by(UsuarioDB.id)).scalars().all()
+            lector, amigos = ids[0], ids[1:]
+            conexion.execute(insert(user_friends), [fila for amigo in amigos for fila in
+                ({"user_id": lector, "friend_id": amigo}, {"user_id": amigo, "friend_id": lector})])
+            cerveza_id = conexion.execute(insert(Cerveza).values(nombre=f"Cerveza {prefijo}")).inserted_primary_key[0]
+            inicio = datetime(2024, 1, 1)
+            conexion.execute(insert(DegustacionDB), [{"usuario_id": amigo, "cerveza_id": cerveza_id,
+                "puntuacion": 4, "fecha_creacion": inicio + timedelta(minutes=i * len(amigos) + j)}
+                for i in range(DEGUSTACIONES_POR_AMIGO) for j, amigo in enumerate(amigos)])
+        return lector
+
+    def feed_calculado(self, db, usuario_id):
+        """Lo que se hacía antes: cargar los amigos y buscar sus degustaciones con IN"""
+        usuario = UsuarioServicio.get_usuario_by_id(db, usuario_id)
+        amigos_ids = [amigo.id for amigo in usuario.friends]
+        return db.query(DegustacionDB).options(*perfiles_carga.degustacion_listado())\
+            .filter(DegustacionDB.usuario_id.in_(amigos_ids))\
+            .order_by(desc(DegustacionDB.fecha_creacion)).limit(LIMITE).all()
+
+    def feed_merge(self, db, usuario_id):
+        """calcular_actividad(): cabeza de cada amigo por índice + merge"""
+        return actividad_servicio.calcular_actividad(db, usuario_id, limit=LIMITE)
+
+    def medir(self, Sesion, funcion):
+        """p50 y p99 en ms de 'funcion(db)', con una sesión nueva cada vez (como cada petición)"""
+        latencias = []
+        for _ in range(REPETICIONES):
+            db = Sesion()
+            inicio = time.perf_counter()
+            funcion(db)
+            latencias.append(time.perf_counter() - inicio)
+            db.close()
+        latencias.sort()
+        return latencias[len(latencias) // 2] * 1000, latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))] * 1000
+
+    def run(self):
+        self.print_header(f"FEED DE ACTIVIDAD · {DEGUSTACIONES_POR_AMIGO} degustaciones por amigo · {LIMITE} por página")
+        with tempfile.TemporaryDirectory() as directorio:
+            engine = crear_engine(f"sqlite:///{os.path.join(directorio, 'actividad.db')}")
+            Base.metadata.create_all(bind=engine)
+            Sesion = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            lectores = {num_amigos: self.poblar(engine, num_amigos) for num_amigos in TAMANOS}
+
+            db = Sesion()
+            inicio = time.perf_counter()
+            filas = actividad_servicio.reconstruir(db)
+            db.close()
+            print(f"ℹ️  Feed reconstruido: {filas} entradas en {time.perf_counter() - inicio:.1f} s")
+
+            print(f"{'Amigos':>8}{'IN p50/p99 ms':>20}{'k-way merge p50/p99 ms':>26}{'materializado p50/p99 ms':>28}")
+            for num_amigos, lector in lectores.items():
+                calculado = self.medir(Sesion, lambda db: self.feed_calculado(db, lector))
+                merge = self.medir(Sesion, lambda db: self.feed_merge(db, lector))
+                materializado = self.medir(Sesion, lambda db: actividad_servicio.obtener_actividad(db, lector, limit=LIMITE))
+                print(f"{num_amigos:>8}{calculado[0]:>10.2f} /{calculado[1]:>7.2f}"
+                      f"{merge[0]:>16.2f} /{merge[1]:>7.2f}"
+                      f"{materializado[0]:>18.2f} /{materializado[1]:>7.2f}")
+            engine.dispose()
+
+
+# --- Ejecución del benchmark ---
+if __name__ == "__main__":
+    # Variables útiles: BENCH_AMIGOS, BENCH_DEGUSTACIONES_POR_AMIGO, BENCH_REPETICIONES
+    ActividadBenchmark().run()
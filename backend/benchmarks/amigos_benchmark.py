@@ -0,0 +1,82 @@
+import os
+import sys
+import tempfile
+import time
+
+# --- Configuración ---
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+TAMANOS = [int(n) for n in os.getenv("BENCH_AMIGOS", "10,1000,10000").split(",")]
+REPETICIONES = int(os.getenv("BENCH_REPETICIONES", "50"))
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+from app.base_datos import Base, crear_engine, importar_modelos
+importar_modelos()
+from app.objetos.usuario import UsuarioDB, user_friends
+from app.servicios.usuario_servicio import UsuarioServicio
+
+
+class AmigosBenchmark:
+    """
+    Mide cuánto cuesta obtener los ids de amigos de un usuario (lo que
+    devuelven el login y el perfil) según cuántos amigos tiene:
+    cargando la relación user.friends o con obtener_ids_amigos()
+    """
+
+    def print_header(self, titulo):
+        """Imprime un cabezal bonito"""
+        print("\n" + "="*60)
+        print(f" BENCHMARK: {titulo}")
+        print("="*60)
+
+    def poblar(self, engine, num_amigos):
+        """Crea un usuario con 'num_amigos' amigos y devuelve su id"""
+        with engine.begin() as conexion:
+            conexion.execute(insert(UsuarioDB), [{"username": f"u{num_amigos}_{i}",
+                "email": f"u{num_amigos}_{i}@test.com", "password_hash": "x"}
+                for i in range(num_amigos + 1)])
+            ids = conexion.execute(UsuarioDB.__table__.select()
+                .with_only_columns(UsuarioDB.id)
+                .where(UsuarioDB.username.like(f"u{num_amigos}\\_%", escape="\\"))
+                .order_by(UsuarioDB.id)).scalars().all()
+            conexion.execute(insert(user_friends), [{"user_id": ids[0], "friend_id": amigo}
+                for amigo in ids[1:]])
+        return ids[0]
+
+    def medir(self, Sesion, funcion):
+        """p50 en ms de 'funcion(db)', con una sesión nueva cada vez (como cada petición)"""
+        latencias = []
+        for _ in range(REPETICIONES):
+            db = Sesion()
+            inicio = time.perf_counter()
+            funcion(db)
+            latencias.append(time.perf_counter() - inicio)
+            db.close()
+        latencias.sort()
+        return latencias[len(latencias) // 2] * 1000
+
+    def run(self):
+        self.print_header(f"IDS DE AMIGOS · {REPETICIONES} repeticiones")
+        with tempfile.TemporaryDirectory() as directorio:
+            engine = crear_engine(f"sqlite:///{os.path.join(directorio, 'amigos.db')}")
+            Base.metadata.create_all(bind=engine)
+            Sesion = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+            print(f"{'Amigos':>8}{'user.friends ms':>18}{'ids (proyección) ms':>22}")
+            for num_amigos in TAMANOS:
+                usuario_id = self.poblar(engine, num_amigos)
+                relacion = self.medir(Sesion, lambda db: [amigo.id for amigo in
+                    UsuarioServicio.get_usuario_by_id(db, usuario_id).friends])
+                proyeccion = self.medir(Sesion, lambda db: (
+                    UsuarioServicio.get_usuario_by_id(db, usuario_id),
+                    UsuarioServicio.obtener_ids_amigos(db, usuario_id)))
+                print(f"{num_amigos:>8}{relacion:>18.2f}{proyeccion:>22.2f}")
+            engine.dispose()
+
+
+# --- Ejecución del benchmark ---
+if __name__ == "__main__":
+    # Variables útiles: BENCH_AMIGOS (p. ej. "10,1000,10000"), BENCH_REPETICIONES
+    AmigosBenchmark().run()
@@ -0,0 +1,98 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+# --- Configuración ---
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+NUM_CERVEZAS = int(os.getenv("BENCH_CERVEZAS", "100000"))
+CONSULTAS = int(os.getenv("BENCH_CONSULTAS", "2000"))
+LIMITE = 10
+PALABRAS = ["Estrella", "Lager", "Pale", "Ale", "Dorada", "Negra", "Tostada", "Especial",
+            "Reserva", "Trigo", "Ámbar", "Lúpulo", "Abadía", "Imperial", "Stout", "Porter"]
+
+from sqlalchemy.orm import sessionmaker
+from app.base_datos import Base, crear_engine, importar_modelos
+importar_modelos()
+from app.objetos.cerveza import Cerveza
+from app.servicios import autocompletado
+from app.servicios.busqueda import crear_indices_busqueda
+from app.servicios.cerveza_servicio import CervezaService
+
+
+class AutocompletadoBenchmark:
+    """
+    Compara /cervezas/autocomplete/ (índice en memoria) con el listado
+    /cervezas/?q= (FTS5) que usaba el buscador para sugerir cervezas
+    """
+
+    def print_header(self, titulo):
+        """Imprime un cabezal bonito"""
+        print("\n" + "="*60)
+        print(f" BENCHMARK: {titulo}")
+        print("="*60)
+
+    def poblar(self, engine):
+        """Inserta NUM_CERVEZAS con nombres de 2 o 3 palabras"""
+        random.seed(42)
+        filas = [{"nombre": " ".join(random.sample(PALABRAS, random.randint(2, 3))) + f" {i}"}
+            for i in range(NUM_CERVEZAS)]
+        with engine.begin() as conexion:
+            conexion.execute(Cerveza.__table__.insert(), filas)
+
+    def medir(self, funcion, prefijos):
+        """Devuelve (p50 µs, p99 µs) de 'funcion' sobre los prefijos"""
+        latencias = []
+        for prefijo in prefijos:
+            inicio = time.perf_counter()
+            funcion(prefijo)
+            latencias.append(time.perf_counter() - inicio)
+        latencias.sort()
+        percentil = lambda p: latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1e6
+        return percentil(0.50), percentil(0.99)
+
+    def run(self):
+        self.print_header(f"AUTOCOMPLETADO · {NUM_CERVEZAS} cervezas · {CONSULTAS} consultas")
+        with tempfile.TemporaryDirectory() as directorio:
+            engine = crear_engine(f"sqlite:///{os.path.join(directorio, 'autocompletado.db')}")
+            Base.metadata.create_all(bind=engine)
+            self.poblar(engine)
+            crear_indices_busqueda(engine)
+            db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+            inicio = time.perf_counter()
+            autocompletado.autocompletar(db, "cervezas", "a")
+            print(f"ℹ️  Índice construido en {(time.perf_counter() - inicio) * 1000:.0f} ms")
+
+            random.seed(7)
+            prefijos = [random.choice(PALABRAS)[:random.randint(1, 4)] for _ in range(CONSULTAS)]
+            # El listado completo es mucho más lento: menos consultas
+            prefijos_listado = prefijos[:max(1, CONSULTAS // 20)]
+
+            self.print_header("RESULTADOS")
+            print(f"{'Método':<28}{'p50 µs':>12}{'p99 µs':>12}")
+            for nombre, funcion, muestra in [
+                ("autocompletado en memoria",
+                    lambda q: autocompletado.autocompletar(db, "cervezas", q, LIMITE), prefijos),
+                ("listado ?q= (FTS5)",
+                    lambda q: [c.to_dict() for c in CervezaService.buscar_cervezas(db, q=q)], prefijos_listado),
+            ]:
+                p50, p99 = self.medir(funcion, muestra)
+                print(f"{nombre:<28}{p50:>12.1f}{p99:>12.1f}")
+
+            # Actualización incremental frente a reconstruir el índice
+            inicio = time.perf_counter()
+            for i in range(100):
+                autocompletado.actualizar(db, "cervezas", NUM_CERVEZAS + i + 1, f"Nueva Cerveza {i}")
+            print(f"ℹ️  Alta incremental: {(time.perf_counter() - inicio) * 1e4:.1f} µs por cerveza")
+            db.close()
+            engine.dispose()
+
+
+# --- Ejecución del benchmark ---
+if __name__ == "__main__":
+    # Variables útiles: BENCH_CERVEZAS, BENCH_CONSULTAS
+    AutocompletadoBenchmark().run()
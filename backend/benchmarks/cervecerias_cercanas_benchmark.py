@@ -0,0 +1,151 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+# --- Configuración ---
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+NUM_CERVECERIAS = int(os.getenv("BENCH_CERVECERIAS", "100000"))
+CONSULTAS = int(os.getenv("BENCH_CONSULTAS", "200"))
+RADIOS_KM = (1, 5, 25)
+# Consulta en lote: k más cercanas para cada uno de USUARIOS_LOTE puntos
+USUARIOS_LOTE = int(os.getenv("BENCH_USUARIOS", "1000"))
+K_LOTE = 10
+RADIO_LOTE_KM = 25
+# Las cervecerías se reparten por la península ibérica
+CAJA = (36.0, 43.8, -9.3, 3.3)
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+from app.base_datos import Base, crear_engine, importar_modelos
+importar_modelos()
+from app.objetos.cerveceria import Cerveceria
+from app.servicios import geolocalizacion
+from app.servicios.cerveceria_servicio import CerveceriaService
+
+
+class CerveceriasCercanasBenchmark:
+    """
+    Compara /cervecerias/sugeridas/ con índice de geohash frente a recorrer
+    toda la tabla, y la consulta en lote (NumPy) frente a una consulta por punto
+    """
+
+    def print_header(self, titulo):
+        """Imprime un cabezal bonito"""
+        print("\n" + "="*60)
+        print(f" BENCHMARK: {titulo}")
+        print("="*60)
+
+    def poblar(self, engine):
+        """Inserta NUM_CERVECERIAS en bloque (calculando el geohash igual que el servicio)"""
+        random.seed(42)
+        filas = []
+        for i in range(NUM_CERVECERIAS):
+            lat = random.uniform(CAJA[0], CAJA[1])
+            lon = random.uniform(CAJA[2], CAJA[3])
+            filas.append({"nombre": f"Cervecería {i}", "direccion": f"Calle {i}",
+                "lat": lat, "lon": lon, "geohash": geolocalizacion.codificar_geohash(lat, lon)})
+        with engine.begin() as conexion:
+            conexion.execute(Cerveceria.__table__.insert(), filas)
+
+    def cercanas_recorriendo_tabla(self, db, lat, lon, radio):
+        """Implementación anterior: carga todas las filas y calcula el haversine de cada una"""
+        cercanas = []
+        for cerveceria in db.query(Cerveceria).all():
+            distancia = geolocalizacion.distancia_km(lat, lon, cerveceria.lat, cerveceria.lon)
+            if distancia <= radio:
+                cercanas.append((cerveceria, distancia))
+        cercanas.sort(key=lambda par: (par[1], par[0].nombre))
+        return cercanas
+
+    def medir(self, funcion, Sesion, puntos, radio):
+        """Devuelve (p50 ms, p99 ms, resultados medios) de 'funcion' sobre los puntos"""
+        latencias, total = [], 0
+        for lat, lon in puntos:
+            db = Sesion()
+            inicio = time.perf_counter()
+            total += len(funcion(db, lat, lon, radio))
+            latencias.append(time.perf_counter() - inicio)
+            db.close()
+        latencias.sort()
+        percentil = lambda p: latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000
+        return percentil(0.50), percentil(0.99), total / len(puntos)
+
+    def run(self):
+        self.print_header(f"CERVECERÍAS CERCANAS · {NUM_CERVECERIAS} cervecerías · {CONSULTAS} consultas por radio")
+        with tempfile.TemporaryDirectory() as directorio:
+            engine = crear_engine(f"sqlite:///{os.path.join(directorio, 'cercanas.db')}")
+            Base.metadata.create_all(bind=engine)
+            inicio = time.perf_counter()
+            self.poblar(engine)
+            print(f"ℹ️  Datos insertados en {time.perf_counter() - inicio:.1f} s")
+
+            with engine.connect() as conexion:
+                plan = conexion.execute(text(
+                    "EXPLAIN QUERY PLAN SELECT id FROM cervecerias "
+                    "WHERE (geohash >= 'ezjmd' AND geohash < 'ezjmd~') "
+                    "OR (geohash >= 'ezjme' AND geohash < 'ezjme~')")).fetchall()
+            print("ℹ️  Plan de consulta: " + " | ".join(fila[-1] for fila in plan))
+
+            Sesion = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            random.seed(7)
+            puntos = [(random.uniform(CAJA[0], CAJA[1]), random.uniform(CAJA[2], CAJA[3]))
+                for _ in range(CONSULTAS)]
+            # La versión que recorre la tabla es muy lenta: menos consultas
+            puntos_tabla = puntos[:max(1, CONSULTAS // 20)]
+
+            self.print_header("RESULTADOS")
+            print(f"{'Radio':<8}{'Método':<20}{'p50 ms':>10}{'p99 ms':>10}{'resultados':>12}")
+            for radio in RADIOS_KM:
+                for nombre, funcion, muestra in [
+                    ("índice geohash", CerveceriaService.get_cervecerias_cercanas, puntos),
+                    ("recorrer tabla", self.cercanas_recorriendo_tabla, puntos_tabla),
+                ]:
+                    p50, p99, medio = self.medir(funcion, Sesion, muestra, radio)
+                    print(f"{radio:<8}{nombre:<20}{p50:>10.2f}{p99:>10.2f}{medio:>12.1f}")
+
+                # Ambas versiones deben devolver lo mismo y en el mismo orden
+                db = Sesion()
+                lat, lon = puntos[0]
+                esperadas = [c.id for c, _ in self.cercanas_recorriendo_tabla(db, lat, lon, radio)]
+                obtenidas = [c.id for c, _ in CerveceriaService.get_cervecerias_cercanas(db, lat, lon, radio)]
+                db.close()
+                if esperadas != obtenidas:
+                    print(f"❌ Resultados distintos con radio {radio} km")
+
+            self.medir_lote(Sesion)
+            engine.dispose()
+
+    def medir_lote(self, Sesion):
+        """k más cercanas para USUARIOS_LOTE puntos: una llamada por punto frente al lote"""
+        random.seed(11)
+        puntos = [(random.uniform(CAJA[0], CAJA[1]), random.uniform(CAJA[2], CAJA[3]))
+            for _ in range(USUARIOS_LOTE)]
+        db = Sesion()
+        inicio = time.perf_counter()
+        individuales = [CerveceriaService.get_cervecerias_cercanas(db, lat, lon, RADIO_LOTE_KM, K_LOTE)
+            for lat, lon in puntos]
+        tiempo_individual = time.perf_counter() - inicio
+        db.close()
+
+        db = Sesion()
+        inicio = time.perf_counter()
+        lote = CerveceriaService.get_cervecerias_cercanas_lote(db, puntos, RADIO_LOTE_KM, K_LOTE)
+        tiempo_lote = time.perf_counter() - inicio
+        db.close()
+
+        iguales = all([c.id for c, _ in a] == [c.id for c, _ in b] for a, b in zip(individuales, lote))
+        self.print_header(f"LOTE · {USUARIOS_LOTE} puntos · k={K_LOTE} · radio {RADIO_LOTE_KM} km")
+        print(f"{'Método':<28}{'total s':>10}{'ms/punto':>10}")
+        print(f"{'una consulta por punto':<28}{tiempo_individual:>10.2f}{tiempo_individual * 1000 / USUARIOS_LOTE:>10.2f}")
+        print(f"{'lote (NumPy)':<28}{tiempo_lote:>10.2f}{tiempo_lote * 1000 / USUARIOS_LOTE:>10.2f}")
+        print("✅ Mismos resultados" if iguales else "❌ Resultados distintos")
+
+
+# --- Ejecución del benchmark ---
+if __name__ == "__main__":
+    # Variables útiles: BENCH_CERVECERIAS, BENCH_CONSULTAS, BENCH_USUARIOS
+    CerveceriasCercanasBenchmark().run()
@@ -0,0 +1,103 @@
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# --- Configuración ---
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+DEGUSTACIONES = int(os.getenv("BENCH_DEGUSTACIONES", "1000000"))
+USUARIOS = int(os.getenv("BENCH_USUARIOS", "20000"))
+CERVEZAS = int(os.getenv("BENCH_CERVEZAS", "200"))
+LOTES = [int(n) for n in os.getenv("BENCH_LOTES", "500,2000,10000").split(",")]
+
+import random
+from sqlalchemy import delete, insert
+from sqlalchemy.orm import sessionmaker
+from app.base_datos import Base, crear_engine, importar_modelos
+importar_modelos()
+from app.objetos.cerveza import Cerveza
+from app.objetos.degustacion import DegustacionDB
+from app.objetos.galardon import Galardon, UsuarioContador, UsuarioDistinto, UsuarioGalardon
+from app.objetos.usuario import UsuarioDB
+from app.servicios import reglas_galardones
+
+
+class GalardonesBenchmark:
+    """
+    Recálculo de los galardones de todos los usuarios (recalcular-galardones)
+    sobre BENCH_DEGUSTACIONES degustaciones, con distintos usuarios por lote:
+    degustaciones por segundo y pico de memoria de Python
+    """
+
+    def print_header(self, titulo):
+        """Imprime un cabezal bonito"""
+        print("\n" + "="*60)
+        print(f" BENCHMARK: {titulo}")
+        print("="*60)
+
+    def poblar(self, engine):
+        """Crea usuarios, cervezas de varios países y estilos, galardones y las degustaciones"""
+        aleatorio = random.Random(25)
+        paises = [f"País {i}" for i in range(30)]
+        estilos = ["IPA", "Double IPA", "Lager", "Stout", "Porter", "Pilsner", "Saison", "Weissbier"]
+        with engine.begin() as conexion:
+            conexion.execute(insert(Cerveza), [{"nombre": f"Cerveza {i}", "pais_procedencia": paises[i % len(paises)],
+                "estilo": estilos[i % len(estilos)]} for i in range(CERVEZAS)])
+            conexion.execute(insert(UsuarioDB), [{"username": f"g{i}", "email": f"g{i}@test.com",
+                "password_hash": "x"} for i in range(USUARIOS)])
+            conexion.execute(insert(Galardon), [{"nombre": f"{clave} {umbral}", "descripcion": "x", "tipo": "bench",
+                "condiciones": {clave: umbral}} for clave in reglas_galardones.CONDICIONES
+                for umbral in (5, 20, 50)])
+            # Por bloques para no tener el millón de filas en memoria a la vez
+            for inicio in range(0, DEGUSTACIONES, 50000):
+                conexion.execute(insert(DegustacionDB), [{"usuario_id": aleatorio.randint(1, USUARIOS),
+                    "cerveza_id": aleatorio.randint(1, CERVEZAS), "puntuacion": 4}
+                    for _ in range(inicio, min(inicio + 50000, DEGUSTACIONES))])
+
+    def recalcular(self, Sesion, usuarios_por_lote):
+        """Recalcula todo como el comando, con un commit por lote. Devuelve (segundos, pico MB, lotes)"""
+        db = Sesion()
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        siguiente, lotes = 0, 0
+        while siguiente is not None:
+            siguiente = reglas_galardones.recalcular_lote(db, siguiente, usuarios_por_lote=usuarios_por_lote)["siguiente"]
+            db.commit()
+            lotes += 1
+        segundos = time.perf_counter() - inicio
+        pico = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+        db.close()
+        return segundos, pico, lotes
+
+    def run(self):
+        self.print_header(f"RECÁLCULO DE GALARDONES · {DEGUSTACIONES} degustaciones · {USUARIOS} usuarios")
+        with tempfile.TemporaryDirectory() as directorio:
+            engine = crear_engine(f"sqlite:///{os.path.join(directorio, 'galardones.db')}")
+            Base.metadata.create_all(bind=engine)
+            Sesion = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            inicio = time.perf_counter()
+            self.poblar(engine)
+            print(f"ℹ️  Datos creados en {time.perf_counter() - inicio:.1f} s")
+
+            print(f"{'Lote':>8}{'lotes':>8}{'segundos':>12}{'degustaciones/s':>18}{'pico MB':>10}{'filas galardón':>16}")
+            for usuarios_por_lote in LOTES:
+                # Desde cero cada vez: sin contadores ni galardones
+                with engine.begin() as conexion:
+                    for modelo in (UsuarioContador, UsuarioDistinto, UsuarioGalardon):
+                        conexion.execute(delete(modelo))
+                segundos, pico, lotes = self.recalcular(Sesion, usuarios_por_lote)
+                with Sesion() as db:
+                    filas = db.query(UsuarioGalardon).count()
+                print(f"{usuarios_por_lote:>8}{lotes:>8}{segundos:>12.1f}{DEGUSTACIONES / segundos:>18,.0f}"
+                      f"{pico:>10.1f}{filas:>16}")
+            engine.dispose()
+
+
+# --- Ejecución del benchmark ---
+if __name__ == "__main__":
+    # Variables útiles: BENCH_DEGUSTACIONES, BENCH_USUARIOS, BENCH_CERVEZAS, BENCH_LOTES
+    GalardonesBenchmark().run()
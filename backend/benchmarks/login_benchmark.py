@@ -0,0 +1,122 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# --- Configuración ---
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+COSTE = int(os.getenv("BENCH_COSTE", "10"))
+LOGINS = int(os.getenv("BENCH_LOGINS", "200"))
+CONCURRENCIAS = tuple(int(c) for c in os.getenv("BENCH_CONCURRENCIAS", "1,8,32").split(","))
+USUARIOS = 20
+
+from app import base_datos
+from app.main import app
+from app.servicios import hash_contrasenas
+
+
+class LoginBenchmark:
+    """
+    Ráfagas de POST /api/usuarios/login/ con N clientes a la vez: bcrypt en
+    el hilo de cada petición (cola sin límite) frente al pool acotado, que
+    responde 429 al saturarse (y el cliente reintenta). Mide logins/s,
+    latencias hasta el login correcto y cómo responde a la vez un endpoint
+    barato (GET /).
+    """
+
+    def print_header(self, titulo):
+        """Imprime un cabezal bonito"""
+        print("\n" + "="*60)
+        print(f" BENCHMARK: {titulo}")
+        print("="*60)
+
+    def percentil(self, valores, p):
+        valores = sorted(valores)
+        return valores[min(len(valores) - 1, int(len(valores) * p))] * 1000 if valores else float("nan")
+
+    def rafaga(self, concurrencia):
+        """Lanza LOGINS logins con 'concurrencia' clientes; devuelve métricas"""
+        latencias, estados = [], []
+        latencias_home = []
+        terminado = threading.Event()
+
+        def login(i):
+            # Ante un 429 el cliente reintenta tras el Retry-After; la
+            # latencia se mide hasta el login correcto
+            cliente = app.test_client()
+            inicio = time.perf_counter()
+            while True:
+                resp = cliente.post("/api/usuarios/login/",
+                    json={"username": f"bench{i % USUARIOS}", "password": "Clave123!"})
+                estados.append(resp.status_code)
+                if resp.status_code != 429:
+                    break
+                time.sleep(float(resp.headers.get("Retry-After", 1)))
+            if resp.status_code == 200:
+                latencias.append(time.perf_counter() - inicio)
+
+        def sondear_home():
+            cliente = app.test_client()
+            while not terminado.is_set():
+                inicio = time.perf_counter()
+                cliente.get("/")
+                latencias_home.append(time.perf_counter() - inicio)
+                time.sleep(0.01)
+
+        sonda = threading.Thread(target=sondear_home)
+        sonda.start()
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrencia) as clientes:
+            list(clientes.map(login, range(LOGINS)))
+        total = time.perf_counter() - inicio
+        terminado.set()
+        sonda.join()
+        return {
+            "ok/s": estados.count(200) / total,
+            "429": estados.count(429),
+            "p50": self.percentil(latencias, 0.50),
+            "p99": self.percentil(latencias, 0.99),
+            "home p99": self.percentil(latencias_home, 0.99),
+        }
+
+    def run(self):
+        self.print_header(f"LOGIN · coste bcrypt {COSTE} · {LOGINS} logins · {os.cpu_count()} CPU")
+        with tempfile.TemporaryDirectory() as directorio:
+            base_datos.configurar_engine(f"sqlite:///{os.path.join(directorio, 'login.db')}", None)
+            base_datos.importar_modelos()
+            base_datos.Base.metadata.create_all(bind=base_datos.engine)
+            hash_contrasenas.configurar(coste=COSTE)
+            cliente = app.test_client()
+            for i in range(USUARIOS):
+                cliente.post("/api/usuarios/", json={"username": f"bench{i}", "email": f"bench{i}@test.com",
+                    "password": "Clave123!", "birth_date": "1990-01-01"})
+
+            hilos = os.cpu_count() or 1
+            modos = [
+                # Sin límite: tantos hashes a la vez como peticiones (como antes)
+                ("sin límite", lambda c: hash_contrasenas.configurar(COSTE, hilos=c, cola_maxima=LOGINS)),
+                (f"pool {hilos} hilos, cola {4 * hilos}",
+                    lambda c: hash_contrasenas.configurar(COSTE, hilos=hilos, cola_maxima=4 * hilos)),
+            ]
+            self.print_header("RESULTADOS")
+            print(f"{'Clientes':<10}{'Modo':<24}{'ok/s':>8}{'429':>6}{'p50 ms':>9}{'p99 ms':>9}{'GET / p99':>11}")
+            for concurrencia in CONCURRENCIAS:
+                for nombre, configurar in modos:
+                    configurar(concurrencia)
+                    r = self.rafaga(concurrencia)
+                    print(f"{concurrencia:<10}{nombre:<24}{r['ok/s']:>8.1f}{r['429']:>6}"
+                          f"{r['p50']:>9.0f}{r['p99']:>9.0f}{r['home p99']:>11.1f}")
+
+            base_datos.engine.dispose()
+            base_datos.configurar_engine(base_datos.DATABASE_URL, None)
+            hash_contrasenas.configurar()
+
+
+# --- Ejecución del benchmark ---
+if __name__ == "__main__":
+    # Variables útiles: BENCH_COSTE, BENCH_LOGINS, BENCH_CONCURRENCIAS (p. ej. "1,8,32")
+    LoginBenchmark().run()
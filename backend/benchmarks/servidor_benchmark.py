@@ -0,0 +1,110 @@
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import requests
+
+# --- Configuración ---
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUTA = "/api/cervezas/"
+CLIENTES = int(os.getenv("BENCH_CLIENTES", "16"))
+DURACION = float(os.getenv("BENCH_DURACION", "10"))
+
+# Modos a comparar: nombre -> (comando, puerto)
+MODOS = {
+    "desarrollo (Werkzeug, debug)": (
+        [sys.executable, "-m", "app.main"], 8101),
+    "producción (gunicorn)": (
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:create_app()"], 8102),
+}
+
+
+class ServidorBenchmark:
+    """Compara el rendimiento de GET /api/cervezas/ con el servidor de desarrollo y con gunicorn"""
+
+    def print_header(self, titulo):
+        """Imprime un cabezal bonito"""
+        print("\n" + "="*60)
+        print(f" BENCHMARK: {titulo}")
+        print("="*60)
+
+    def arrancar(self, comando, puerto):
+        """Arranca un servidor en su propio grupo de procesos y espera a que responda"""
+        entorno = dict(os.environ, PORT=str(puerto))
+        proceso = subprocess.Popen(comando, cwd=BACKEND_DIR, env=entorno,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        for _ in range(60):
+            try:
+                requests.get(f"http://localhost:{puerto}/", timeout=1)
+                return proceso
+            except requests.RequestException:
+                time.sleep(0.5)
+        self.parar(proceso)
+        raise RuntimeError(f"El servidor no arrancó en el puerto {puerto}")
+
+    def parar(self, proceso):
+        """Para el servidor y sus procesos hijos (reloader o workers)"""
+        os.killpg(proceso.pid, signal.SIGTERM)
+        proceso.wait(timeout=30)
+
+    def medir(self, puerto):
+        """Lanza CLIENTES hilos contra RUTA durante DURACION segundos"""
+        url = f"http://localhost:{puerto}{RUTA}"
+        latencias, errores = [], [0]
+        cerrojo = threading.Lock()
+        fin = time.perf_counter() + DURACION
+
+        def cliente():
+            sesion = requests.Session()
+            propias = []
+            while time.perf_counter() < fin:
+                inicio = time.perf_counter()
+                try:
+                    resp = sesion.get(url, timeout=10)
+                    if resp.status_code == 200:
+                        propias.append(time.perf_counter() - inicio)
+                    else:
+                        errores[0] += 1
+                except requests.RequestException:
+                    errores[0] += 1
+            with cerrojo:
+                latencias.extend(propias)
+
+        hilos = [threading.Thread(target=cliente) for _ in range(CLIENTES)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        latencias.sort()
+        percentil = lambda p: latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000 if latencias else 0
+        return {
+            "peticiones_s": len(latencias) / DURACION,
+            "p50_ms": percentil(0.50),
+            "p99_ms": percentil(0.99),
+            "errores": errores[0],
+        }
+
+    def run(self):
+        self.print_header(f"GET {RUTA} · {CLIENTES} clientes · {DURACION:.0f} s por modo")
+        resultados = {}
+        for nombre, (comando, puerto) in MODOS.items():
+            print(f"\nℹ️  Midiendo modo {nombre}...")
+            proceso = self.arrancar(comando, puerto)
+            try:
+                resultados[nombre] = self.medir(puerto)
+            finally:
+                self.parar(proceso)
+
+        self.print_header("RESULTADOS")
+        print(f"{'Modo':<32}{'pet/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errores':>10}")
+        for nombre, r in resultados.items():
+            print(f"{nombre:<32}{r['peticiones_s']:>10.1f}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['errores']:>10}")
+
+
+# --- Ejecución del benchmark ---
+if __name__ == "__main__":
+    # Variables útiles: BENCH_CLIENTES, BENCH_DURACION, WEB_CONCURRENCY (workers de gunicorn)
+    ServidorBenchmark().run()
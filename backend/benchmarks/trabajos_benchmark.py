@@ -0,0 +1,104 @@
+import os
+import sys
+import tempfile
+import time
+
+# --- Configuración ---
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+TAMANOS = [int(n) for n in os.getenv("BENCH_AMIGOS", "10,1000,10000").split(",")]
+REPETICIONES = int(os.getenv("BENCH_REPETICIONES", "50"))
+
+from sqlalchemy import insert
+from sqlalchemy.orm import sessionmaker
+from app.base_datos import Base, crear_engine, importar_modelos
+importar_modelos()
+from app.objetos.cerveza import Cerveza
+from app.objetos.degustacion import DegustacionDB
+from app.objetos.galardon import Galardon
+from app.objetos.usuario import UsuarioDB, user_friends
+from app.servicios import actividad_servicio, degustacion_servicio, reglas_galardones, trabajos
+
+
+class TrabajosBenchmark:
+    """
+    Latencia de POST /degustaciones/ según los amigos del autor: con el
+    feed y los galardones calculados dentro de la petición (como antes)
+    frente a encolados para el hilo de trabajos
+    """
+
+    def print_header(self, titulo):
+        """Imprime un cabezal bonito"""
+        print("\n" + "="*60)
+        print(f" BENCHMARK: {titulo}")
+        print("="*60)
+
+    def poblar(self, engine, num_amigos):
+        """Crea un autor con 'num_amigos' amigos y devuelve (autor, cerveza)"""
+        prefijo = f"t{num_amigos}_"
+        with engine.begin() as conexion:
+            conexion.execute(insert(UsuarioDB), [{"username": f"{prefijo}{i}",
+                "email": f"{prefijo}{i}@test.com", "password_hash": "x"} for i in range(num_amigos + 1)])
+            ids = conexion.execute(UsuarioDB.__table__.select().with_only_columns(UsuarioDB.id)
+                .where(UsuarioDB.username.like(f"{prefijo}%")).order_by(UsuarioDB.id)).scalars().all()
+            autor, amigos = ids[0], ids[1:]
+            conexion.execute(insert(user_friends), [fila for amigo in amigos for fila in
+                ({"user_id": autor, "friend_id": amigo}, {"user_id": amigo, "friend_id": autor})])
+            cerveza_id = conexion.execute(insert(Cerveza).values(nombre=f"Cerveza {prefijo}",
+                estilo="IPA", pais_procedencia="España")).inserted_primary_key[0]
+        return autor, cerveza_id
+
+    def crear_sincrona(self, db, datos):
+        """Lo que se hacía antes: difundir y evaluar galardones antes del commit"""
+        degustacion = DegustacionDB(**datos)
+        db.add(degustacion)
+        db.flush()
+        actividad_servicio.difundir_degustacion(db, degustacion.id)
+        reglas_galardones._sumar(db, degustacion.usuario_id, {"degustaciones": 1})
+        reglas_galardones.evaluar(db, degustacion.usuario_id, reglas_galardones.CONTADORES)
+        db.commit()
+
+    def medir(self, Sesion, funcion):
+        """p50 y p99 en ms de 'funcion(db)', con una sesión nueva cada vez (como cada petición)"""
+        latencias = []
+        for _ in range(REPETICIONES):
+            db = Sesion()
+            inicio = time.perf_counter()
+            funcion(db)
+            latencias.append(time.perf_counter() - inicio)
+            db.close()
+        latencias.sort()
+        return latencias[len(latencias) // 2] * 1000, latencias[min(len(latencias) - 1, int(len(latencias) * 0.99))] * 1000
+
+    def run(self):
+        self.print_header(f"CREAR DEGUSTACIÓN · {REPETICIONES} repeticiones")
+        with tempfile.TemporaryDirectory() as directorio:
+            engine = crear_engine(f"sqlite:///{os.path.join(directorio, 'trabajos.db')}")
+            Base.metadata.create_all(bind=engine)
+            Sesion = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            with engine.begin() as conexion:
+                conexion.execute(insert(Galardon), [{"nombre": f"Galardón {i}", "descripcion": "x",
+                    "tipo": "cantidad", "condiciones": {"degustaciones_minimas": i + 1}} for i in range(20)])
+
+            print(f"{'Amigos':>8}{'síncrono p50/p99 ms':>24}{'encolado p50/p99 ms':>24}{'trabajos ms/u':>16}")
+            for num_amigos in TAMANOS:
+                autor, cerveza_id = self.poblar(engine, num_amigos)
+                datos = {"usuario_id": autor, "cerveza_id": cerveza_id, "puntuacion": 4}
+                sincrono = self.medir(Sesion, lambda db: self.crear_sincrona(db, dict(datos)))
+                encolado = self.medir(Sesion, lambda db: degustacion_servicio.crear_degustacion(db, dict(datos)))
+                # Lo que queda para el hilo de trabajos, fuera de la respuesta
+                db = Sesion()
+                inicio = time.perf_counter()
+                ejecutados = trabajos.ejecutar_pendientes(db)
+                por_trabajo = (time.perf_counter() - inicio) * 1000 / max(ejecutados, 1)
+                db.close()
+                print(f"{num_amigos:>8}{sincrono[0]:>14.2f} /{sincrono[1]:>7.2f}"
+                      f"{encolado[0]:>14.2f} /{encolado[1]:>7.2f}{por_trabajo:>16.2f}")
+            engine.dispose()
+
+
+# --- Ejecución del benchmark ---
+if __name__ == "__main__":
+    # Variables útiles: BENCH_AMIGOS, BENCH_REPETICIONES
+    TrabajosBenchmark().run()
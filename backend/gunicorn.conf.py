@@ -0,0 +1,71 @@
+# Configuración de gunicorn para producción
+# Arranque: gunicorn -c gunicorn.conf.py "app.main:create_app()"
+#
+# Variables de entorno:
+#   PORT                  Puerto de escucha (8000)
+#   WEB_CONCURRENCY       Número de workers (2 * núcleos + 1)
+#   GUNICORN_THREADS      Hilos por worker (1 = workers síncronos)
+#   GUNICORN_TIMEOUT      Segundos antes de reiniciar un worker bloqueado (30)
+#   GUNICORN_MAX_REQUESTS Peticiones antes de reciclar un worker (1000, 0 = nunca)
+#
+# Recarga en caliente: "kill -HUP <pid del master>" arranca workers nuevos
+# con el código actual y cierra los viejos cuando terminan sus peticiones.
+import multiprocessing
+import os
+import sys
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+worker_class = "gthread" if threads > 1 else "sync"
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+# Tiempo que tiene un worker para acabar sus peticiones al recargar o parar
+graceful_timeout = 30
+keepalive = 5
+
+# Reciclar workers de vez en cuando evita que crezca la memoria;
+# el jitter impide que todos se reinicien a la vez
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = max_requests // 10
+
+# La app se carga en cada worker (no en el master) para que la recarga
+# con HUP use el código nuevo y cada worker cree su propio engine de BD
+preload_app = False
+
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    # Sin SECRET_KEY cada worker firmaría los tokens con su propia clave
+    # aleatoria y no aceptaría los de los demás (ver app/servicios/tokens.py)
+    if not os.getenv("SECRET_KEY"):
+        raise RuntimeError("SECRET_KEY no está definida: es obligatoria con gunicorn.")
+
+
+def _base_datos():
+    """Módulo de BD si ya está cargado en este proceso (None si no)."""
+    return sys.modules.get("app.base_datos")
+
+
+def post_fork(server, worker):
+    # Si la app se precargó en el master (preload_app = True), el worker
+    # hereda su engine: creamos uno nuevo para no compartir conexiones
+    base_datos = _base_datos()
+    if base_datos is not None:
+        base_datos.configurar_engine()
+
+
+def on_reload(server):
+    server.log.info("Recarga solicitada: arrancando workers nuevos y cerrando los antiguos")
+
+
+def worker_exit(server, worker):
+    # Cierra limpiamente las conexiones del pool del worker que termina
+    base_datos = _base_datos()
+    if base_datos is not None:
+        for engine in (base_datos.engine, base_datos.engine_replica):
+            if engine is not None:
+                engine.dispose()
@@ -0,0 +1,240 @@
+-- Esquema de beersp_db para postgresql. NO EDITAR A MANO la parte del esquema:
+-- se genera desde los modelos con: flask --app app.main exportar-esquema
+-- Se ejecuta una sola vez, al crear el contenedor de la base de datos.
+-- CONNECT: docker exec -it beersp-db-pg psql -U beersp beersp_db
+
+CREATE TABLE IF NOT EXISTS cervecerias (
+	id SERIAL NOT NULL,
+	nombre VARCHAR(150) NOT NULL,
+	direccion VARCHAR(255) NOT NULL,
+	ciudad VARCHAR(100),
+	pais VARCHAR(100),
+	descripcion TEXT,
+	telefono VARCHAR(30),
+	horario VARCHAR(255),
+	foto TEXT,
+	lat FLOAT,
+	lon FLOAT,
+	geohash VARCHAR(12),
+	version INTEGER DEFAULT 1 NOT NULL,
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_cervecerias_ciudad ON cervecerias (ciudad);
+
+CREATE INDEX ix_cervecerias_geohash ON cervecerias (geohash);
+
+CREATE INDEX ix_cervecerias_id ON cervecerias (id);
+
+CREATE UNIQUE INDEX ix_cervecerias_nombre ON cervecerias (nombre);
+
+CREATE INDEX ix_cervecerias_pais ON cervecerias (pais);
+
+CREATE TABLE IF NOT EXISTS cervezas (
+	id SERIAL NOT NULL,
+	nombre VARCHAR(150) NOT NULL,
+	descripcion TEXT,
+	foto TEXT,
+	estilo VARCHAR(100),
+	pais_procedencia VARCHAR(100),
+	tamano VARCHAR(50),
+	formato VARCHAR(50),
+	porcentaje_alcohol FLOAT,
+	ibu INTEGER,
+	color VARCHAR(50),
+	suma_valoraciones FLOAT DEFAULT 0 NOT NULL,
+	total_valoraciones INTEGER DEFAULT 0 NOT NULL,
+	valoracion_promedio FLOAT,
+	version INTEGER DEFAULT 1 NOT NULL,
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_cervezas_estilo ON cervezas (estilo);
+
+CREATE INDEX ix_cervezas_id ON cervezas (id);
+
+CREATE UNIQUE INDEX ix_cervezas_nombre ON cervezas (nombre);
+
+CREATE INDEX ix_cervezas_pais_procedencia ON cervezas (pais_procedencia);
+
+CREATE TABLE IF NOT EXISTS galardones (
+	id SERIAL NOT NULL,
+	nombre VARCHAR(100) NOT NULL,
+	descripcion TEXT NOT NULL,
+	imagen_url VARCHAR(255),
+	tipo VARCHAR(50) NOT NULL,
+	condiciones JSON,
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_galardones_id ON galardones (id);
+
+CREATE UNIQUE INDEX ix_galardones_nombre ON galardones (nombre);
+
+CREATE TABLE IF NOT EXISTS tokens_revocados (
+	jti VARCHAR(36) NOT NULL,
+	expira TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL,
+	PRIMARY KEY (jti)
+);
+
+CREATE INDEX ix_tokens_revocados_expira ON tokens_revocados (expira);
+
+CREATE TABLE IF NOT EXISTS trabajos (
+	id SERIAL NOT NULL,
+	tipo VARCHAR(50) NOT NULL,
+	datos JSON NOT NULL,
+	estado VARCHAR(20) NOT NULL,
+	intentos INTEGER NOT NULL,
+	max_intentos INTEGER NOT NULL,
+	ejecutar_en TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	ultimo_error TEXT,
+	created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL,
+	terminado_en TIMESTAMP WITHOUT TIME ZONE,
+	PRIMARY KEY (id)
+);
+
+CREATE INDEX ix_trabajos_estado_ejecutar ON trabajos (estado, ejecutar_en);
+
+CREATE TABLE IF NOT EXISTS users (
+	id SERIAL NOT NULL,
+	username VARCHAR(50) NOT NULL,
+	email VARCHAR(100) NOT NULL,
+	birth_date DATE,
+	password_hash VARCHAR(255) NOT NULL,
+	created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL,
+	updated_at TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL,
+	PRIMARY KEY (id),
+	UNIQUE (username),
+	UNIQUE (email)
+);
+
+CREATE INDEX ix_users_id ON users (id);
+
+CREATE TABLE IF NOT EXISTS degustaciones (
+	id SERIAL NOT NULL,
+	usuario_id INTEGER NOT NULL,
+	cerveza_id INTEGER NOT NULL,
+	cerveceria_id INTEGER,
+	puntuacion FLOAT,
+	comentario TEXT,
+	fecha_creacion TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+	fecha_actualizacion TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+	version INTEGER DEFAULT 1 NOT NULL,
+	PRIMARY KEY (id),
+	FOREIGN KEY(usuario_id) REFERENCES users (id),
+	FOREIGN KEY(cerveza_id) REFERENCES cervezas (id),
+	FOREIGN KEY(cerveceria_id) REFERENCES cervecerias (id)
+);
+
+CREATE INDEX ix_degustaciones_cerveceria_id ON degustaciones (cerveceria_id);
+
+CREATE INDEX ix_degustaciones_cerveza_fecha_id ON degustaciones (cerveza_id, fecha_creacion, id);
+
+CREATE INDEX ix_degustaciones_cerveza_id ON degustaciones (cerveza_id);
+
+CREATE INDEX ix_degustaciones_fecha_id ON degustaciones (fecha_creacion, id);
+
+CREATE INDEX ix_degustaciones_id ON degustaciones (id);
+
+CREATE INDEX ix_degustaciones_usuario_fecha_id ON degustaciones (usuario_id, fecha_creacion, id);
+
+CREATE INDEX ix_degustaciones_usuario_id ON degustaciones (usuario_id);
+
+CREATE TABLE IF NOT EXISTS friend_requests (
+	user_id INTEGER NOT NULL,
+	friend_id INTEGER NOT NULL,
+	is_accepted BOOLEAN NOT NULL,
+	created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL,
+	PRIMARY KEY (user_id, friend_id),
+	FOREIGN KEY(user_id) REFERENCES users (id),
+	FOREIGN KEY(friend_id) REFERENCES users (id)
+);
+
+CREATE INDEX ix_friend_requests_friend_user ON friend_requests (friend_id, user_id);
+
+CREATE TABLE IF NOT EXISTS user_friends (
+	user_id INTEGER NOT NULL,
+	friend_id INTEGER NOT NULL,
+	created_at TIMESTAMP WITHOUT TIME ZONE DEFAULT CURRENT_TIMESTAMP NOT NULL,
+	PRIMARY KEY (user_id, friend_id),
+	CONSTRAINT ck_user_friends_distintos CHECK (user_id <> friend_id),
+	FOREIGN KEY(user_id) REFERENCES users (id),
+	FOREIGN KEY(friend_id) REFERENCES users (id)
+);
+
+CREATE INDEX ix_user_friends_friend_user ON user_friends (friend_id, user_id);
+
+CREATE TABLE IF NOT EXISTS usuario_contadores (
+	usuario_id INTEGER NOT NULL,
+	contador VARCHAR(30) NOT NULL,
+	valor INTEGER NOT NULL,
+	PRIMARY KEY (usuario_id, contador),
+	FOREIGN KEY(usuario_id) REFERENCES users (id)
+);
+
+CREATE TABLE IF NOT EXISTS usuario_distintos (
+	usuario_id INTEGER NOT NULL,
+	dimension VARCHAR(20) NOT NULL,
+	clave VARCHAR(150) NOT NULL,
+	veces INTEGER NOT NULL,
+	PRIMARY KEY (usuario_id, dimension, clave),
+	FOREIGN KEY(usuario_id) REFERENCES users (id)
+);
+
+CREATE TABLE IF NOT EXISTS usuario_galardones (
+	usuario_id INTEGER NOT NULL,
+	galardon_id INTEGER NOT NULL,
+	nivel_actual INTEGER NOT NULL,
+	progreso_actual INTEGER NOT NULL,
+	obtenido_en TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+	PRIMARY KEY (usuario_id, galardon_id),
+	FOREIGN KEY(usuario_id) REFERENCES users (id),
+	FOREIGN KEY(galardon_id) REFERENCES galardones (id)
+);
+
+CREATE TABLE IF NOT EXISTS actividad_amigos (
+	usuario_id INTEGER NOT NULL,
+	degustacion_id INTEGER NOT NULL,
+	autor_id INTEGER NOT NULL,
+	fecha_creacion TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+	PRIMARY KEY (usuario_id, degustacion_id),
+	FOREIGN KEY(usuario_id) REFERENCES users (id),
+	FOREIGN KEY(degustacion_id) REFERENCES degustaciones (id),
+	FOREIGN KEY(autor_id) REFERENCES users (id)
+);
+
+CREATE INDEX ix_actividad_amigos_degustacion_id ON actividad_amigos (degustacion_id);
+
+CREATE INDEX ix_actividad_usuario_autor ON actividad_amigos (usuario_id, autor_id);
+
+CREATE INDEX ix_actividad_usuario_fecha ON actividad_amigos (usuario_id, fecha_creacion, degustacion_id);
+
+CREATE TABLE IF NOT EXISTS comentarios_degustaciones (
+	id SERIAL NOT NULL,
+	degustacion_id INTEGER NOT NULL,
+	usuario_id INTEGER NOT NULL,
+	comentario TEXT NOT NULL,
+	fecha_creacion TIMESTAMP WITHOUT TIME ZONE DEFAULT now(),
+	PRIMARY KEY (id),
+	FOREIGN KEY(degustacion_id) REFERENCES degustaciones (id),
+	FOREIGN KEY(usuario_id) REFERENCES users (id)
+);
+
+CREATE INDEX ix_comentarios_degustaciones_degustacion_id ON comentarios_degustaciones (degustacion_id);
+
+CREATE INDEX ix_comentarios_degustaciones_id ON comentarios_degustaciones (id);
+
+CREATE INDEX ix_comentarios_degustaciones_usuario_id ON comentarios_degustaciones (usuario_id);
+
+-- Datos de ejemplo (PostgreSQL: ON CONFLICT DO NOTHING)
+INSERT INTO users (username, email, birth_date, password_hash) VALUES
+('john_doe', 'john@example.com', '1990-05-15', 'hashed_password_123'),
+('jane_smith', 'jane@example.com', '1992-08-20', 'hashed_password_456'),
+('beer_lover', 'beer@example.com', '1988-12-01', 'hashed_password_789')
+ON CONFLICT DO NOTHING;
+
+-- Insert friend relationships
+INSERT INTO user_friends (user_id, friend_id) VALUES
+(1, 2), (2, 1), (1, 3), (3, 1)
+ON CONFLICT DO NOTHING;
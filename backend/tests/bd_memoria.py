@@ -0,0 +1,84 @@
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+# Permite importar el paquete 'app' al ejecutar "python tests/<x>_tester.py"
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# Las pruebas dentro del proceso no tocan app/database.db: la base de datos
+# por defecto de la app (test_client, hilo de trabajos, lista de revocados)
+# es un fichero temporal que se borra al salir
+DIRECTORIO_PRUEBAS = tempfile.mkdtemp(prefix="beersp_pruebas_")
+atexit.register(shutil.rmtree, DIRECTORIO_PRUEBAS, True)
+URL_PRUEBAS = f"sqlite:///{os.path.join(DIRECTORIO_PRUEBAS, 'pruebas.db')}"
+os.environ["DATABASE_URL"] = URL_PRUEBAS
+os.environ.pop("REPLICA_DATABASE_URL", None)
+
+from app import base_datos
+from app.main import app
+from app.base_datos import Base, crear_engine
+from app.servicios.busqueda import crear_indices_busqueda
+
+# Por si 'app' ya se había importado antes con la configuración del entorno
+base_datos.DATABASE_URL, base_datos.REPLICA_DATABASE_URL = URL_PRUEBAS, None
+base_datos.configurar_engine()
+base_datos.importar_modelos()
+Base.metadata.create_all(bind=base_datos.engine)
+
+
+def crear_sesion_memoria():
+    """
+    Crea una base de datos SQLite en memoria con todas las tablas
+    y devuelve (engine, sesión). Sirve para pruebas dentro del proceso,
+    sin servidor y sin tocar el fichero database.db.
+    """
+    engine = crear_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    crear_indices_busqueda(engine)
+    SesionMemoria = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    return engine, SesionMemoria()
+
+
+class ContadorConsultas:
+    """
+    Cuenta las sentencias SQL que se ejecutan sobre un engine.
+
+    Uso:
+        with ContadorConsultas(engine) as contador:
+            ...
+        print(contador.total)
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.sentencias = []
+        self.parametros = []
+
+    def _registrar(self, conn, cursor, statement, parameters, context, executemany):
+        self.sentencias.append(statement)
+        self.parametros.append(parameters)
+
+    @property
+    def total(self):
+        return len(self.sentencias)
+
+    def planes(self):
+        """EXPLAIN QUERY PLAN (SQLite) de cada SELECT registrado, como texto"""
+        with self.engine.connect() as conexion:
+            return ["\n".join(fila[-1] for fila in conexion.exec_driver_sql(
+                        f"EXPLAIN QUERY PLAN {sentencia}", parametros))
+                    for sentencia, parametros in zip(self.sentencias, self.parametros)
+                    if sentencia.lstrip().upper().startswith("SELECT")]
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._registrar)
+        return self
+
+    def __exit__(self, *args):
+        event.remove(self.engine, "before_cursor_execute", self._registrar)
@@ -349,6 +349,165 @@ class CerveceriaTester:
             self.print_error(f"Error probando 'me gusta' sin usuario_id: {e}")
             return False
 
+    def test_cercanas_ordenadas_por_distancia(self):
+        """
+        Prueba que las sugeridas usan las coordenadas reales: solo las que
+        están dentro del radio, ordenadas por distancia y con el geohash al
+        día tras editar las coordenadas. Se ejecuta dentro del proceso sobre
+        una base de datos en memoria.
+        """
+        self.print_test_header("CERVECERÍAS CERCANAS ORDENADAS POR DISTANCIA")
+        
+        try:
+            from flask import g
+            from bd_memoria import app, crear_sesion_memoria
+            from app.objetos.cerveceria import Cerveceria
+            from app.servicios import geolocalizacion
+            from app.servicios.cerveceria_servicio import CerveceriaService
+            from app.controladores.cerveceria_controlador import api_sugerencias_cervecerias
+
+            engine, db = crear_sesion_memoria()
+            # Puerta del Sol (Madrid) como punto de referencia
+            for nombre, lat, lon in [("Sol", 40.4169, -3.7035), ("Retiro", 40.4153, -3.6845),
+                                     ("Toledo", 39.8628, -4.0273), ("Sin coordenadas", None, None)]:
+                CerveceriaService.crear_cerveceria(db, {"nombre": nombre, "direccion": "x",
+                    "lat": lat, "lon": lon})
+
+            def nombres_sugeridos(query):
+                with app.test_request_context(f"/api/cervecerias/sugeridas/?{query}"):
+                    g.db = db
+                    resp, status = api_sugerencias_cervecerias()
+                return status, [c["nombre"] for c in resp.get_json()] if status == 200 else None
+
+            resultados = {
+                "radio 5": nombres_sugeridos("lat=40.4168&lon=-3.7038&radio=5"),
+                "radio 100": nombres_sugeridos("lat=40.4168&lon=-3.7038&radio=100"),
+                "limite 1": nombres_sugeridos("lat=40.4168&lon=-3.7038&radio=100&limite=1"),
+                "sin lat": nombres_sugeridos("lon=-3.7038"),
+                "fuera de rango": nombres_sugeridos("lat=91&lon=0"),
+            }
+            # Mover Toledo al lado de Sol debe recalcular su geohash
+            toledo = db.query(Cerveceria).filter_by(nombre="Toledo").first()
+            CerveceriaService.actualizar_cerveceria(db, toledo.id, {"lat": 40.4170, "lon": -3.7036})
+            resultados["tras mover Toledo"] = nombres_sugeridos("lat=40.4168&lon=-3.7038&radio=1")
+            db.close()
+            # El fin de cada rango solo usa el alfabeto del geohash (válido con cualquier collation)
+            resultados["fin de prefijo"] = [geolocalizacion.fin_prefijo(p) for p in ("ezs", "e0", "ezz", "zz")]
+
+            esperados = {
+                "radio 5": (200, ["Sol", "Retiro"]),
+                "radio 100": (200, ["Sol", "Retiro", "Toledo"]),
+                "limite 1": (200, ["Sol"]),
+                "sin lat": (400, None),
+                "fuera de rango": (400, None),
+                "tras mover Toledo": (200, ["Sol", "Toledo"]),
+                "fin de prefijo": ["ezt", "e1", "f", None],
+            }
+            if resultados == esperados:
+                self.print_success("Sugeridas filtradas por radio y ordenadas por distancia")
+                return True
+            self.print_error(f"Resultados {resultados}, esperados {esperados}")
+            return False
+                
+        except Exception as e:
+            self.print_error(f"Error probando las cervecerías cercanas: {e}")
+            return False
+
+    def test_busqueda_texto_cervecerias(self):
+        """Prueba la búsqueda FTS5 de cervecerías por nombre, ciudad y país, sin tildes"""
+        self.print_test_header("BÚSQUEDA DE TEXTO COMPLETO DE CERVECERÍAS")
+        
+        try:
+            from bd_memoria import crear_sesion_memoria
+            from app.servicios.cerveceria_servicio import CerveceriaService
+
+            engine, db = crear_sesion_memoria()
+            for nombre, ciudad, pais in [("Cervecería La Tradición", "Madrid", "España"),
+                                         ("Hoppy Corner", "València", "España"),
+                                         ("Munich Haus", "Berlín", "Alemania")]:
+                CerveceriaService.crear_cerveceria(db, {"nombre": nombre, "direccion": "x",
+                    "ciudad": ciudad, "pais": pais})
+
+            resultados = {q: [c.nombre for c in CerveceriaService.buscar_cervecerias(db, q=q)]
+                for q in ("cerveceria tradicion", "valencia", "berl", "espana")}
+            # Mismo peso en ambas: el orden lo decide bm25, solo comprobamos cuáles son
+            resultados["espana"] = sorted(resultados["espana"])
+            resultados["espana en Madrid"] = [c.nombre for c in
+                CerveceriaService.buscar_cervecerias(db, q="espana", ciudad="Madrid")]
+            db.close()
+
+            esperados = {
+                "cerveceria tradicion": ["Cervecería La Tradición"],
+                "valencia": ["Hoppy Corner"],
+                "berl": ["Munich Haus"],
+                "espana": ["Cervecería La Tradición", "Hoppy Corner"],
+                "espana en Madrid": ["Cervecería La Tradición"],
+            }
+            if resultados == esperados:
+                self.print_success("Búsqueda de cervecerías sin tildes, por prefijo y combinable con filtros")
+                return True
+            self.print_error(f"Resultados {resultados}, esperados {esperados}")
+            return False
+                
+        except Exception as e:
+            self.print_error(f"Error probando la búsqueda de cervecerías: {e}")
+            return False
+
+    def test_cercanas_en_lote(self, num_cervecerias=2000, num_puntos=50, k=5):
+        """
+        Prueba que la consulta en lote (NumPy) devuelve, para cada punto, lo
+        mismo que get_cervecerias_cercanas limitado a k, y que el endpoint
+        /cervecerias/sugeridas/lote/ valida la entrada.
+        """
+        self.print_test_header(f"CERVECERÍAS CERCANAS EN LOTE ({num_puntos} puntos, k={k})")
+        
+        try:
+            from bd_memoria import app, crear_sesion_memoria
+            from app.objetos.cerveceria import Cerveceria
+            from app.servicios.cerveceria_servicio import CerveceriaService
+            from app.controladores.cerveceria_controlador import api_sugerencias_cervecerias_lote
+            from flask import g
+
+            engine, db = crear_sesion_memoria()
+            aleatorio = random.Random(3)
+            db.add_all([Cerveceria(nombre=f"Lote {i}", direccion="x",
+                lat=aleatorio.uniform(40.0, 41.0), lon=aleatorio.uniform(-4.2, -3.2))
+                for i in range(num_cervecerias)])
+            db.commit()
+            puntos = [(aleatorio.uniform(40.0, 41.0), aleatorio.uniform(-4.2, -3.2))
+                for _ in range(num_puntos)]
+
+            lote = CerveceriaService.get_cervecerias_cercanas_lote(db, puntos, radio=5, k=k)
+            distintos = 0
+            for (lat, lon), cercanas in zip(puntos, lote):
+                individuales = CerveceriaService.get_cervecerias_cercanas(db, lat, lon, 5, k)
+                if [c.id for c, _ in cercanas] != [c.id for c, _ in individuales] or any(
+                        abs(d1 - d2) > 1e-6 for (_, d1), (_, d2) in zip(cercanas, individuales)):
+                    distintos += 1
+
+            def estado(cuerpo):
+                with app.test_request_context("/api/cervecerias/sugeridas/lote/", method="POST", json=cuerpo):
+                    g.db = db
+                    return api_sugerencias_cervecerias_lote()[1]
+
+            estados = [
+                estado({"puntos": [{"lat": 40.5, "lon": -3.7, "id": 1}], "k": 3}),
+                estado({"puntos": []}),
+                estado({"puntos": [{"lat": 95, "lon": 0}]}),
+                estado({"puntos": [{"lat": 40.5, "lon": -3.7}], "k": 0}),
+            ]
+            db.close()
+
+            if distintos == 0 and estados == [200, 400, 400, 400]:
+                self.print_success(f"Lote coincide con {num_puntos} consultas individuales; validación correcta")
+                return True
+            self.print_error(f"{distintos} puntos con resultados distintos; estados {estados}")
+            return False
+                
+        except Exception as e:
+            self.print_error(f"Error probando las cercanas en lote: {e}")
+            return False
+
     def run_comprehensive_test(self):
         """Ejecuta una prueba completa de todos los endpoints de cervecerías"""
         self.print_test_header("INICIANDO PRUEBA COMPREHENSIVA DE CERVECERÍAS")
@@ -441,6 +600,12 @@ class CerveceriaTester:
         self.test_buscar_cervecerias(q="Brew", ciudad="Barcelona", expected_min_count=1)
         self.wait_for_operation()
         
+        # Paso 6: Probar geolocalización y búsqueda de texto (sin servidor)
+        self.print_info("Paso 7: Probando cervecerías cercanas y búsqueda de texto...")
+        self.test_cercanas_ordenadas_por_distancia()
+        self.test_cercanas_en_lote()
+        self.test_busqueda_texto_cervecerias()
+        
         # Resultados finales
         self.print_test_summary()
 
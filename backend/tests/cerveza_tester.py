@@ -433,6 +433,313 @@ class CervezaTester:
             self.print_error(f"Error en búsqueda con filtros: {e}")
             return False
 
+    def test_consultas_busqueda_constantes(self, num_cervezas=5000):
+        """
+        Prueba que GET /cervezas/ no hace N+1: el número de sentencias SQL
+        es el mismo para un catálogo pequeño que para uno de num_cervezas.
+        Se ejecuta dentro del proceso sobre una base de datos en memoria.
+        """
+        self.print_test_header(f"CONSULTAS CONSTANTES EN BÚSQUEDA ({num_cervezas} cervezas)")
+        
+        try:
+            import inspect
+            from flask import g
+            from bd_memoria import app, crear_sesion_memoria, ContadorConsultas
+            from app.objetos.cerveza import Cerveza
+            from app.objetos.degustacion import DegustacionDB
+            from app.objetos.usuario import UsuarioDB
+            from app.controladores.cerveza_controlador import api_buscar_cervezas
+
+            def contar_consultas(total_cervezas):
+                engine, db = crear_sesion_memoria()
+                db.add(UsuarioDB(id=1, username="contador", email="contador@test.com",
+                    password_hash="x"))
+                db.add_all([Cerveza(id=i, nombre=f"Cerveza {i}", estilo="IPA")
+                    for i in range(1, total_cervezas + 1)])
+                # Una degustación cada 3 cervezas para tener promedios reales
+                db.add_all([DegustacionDB(usuario_id=1, cerveza_id=i, puntuacion=i % 5)
+                    for i in range(1, total_cervezas + 1, 3)])
+                db.commit()
+                db.expunge_all()
+
+                with app.test_request_context("/api/cervezas/"):
+                    g.db = db
+                    with ContadorConsultas(engine) as contador:
+                        # La vista sin decoradores de caché/ETag (siempre consulta la BD)
+                        resp, status = inspect.unwrap(api_buscar_cervezas)()
+                db.close()
+                return contador.total, status, resp.get_json()
+
+            consultas_pequeno, _, _ = contar_consultas(10)
+            consultas_grande, status, cervezas = contar_consultas(num_cervezas)
+
+            if status != 200 or len(cervezas) != num_cervezas:
+                self.print_error(f"Respuesta inesperada: {status} con {len(cervezas)} cervezas")
+                return False
+            if 'total_valoraciones' not in cervezas[0]:
+                self.print_error("La respuesta no incluye 'total_valoraciones'")
+                return False
+            if consultas_grande == consultas_pequeno == 1:
+                self.print_success(f"Búsqueda en 1 consulta con 10 y con {num_cervezas} cervezas")
+                return True
+            self.print_error(f"Consultas: {consultas_pequeno} (10 cervezas) vs "
+                f"{consultas_grande} ({num_cervezas} cervezas)")
+            return False
+                
+        except Exception as e:
+            self.print_error(f"Error contando consultas de búsqueda: {e}")
+            return False
+
+    def test_valoracion_agregada_incremental(self):
+        """
+        Prueba que los agregados de valoración de Cerveza (suma, total y
+        promedio) se mantienen al crear, editar y borrar degustaciones, y
+        que coinciden con la reconciliación completa.
+        """
+        self.print_test_header("VALORACIÓN AGREGADA INCREMENTAL")
+        
+        try:
+            from bd_memoria import crear_sesion_memoria
+            from app.objetos.cerveza import Cerveza
+            from app.objetos.usuario import UsuarioDB
+            from app.servicios import degustacion_servicio
+            from app.servicios.cerveza_servicio import CervezaService
+
+            engine, db = crear_sesion_memoria()
+            db.add(UsuarioDB(id=1, username="agregados", email="agregados@test.com",
+                password_hash="x"))
+            db.add_all([Cerveza(id=1, nombre="Agregada 1"), Cerveza(id=2, nombre="Agregada 2")])
+            db.commit()
+
+            d1 = degustacion_servicio.crear_degustacion(db, {"usuario_id": 1, "cerveza_id": 1, "puntuacion": 4})
+            d2 = degustacion_servicio.crear_degustacion(db, {"usuario_id": 1, "cerveza_id": 1, "puntuacion": 2})
+            degustacion_servicio.crear_degustacion(db, {"usuario_id": 1, "cerveza_id": 1})
+            degustacion_servicio.actualizar_degustacion(db, d2.id, {"puntuacion": 5, "cerveza_id": 2})
+            degustacion_servicio.eliminar_degustacion(db, d1.id)
+            degustacion_servicio.crear_degustacion(db, {"usuario_id": 1, "cerveza_id": 2, "puntuacion": 3})
+
+            def agregados():
+                db.expire_all()
+                return [(c.suma_valoraciones, c.total_valoraciones, c.valoracion_promedio)
+                    for c in db.query(Cerveza).order_by(Cerveza.id)]
+
+            incrementales = agregados()
+            CervezaService.reconciliar_valoraciones(db)
+            reconciliados = agregados()
+            db.close()
+
+            esperados = [(0, 0, None), (8, 2, 4.0)]
+            if incrementales == reconciliados == esperados:
+                self.print_success("Agregados incrementales correctos y coherentes con la reconciliación")
+                return True
+            self.print_error(f"Incrementales {incrementales} / reconciliados {reconciliados} "
+                f"/ esperados {esperados}")
+            return False
+                
+        except Exception as e:
+            self.print_error(f"Error comprobando agregados de valoración: {e}")
+            return False
+
+    def test_pool_y_pragmas_sqlite(self):
+        """
+        Prueba que una base de datos SQLite en fichero usa QueuePool con los
+        PRAGMAs configurados y que, con WAL, una lectura no espera a una
+        transacción de escritura abierta en otra conexión.
+        """
+        self.print_test_header("POOL DE CONEXIONES Y PRAGMAS DE SQLITE")
+        
+        try:
+            import os
+            import tempfile
+            from sqlalchemy import text
+            from sqlalchemy.pool import QueuePool, StaticPool
+            from bd_memoria import crear_sesion_memoria
+            from app.base_datos import crear_engine, SQLITE_PRAGMAS
+
+            engine_memoria, db = crear_sesion_memoria()
+            db.close()
+            if not isinstance(engine_memoria.pool, StaticPool):
+                self.print_error("La base de datos en memoria debería usar StaticPool")
+                return False
+
+            with tempfile.TemporaryDirectory() as directorio:
+                engine = crear_engine(f"sqlite:///{os.path.join(directorio, 'pool.db')}")
+                if not isinstance(engine.pool, QueuePool):
+                    self.print_error(f"Pool inesperado: {type(engine.pool).__name__}")
+                    return False
+
+                with engine.connect() as conexion:
+                    valores = {pragma: conexion.execute(text(f"PRAGMA {pragma}")).scalar()
+                        for pragma in SQLITE_PRAGMAS}
+                esperados = {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000,
+                    "cache_size": SQLITE_PRAGMAS["cache_size"], "mmap_size": SQLITE_PRAGMAS["mmap_size"]}
+                if valores != esperados:
+                    self.print_error(f"PRAGMAs {valores}, esperados {esperados}")
+                    engine.dispose()
+                    return False
+
+                # Un escritor con la transacción abierta no bloquea a un lector
+                with engine.connect() as escritor, engine.connect() as lector:
+                    escritor.execute(text("CREATE TABLE t (x INTEGER)"))
+                    escritor.commit()
+                    escritor.execute(text("INSERT INTO t VALUES (1)"))
+                    filas = lector.execute(text("SELECT COUNT(*) FROM t")).scalar()
+                    escritor.commit()
+                engine.dispose()
+
+            if filas == 0:
+                self.print_success("QueuePool + WAL: lectura concurrente con escritura abierta")
+                return True
+            self.print_error(f"El lector vio {filas} filas sin confirmar")
+            return False
+                
+        except Exception as e:
+            self.print_error(f"Error comprobando el pool de conexiones: {e}")
+            return False
+
+    def test_busqueda_texto_completo(self):
+        """
+        Prueba la búsqueda FTS5 de cervezas: sin tildes ni mayúsculas, por
+        prefijo, en varias columnas, ordenada por relevancia y sincronizada
+        al crear, editar y borrar.
+        """
+        self.print_test_header("BÚSQUEDA DE TEXTO COMPLETO DE CERVEZAS")
+        
+        try:
+            from bd_memoria import crear_sesion_memoria
+            from app.servicios.cerveza_servicio import CervezaService
+
+            engine, db = crear_sesion_memoria()
+            for datos in [
+                {"nombre": "Múnich Dunkel", "estilo": "Lager oscura", "pais_procedencia": "Alemania"},
+                {"nombre": "Hoppy IPA", "estilo": "IPA", "pais_procedencia": "España"},
+                {"nombre": "Trigo Claro", "estilo": "Weissbier",
+                    "descripcion": "Inspirada en las cervezas de Múnich"},
+            ]:
+                CervezaService.crear_cerveza(db, datos)
+
+            def nombres(q):
+                return [c.nombre for c in CervezaService.buscar_cervezas(db, q=q)]
+
+            resultados = {
+                "munich": nombres("munich"),
+                "ip": nombres("ip"),
+                "ESPAÑA": nombres("ESPAÑA"),
+                "lager alemania": nombres("lager alemania"),
+                "'\"*": nombres("'\"*"),
+            }
+            ipa = CervezaService.buscar_cervezas(db, q="hoppy")[0]
+            CervezaService.actualizar_cerveza(db, ipa.id, {"nombre": "Lupulada"})
+            resultados["hoppy tras renombrar"] = nombres("hoppy")
+            resultados["lupulada"] = nombres("lupulada")
+            CervezaService.eliminar_cerveza(db, ipa.id)
+            resultados["lupulada tras borrar"] = nombres("lupulada")
+            db.close()
+
+            esperados = {
+                # El nombre pesa más que la descripción
+                "munich": ["Múnich Dunkel", "Trigo Claro"],
+                "ip": ["Hoppy IPA"],
+                "ESPAÑA": ["Hoppy IPA"],
+                "lager alemania": ["Múnich Dunkel"],
+                # Sin palabras no hay consulta FTS5 válida (ni error de sintaxis)
+                "'\"*": [],
+                "hoppy tras renombrar": [],
+                "lupulada": ["Lupulada"],
+                "lupulada tras borrar": [],
+            }
+            if resultados == esperados:
+                self.print_success("Búsqueda sin tildes, por prefijo, por relevancia y sincronizada")
+                return True
+            self.print_error(f"Resultados {resultados}, esperados {esperados}")
+            return False
+                
+        except Exception as e:
+            self.print_error(f"Error probando la búsqueda de texto completo: {e}")
+            return False
+
+    def test_autocompletado(self):
+        """
+        Prueba el autocompletado en memoria: por prefijo del nombre o de
+        una palabra, sin tildes, y al día tras crear, renombrar y borrar
+        sin volver a consultar la base de datos. Al reconstruirse lee de la
+        primaria aunque la sesión vaya a la réplica, y no pierde lo escrito
+        mientras se reconstruye.
+        """
+        self.print_test_header("AUTOCOMPLETADO DE CERVEZAS")
+        
+        try:
+            from sqlalchemy import event
+            from bd_memoria import crear_sesion_memoria, ContadorConsultas
+            from app import base_datos
+            from app.servicios import autocompletado
+            from app.servicios.cerveza_servicio import CervezaService
+
+            engine, db = crear_sesion_memoria()
+            for nombre in ["Mahou Cinco Estrellas", "Estrella Galicia", "Estrella Damm", "Águila Ámbar"]:
+                CervezaService.crear_cerveza(db, {"nombre": nombre})
+
+            def nombres(q, limite=10):
+                return [texto for _, texto in autocompletado.autocompletar(db, "cervezas", q, limite)]
+
+            resultados = {"estre": nombres("estre")}
+            with ContadorConsultas(engine) as contador:
+                resultados["AGUI"] = nombres("AGUI")
+                resultados["estre limite 1"] = nombres("estre", 1)
+                resultados["''"] = nombres("")
+            consultas_busqueda = contador.total
+
+            galicia = CervezaService.buscar_cervezas(db, q="galicia")[0]
+            CervezaService.crear_cerveza(db, {"nombre": "Estrella Levante"})
+            CervezaService.actualizar_cerveza(db, galicia.id, {"nombre": "Galicia Especial"})
+            CervezaService.eliminar_cerveza(db, CervezaService.buscar_cervezas(db, q="damm")[0].id)
+            with ContadorConsultas(engine) as contador:
+                resultados["estre tras cambios"] = nombres("estre")
+            consultas_busqueda += contador.total
+
+            # Reconstrucciones forzadas: un alta que llega en plena consulta del índice
+            # y una sesión enrutada a una réplica vacía
+            replica, _ = crear_sesion_memoria()
+            anteriores = (autocompletado.REFRESCO_SEGUNDOS, base_datos.engine_replica)
+            altas = [(1000, "Estrella Fugaz")]
+            def alta_concurrente(conn, cursor, statement, parameters, context, executemany):
+                if "FROM cervezas" in statement and altas:
+                    autocompletado.actualizar(db, "cervezas", *altas.pop())
+            autocompletado.REFRESCO_SEGUNDOS, base_datos.engine_replica = 0, replica
+            try:
+                event.listen(engine, "before_cursor_execute", alta_concurrente)
+                resultados["estre con alta concurrente"] = nombres("estre")
+                event.remove(engine, "before_cursor_execute", alta_concurrente)
+                with base_datos.SesionEnrutada(bind=engine, info={"replica": True}) as lectora:
+                    resultados["mahou desde la réplica"] = [texto for _, texto in
+                        autocompletado.autocompletar(lectora, "cervezas", "mahou")]
+            finally:
+                autocompletado.REFRESCO_SEGUNDOS, base_datos.engine_replica = anteriores
+            db.close()
+
+            esperados = {
+                # Primero los que empiezan por el prefijo, luego por palabra
+                "estre": ["Estrella Damm", "Estrella Galicia", "Mahou Cinco Estrellas"],
+                "AGUI": ["Águila Ámbar"],
+                "estre limite 1": ["Estrella Damm"],
+                "''": [],
+                "estre tras cambios": ["Estrella Levante", "Mahou Cinco Estrellas"],
+                "estre con alta concurrente": ["Estrella Fugaz", "Estrella Levante", "Mahou Cinco Estrellas"],
+                "mahou desde la réplica": ["Mahou Cinco Estrellas"],
+            }
+            if resultados != esperados:
+                self.print_error(f"Resultados {resultados}, esperados {esperados}")
+                return False
+            if consultas_busqueda:
+                self.print_error(f"El autocompletado hizo {consultas_busqueda} consultas a la BD (esperadas 0)")
+                return False
+            self.print_success("Autocompletado por prefijo, sin consultas, al día tras los cambios y reconstruido desde la primaria")
+            return True
+                
+        except Exception as e:
+            self.print_error(f"Error probando el autocompletado: {e}")
+            return False
+
     def test_cervezas_favoritas_usuario_inexistente(self):
         """Prueba obtener cervezas favoritas de usuario inexistente"""
         self.print_test_header("CERVEZAS FAVORITAS DE USUARIO INEXISTISTENTE")
@@ -655,6 +962,14 @@ class CervezaTester:
             self.test_eliminar_cerveza(cerveza_a_eliminar)
             self.wait_for_operation()
         
+        # Paso 10: Probar rendimiento de la búsqueda, agregados y pool de BD (sin servidor)
+        self.print_info("Paso 10: Probando consultas de la búsqueda y valoraciones agregadas...")
+        self.test_consultas_busqueda_constantes()
+        self.test_valoracion_agregada_incremental()
+        self.test_pool_y_pragmas_sqlite()
+        self.test_busqueda_texto_completo()
+        self.test_autocompletado()
+        
         # Resultados finales
         self.print_test_summary()
 
@@ -1,3 +1,5 @@
+import os
+import sys
 import requests
 import json
 import time
@@ -315,6 +317,213 @@ class DegustacionTester:
             self.print_error(f"Error obteniendo degustaciones: {e}")
             return None
 
+    def test_paginacion_cursor(self, usuario_id, expected_total, limit=1):
+        """Prueba recorrer las degustaciones de un usuario con paginación por cursor"""
+        self.print_test_header(f"PAGINACIÓN POR CURSOR DEL USUARIO: {usuario_id}")
+        
+        try:
+            vistos = []
+            cursor = ""  # Cursor vacío = primera página
+            while cursor is not None:
+                resp = requests.get(f"{BASE_URL}/degustaciones/", params={
+                    'usuario_id': usuario_id, 'limit': limit, 'cursor': cursor
+                })
+                if resp.status_code != 200:
+                    self.print_error(f"Error paginando. Código: {resp.status_code} - {resp.json()['error']}")
+                    return None
+                pagina = resp.json()
+                vistos.extend(d['id'] for d in pagina['degustaciones'])
+                cursor = pagina['siguiente_cursor']
+                if len(vistos) > expected_total + limit:
+                    break
+            
+            if len(vistos) == len(set(vistos)) == expected_total:
+                self.print_success(f"Recorridas {len(vistos)} degustaciones sin duplicados")
+                return vistos
+            self.print_error(f"Se esperaban {expected_total} degustaciones únicas, se obtuvieron {vistos}")
+            return vistos
+                
+        except Exception as e:
+            self.print_error(f"Error paginando degustaciones: {e}")
+            return None
+
+    def test_cursor_busca_en_indice(self, total=30, limit=7):
+        """
+        Prueba (sin servidor) que las páginas por cursor recorren todas las
+        degustaciones una sola vez, aunque compartan fecha, y que cada página
+        busca en el índice desde el cursor (fecha_creacion < ?) en vez de
+        recorrer todas las entradas más nuevas
+        """
+        self.print_test_header("PAGINACIÓN POR CURSOR CON BÚSQUEDA EN EL ÍNDICE")
+        
+        try:
+            from bd_memoria import crear_sesion_memoria, ContadorConsultas
+            from app.objetos.cerveza import Cerveza
+            from app.objetos.degustacion import DegustacionDB
+            from app.objetos.usuario import UsuarioDB
+            from app.servicios import degustacion_servicio
+
+            engine, db = crear_sesion_memoria()
+            db.add_all([UsuarioDB(id=1, username="paginado", email="paginado@test.com", password_hash="x"),
+                        Cerveza(id=1, nombre="Paginada")])
+            # Misma fecha (server_default, resolución de segundos) para todas
+            db.add_all([DegustacionDB(usuario_id=1, cerveza_id=1) for _ in range(total)])
+            db.commit()
+
+            vistas, cursor, planes = [], "", []
+            while cursor is not None:
+                with ContadorConsultas(engine) as contador:
+                    pagina = degustacion_servicio.obtener_degustaciones_por_usuario(db, 1, limit=limit, cursor=cursor)
+                if cursor:
+                    planes += contador.planes()
+                vistas += [d.id for d in pagina]
+                cursor = degustacion_servicio.codificar_cursor(pagina[-1]) if len(pagina) == limit else None
+            db.close()
+
+            esperadas = list(range(total, 0, -1))
+            if vistas != esperadas:
+                self.print_error(f"Páginas por cursor: {vistas}, esperadas {esperadas}")
+                return False
+            sin_busqueda = [plan for plan in planes if "ix_degustaciones_usuario_fecha_id" in plan
+                            and "fecha_creacion<" not in plan]
+            if sin_busqueda or not planes:
+                self.print_error(f"La página por cursor no busca desde el cursor: {sin_busqueda or planes}")
+                return False
+            self.print_success(f"{total} degustaciones en páginas de {limit}, cada una buscando en el índice")
+            return True
+                
+        except Exception as e:
+            self.print_error(f"Error probando la paginación por cursor: {e}")
+            return False
+
+    def test_cursor_invalido(self):
+        """Prueba que un cursor mal formado devuelve 400"""
+        self.print_test_header("CURSOR DE PAGINACIÓN INVÁLIDO")
+        
+        try:
+            resp = requests.get(f"{BASE_URL}/degustaciones/", params={'cursor': 'no-es-un-cursor'})
+            if resp.status_code == 400:
+                self.print_success("Cursor inválido rechazado correctamente")
+                return True
+            self.print_error(f"Se esperaba 400, se obtuvo {resp.status_code}")
+            return False
+                
+        except Exception as e:
+            self.print_error(f"Error probando cursor inválido: {e}")
+            return False
+
+    def test_consultas_constantes_listado(self, tamanos_pagina=(10, 100, 500)):
+        """
+        Prueba que serializar una página de degustaciones cuesta un número
+        fijo de sentencias SQL, sea cual sea su tamaño (sin N+1 al leer el
+        usuario y la cerveza de cada fila). Se ejecuta dentro del proceso
+        sobre una base de datos en memoria.
+        """
+        self.print_test_header(f"CONSULTAS CONSTANTES EN LISTADOS ({', '.join(map(str, tamanos_pagina))})")
+        
+        try:
+            import inspect
+            from flask import g
+            from bd_memoria import app, crear_sesion_memoria, ContadorConsultas
+            from app.objetos.cerveza import Cerveza
+            from app.objetos.degustacion import DegustacionDB
+            from app.objetos.usuario import UsuarioDB
+            from app.controladores.degustacion_controlador import (
+                obtener_degustaciones, obtener_degustaciones_mas_valoradas)
+
+            maximo = max(tamanos_pagina)
+            engine, db = crear_sesion_memoria()
+            db.add_all([UsuarioDB(id=i, username=f"lector{i}", email=f"lector{i}@test.com",
+                password_hash="x") for i in range(1, 51)])
+            db.add_all([Cerveza(id=i, nombre=f"Cerveza {i}") for i in range(1, 51)])
+            db.add_all([DegustacionDB(usuario_id=i % 50 + 1, cerveza_id=(i * 7) % 50 + 1,
+                puntuacion=i % 5) for i in range(maximo)])
+            db.commit()
+
+            rutas = {
+                "/api/degustaciones/": obtener_degustaciones,
+                "/api/degustaciones/?cursor=": obtener_degustaciones,
+                "/api/degustaciones/mas-valoradas/": obtener_degustaciones_mas_valoradas,
+            }
+            correcto = True
+            for ruta, vista in rutas.items():
+                consultas = {}
+                for tamano in tamanos_pagina:
+                    separador = "&" if "?" in ruta else "?"
+                    db.expunge_all()
+                    with app.test_request_context(f"{ruta}{separador}limit={tamano}"):
+                        g.db = db
+                        with ContadorConsultas(engine) as contador:
+                            # La vista sin el decorador de ETag
+                            resp, status = inspect.unwrap(vista)()
+                    if status != 200:
+                        self.print_error(f"{ruta} devolvió {status}: {resp.get_json()}")
+                        correcto = False
+                    consultas[tamano] = contador.total
+                if len(set(consultas.values())) == 1:
+                    self.print_success(f"{ruta}: {consultas[maximo]} consultas para cualquier tamaño de página")
+                else:
+                    self.print_error(f"{ruta}: consultas por tamaño de página {consultas}")
+                    correcto = False
+            db.close()
+            return correcto
+                
+        except Exception as e:
+            self.print_error(f"Error contando consultas del listado: {e}")
+            return False
+
+    def test_peticiones_condicionales(self, degustacion_id):
+        """
+        Prueba el ETag del detalle de una degustación: 304 sin cuerpo con
+        If-None-Match, y 200 con un ETag nuevo tras editarla o tras renombrar
+        a su usuario. Sin Last-Modified, un If-Modified-Since no da 304.
+        """
+        self.print_test_header(f"PETICIONES CONDICIONALES: DEGUSTACIÓN {degustacion_id}")
+        
+        try:
+            url = f"{BASE_URL}/degustaciones/{degustacion_id}/"
+            resp = requests.get(url)
+            etag = resp.headers.get("ETag")
+            if resp.status_code != 200 or not etag or "Last-Modified" in resp.headers:
+                self.print_error(f"Validadores: {resp.status_code} ETag={etag} "
+                                 f"Last-Modified={resp.headers.get('Last-Modified')} (esperado solo ETag)")
+                return False
+
+            con_etag = requests.get(url, headers={"If-None-Match": etag})
+            if (con_etag.status_code, con_etag.content) != (304, b""):
+                self.print_error(f"Esperado 304 sin cuerpo; recibido {con_etag.status_code}")
+                return False
+
+            requests.put(url, json={"comentario": f"Revalidación {random.randint(1, 99999)}"})
+            tras_editar = requests.get(url, headers={"If-None-Match": etag})
+            if tras_editar.status_code != 200 or tras_editar.headers.get("ETag") == etag:
+                self.print_error(f"Tras editar: {tras_editar.status_code} con ETag {tras_editar.headers.get('ETag')}")
+                return False
+
+            # Renombrar al usuario no toca la degustación, pero cambia 'nombre_usuario'
+            etag = tras_editar.headers.get("ETag")
+            usuario_id = tras_editar.json()["usuario_id"]
+            nombre = tras_editar.json()["nombre_usuario"]
+            url_usuario = f"{BASE_URL}/usuarios/{usuario_id}/"
+            requests.put(url_usuario, json={"username": f"{nombre}_renombrado"})
+            try:
+                tras_renombrar = requests.get(url, headers={"If-None-Match": etag})
+                con_fecha = requests.get(url, headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"})
+            finally:
+                requests.put(url_usuario, json={"username": nombre})
+            if (tras_renombrar.status_code, con_fecha.status_code) != (200, 200) \
+                    or tras_renombrar.json().get("nombre_usuario") != f"{nombre}_renombrado":
+                self.print_error(f"Tras renombrar al usuario: {tras_renombrar.status_code} "
+                                 f"{tras_renombrar.text[:80]}; con If-Modified-Since {con_fecha.status_code}")
+                return False
+
+            self.print_success("304 con If-None-Match y ETag nuevo tras editar o renombrar al usuario")
+            return True
+                
+        except Exception as e:
+            self.print_error(f"Error probando peticiones condicionales: {e}")
+            return False
+
     def test_actualizar_degustacion(self, degustacion_id, nuevos_datos, expected_success=True):
         """Prueba actualizar degustación"""
         self.print_test_header(f"ACTUALIZAR DEGUSTACIÓN: {degustacion_id}")
@@ -558,6 +767,151 @@ class DegustacionTester:
             return False
     
 
+    def cabeceras_admin(self, admin=True):
+        """
+        Authorization con un token firmado aquí para un administrador (o para
+        otro usuario), si el tester comparte SECRET_KEY y ADMIN_USUARIOS con
+        el servidor. None si no.
+        """
+        if not os.getenv("SECRET_KEY") or not os.getenv("ADMIN_USUARIOS"):
+            return None
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        from app.servicios import tokens
+        usuario_id = min(tokens.ADMINISTRADORES) if admin else max(tokens.ADMINISTRADORES) + 1
+        return {"Authorization": f"Bearer {tokens.emitir(usuario_id, 'admin')['access_token']}"}
+
+    def test_estado_trabajos(self, espera_maxima=5):
+        """
+        Prueba /admin/jobs/: sin token da 401 y con el de otro usuario 403;
+        los efectos de las degustaciones creadas (feed, galardones) se
+        ejecutan en segundo plano y la cola se vacía
+        """
+        self.print_test_header("COLA DE TRABAJOS EN SEGUNDO PLANO")
+        
+        try:
+            sin_token = requests.get(f"{BASE_URL}/admin/jobs/")
+            reintentar = requests.post(f"{BASE_URL}/admin/jobs/1/reintentar/")
+            if (sin_token.status_code, reintentar.status_code) != (401, 401):
+                self.print_error(f"Sin token se esperaba 401: {sin_token.status_code} y {reintentar.status_code}")
+                return False
+
+            cabeceras = self.cabeceras_admin()
+            if cabeceras is None:
+                self.print_info("Sin SECRET_KEY y ADMIN_USUARIOS compartidos con el servidor: "
+                                "solo se comprueba el 401")
+                return True
+            otro = requests.get(f"{BASE_URL}/admin/jobs/", headers=self.cabeceras_admin(admin=False))
+            if otro.status_code != 403:
+                self.print_error(f"Con el token de otro usuario se esperaba 403: {otro.status_code}")
+                return False
+
+            resp = requests.get(f"{BASE_URL}/admin/jobs/", params={"estado": "otro"}, headers=cabeceras)
+            if resp.status_code != 400:
+                self.print_error(f"Un estado no válido debería dar 400: {resp.status_code}")
+                return False
+            
+            limite = time.time() + espera_maxima
+            while True:
+                resp = requests.get(f"{BASE_URL}/admin/jobs/", params={"limit": 5}, headers=cabeceras)
+                if resp.status_code != 200:
+                    self.print_error(f"Error obteniendo el estado de los trabajos: {resp.status_code}")
+                    return False
+                estado = resp.json()
+                pendientes = estado["estados"]["pendiente"] + estado["estados"]["en_curso"]
+                if pendientes == 0 or time.time() > limite:
+                    break
+                time.sleep(0.2)
+            
+            if pendientes:
+                self.print_error(f"Quedan {pendientes} trabajos sin ejecutar tras {espera_maxima} s")
+                return False
+            if not estado["hilo_activo"] or estado["estados"]["hecho"] == 0:
+                self.print_error(f"El hilo de trabajos no está ejecutando nada: {estado}")
+                return False
+            self.print_success(f"Cola vacía, hilo activo. Estados: {estado['estados']}")
+            return True
+            
+        except Exception as e:
+            self.print_error(f"Excepción consultando los trabajos: {e}")
+            return False
+
+    def test_cola_trabajos(self):
+        """
+        Prueba (sin servidor) la cola: encolar va con la transacción, los
+        fallos se reintentan deshaciendo lo hecho y al agotar los intentos
+        el trabajo pasa a fallido
+        """
+        self.print_test_header("REINTENTOS Y COLA DE MUERTOS")
+        
+        try:
+            from datetime import timedelta
+            from bd_memoria import crear_sesion_memoria
+            from app.objetos.cerveza import Cerveza
+            from app.objetos.trabajo import TrabajoDB
+            from app.servicios import trabajos
+
+            intentos = {"falla_una_vez": 0}
+
+            @trabajos.tarea("prueba_cerveza")
+            def crear_cerveza(db, nombre, fallar=False):
+                db.add(Cerveza(nombre=nombre))
+                db.flush()
+                if fallar is True or (fallar == "una_vez" and intentos["falla_una_vez"] == 0):
+                    intentos["falla_una_vez"] += 1
+                    raise RuntimeError("fallo provocado")
+
+            engine, db = crear_sesion_memoria()
+            reintento = trabajos.REINTENTO_SEGUNDOS
+            trabajos.REINTENTO_SEGUNDOS = 0
+            try:
+                trabajos.encolar(db, "prueba_cerveza", nombre="deshecha")
+                db.rollback()
+                trabajos.encolar(db, "prueba_cerveza", nombre="bien")
+                trabajos.encolar(db, "prueba_cerveza", nombre="segunda", fallar="una_vez")
+                trabajos.encolar(db, "prueba_cerveza", nombre="nunca", fallar=True)
+                db.commit()
+                ejecutados = trabajos.ejecutar_pendientes(db)
+            finally:
+                trabajos.REINTENTO_SEGUNDOS = reintento
+
+            estados = {t.datos["nombre"]: (t.estado, t.intentos) for t in db.query(TrabajoDB)}
+            cervezas = {c.nombre for c in db.query(Cerveza)}
+            muerto = db.query(TrabajoDB).filter(TrabajoDB.estado == "fallido").one()
+            comprobaciones = {
+                "un encolado deshecho no existe": "deshecha" not in estados,
+                "el trabajo correcto se hace una vez": estados.get("bien") == ("hecho", 1),
+                "el fallo puntual se reintenta": estados.get("segunda") == ("hecho", 2),
+                "al agotar los intentos pasa a fallido": estados.get("nunca") == ("fallido", trabajos.MAX_INTENTOS),
+                "guarda el error": "fallo provocado" in (muerto.ultimo_error or ""),
+                "los intentos fallidos no dejan nada": cervezas == {"bien", "segunda"},
+                "se ejecutan todos los intentos": ejecutados == 3 + trabajos.MAX_INTENTOS,
+            }
+
+            # Reintentar a mano un fallido y reclamar uno "en_curso" con el plazo vencido
+            trabajos.reintentar(db, muerto.id)
+            db.commit()
+            comprobaciones["reintentar lo devuelve a la cola"] = db.get(TrabajoDB, muerto.id).estado == "pendiente"
+            muerto.datos = {"nombre": "rescatada"}
+            muerto.estado = "en_curso"
+            muerto.ejecutar_en = trabajos._ahora_utc() - timedelta(seconds=1)
+            db.commit()
+            trabajos.ejecutar_pendientes(db)
+            comprobaciones["un en_curso con el plazo vencido se reclama"] = \
+                db.get(TrabajoDB, muerto.id).estado == "hecho" and db.query(Cerveza).filter_by(nombre="rescatada").count() == 1
+            db.close()
+
+            errores = [nombre for nombre, correcto in comprobaciones.items() if not correcto]
+            if errores:
+                for error in errores:
+                    self.print_error(f"Cola de trabajos: {error} ({estados})")
+                return False
+            self.print_success("Trabajos transaccionales, con reintentos y cola de muertos")
+            return True
+            
+        except Exception as e:
+            self.print_error(f"Error probando la cola de trabajos: {e}")
+            return False
+
     def run_comprehensive_test(self):
         """Ejecuta una prueba completa de todos los endpoints de degustaciones"""
         self.print_test_header("INICIANDO PRUEBA COMPREHENSIVA DE DEGUSTACIONES")
@@ -623,6 +977,16 @@ class DegustacionTester:
         
         self.test_obtener_degustaciones_por_cerveza(cerveza2_id, expected_min_count=1)
         self.wait_for_operation()
+
+        self.test_paginacion_cursor(usuario1_id, expected_total=3)
+        self.wait_for_operation()
+        
+        self.test_cursor_invalido()
+        self.test_cursor_busca_en_indice()
+        self.wait_for_operation()
+        
+        self.test_consultas_constantes_listado()
+        self.wait_for_operation()
         
         # Paso 5: Probar degustaciones más valoradas
         self.print_info("Paso 5: Probando degustaciones más valoradas...")
@@ -654,6 +1018,9 @@ class DegustacionTester:
         # Paso 7: Probar actualización de degustaciones
         self.print_info("Paso 7: Probando actualización de degustaciones...")
         
+        self.test_peticiones_condicionales(degustacion2_id)
+        self.wait_for_operation()
+        
         self.test_actualizar_degustacion(
             degustacion2_id,
             {
@@ -682,6 +1049,11 @@ class DegustacionTester:
             self.test_eliminar_degustacion(degustacion_a_eliminar)
             self.wait_for_operation()
         
+        # Paso 10: Probar la cola de trabajos
+        self.print_info("Paso 10: Probando la cola de trabajos en segundo plano...")
+        self.test_estado_trabajos()
+        self.test_cola_trabajos()
+        
         # Resultados finales
         self.print_test_summary()
 
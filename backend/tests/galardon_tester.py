@@ -471,6 +471,346 @@ class GalardonTester:
             self.print_error(f"Error creando galardón duplicado: {e}")
             return False
 
+    def test_motor_reglas(self):
+        """
+        Prueba (sin servidor) que las degustaciones y comentarios otorgan los
+        galardones según sus condiciones, con contadores incrementales
+        """
+        self.print_test_header("MOTOR DE REGLAS DE GALARDONES")
+        
+        try:
+            from sqlalchemy import insert
+            from bd_memoria import ContadorConsultas, crear_sesion_memoria
+            from app.objetos.cerveza import Cerveza
+            from app.objetos.degustacion import DegustacionDB
+            from app.objetos.galardon import UsuarioContador
+            from app.objetos.usuario import UsuarioDB
+            from app.servicios import degustacion_servicio, galardon_servicio, trabajos
+
+            engine, db = crear_sesion_memoria()
+            errores = []
+            try:
+                galardon_servicio.crear_galardon(db, {"nombre": "Malo", "descripcion": "x", "tipo": "x",
+                    "condiciones": {"cervezas_maximas": 3}})
+                errores.append("se aceptó una condición desconocida")
+            except ValueError:
+                db.rollback()
+
+            galardones = {nombre: galardon_servicio.crear_galardon(db, {"nombre": nombre, "descripcion": nombre,
+                "tipo": "prueba", "condiciones": condiciones}).id for nombre, condiciones in [
+                    ("Catador Inicial", {"cervezas_minimas": 3}),
+                    ("Viajero Cervecero", {"paises_minimos": 2}),
+                    ("Maestro de IPA", {"ipas_minimas": 2}),
+                    ("Tertuliano", {"comentarios_minimos": 2}),
+                    ("Explorador", {"paises_minimos": 2, "estilos_minimos": 3}),
+                ]}
+            cervezas = []
+            for nombre, pais, estilo in [("IPA 1", "España", "IPA"), ("IPA 2", "Bélgica", "Double IPA"),
+                    ("Lager 1", "España", "Lager"), ("Stout 1", "Irlanda", "Stout")]:
+                cerveza = Cerveza(nombre=nombre, pais_procedencia=pais, estilo=estilo)
+                db.add(cerveza)
+                db.flush()
+                cervezas.append(cerveza.id)
+            db.add(UsuarioDB(username="motor", email="motor@test.com", password_hash="x"))
+            db.commit()
+            usuario = db.query(UsuarioDB.id).filter(UsuarioDB.username == "motor").scalar()
+
+            def galardones_de(usuario_id):
+                # La evaluación de galardones es un trabajo en segundo plano
+                trabajos.ejecutar_pendientes(db)
+                db.expire_all()
+                return {ug.galardon_id: (ug.nivel_actual, ug.progreso_actual)
+                        for ug in galardon_servicio.obtener_galardones_de_usuario(db, usuario_id)}
+
+            def degustar(usuario_id, cerveza_id):
+                return degustacion_servicio.crear_degustacion(db, {"usuario_id": usuario_id, "cerveza_id": cerveza_id})
+
+            # Dos IPAs de dos países: Maestro de IPA y Viajero, todavía no Catador
+            degustar(usuario, cervezas[0])
+            degustar(usuario, cervezas[1])
+            obtenidos = galardones_de(usuario)
+            if obtenidos.get(galardones["Maestro de IPA"]) != (1, 2) or galardones["Viajero Cervecero"] not in obtenidos:
+                errores.append(f"tras dos IPAs: {obtenidos}")
+            if galardones["Catador Inicial"] in obtenidos:
+                errores.append("Catador Inicial otorgado con 2 cervezas")
+
+            # Repetir cerveza no suma cervezas distintas
+            degustar(usuario, cervezas[0])
+            if galardones["Catador Inicial"] in galardones_de(usuario):
+                errores.append("una cerveza repetida contó como distinta")
+            degustar(usuario, cervezas[2])
+            obtenidos = galardones_de(usuario)
+            if obtenidos.get(galardones["Catador Inicial"]) != (1, 3):
+                errores.append(f"Catador Inicial con 3 cervezas: {obtenidos.get(galardones['Catador Inicial'])}")
+            if galardones["Explorador"] not in obtenidos:
+                errores.append("Explorador (2 países y 3 estilos) no otorgado")
+
+            # Comentarios
+            degustacion_id = degustar(usuario, cervezas[3]).id
+            for texto in ("uno", "dos"):
+                degustacion_servicio.agregar_comentario_degustacion(db, {"degustacion_id": degustacion_id,
+                    "usuario_id": usuario, "comentario": texto})
+            if galardones_de(usuario).get(galardones["Tertuliano"]) != (1, 2):
+                errores.append("Tertuliano no otorgado con 2 comentarios")
+
+            # Borrar una degustación baja el progreso pero no quita el galardón
+            degustacion_servicio.eliminar_degustacion(db, degustacion_id)
+            obtenidos = galardones_de(usuario)
+            if obtenidos.get(galardones["Catador Inicial"]) != (1, 3) or obtenidos.get(galardones["Tertuliano"]) != (1, 0):
+                errores.append(f"tras borrar una degustación: {obtenidos}")
+
+            # Coste constante: la décima degustación hace las mismas consultas que la quinta
+            consultas = []
+            for i in range(10):
+                with ContadorConsultas(engine) as contador:
+                    degustar(usuario, cervezas[i % 2])
+                consultas.append(contador.total)
+            if consultas[-1] != consultas[4]:
+                errores.append(f"las consultas por degustación crecen con el historial: {consultas}")
+
+            # Cambiar país o estilo de una cerveza probada recuenta los distintos
+            from app.servicios.cerveza_servicio import CervezaService
+            contadores_de = lambda usuario_id: {c.contador: c.valor for c in
+                db.query(UsuarioContador).filter(UsuarioContador.usuario_id == usuario_id)}
+            antes = contadores_de(usuario)
+            CervezaService.actualizar_cerveza(db, cervezas[2], {"pais_procedencia": "Alemania"})
+            CervezaService.actualizar_cerveza(db, cervezas[1], {"estilo": "Stout"})
+            galardones_de(usuario)
+            despues = contadores_de(usuario)
+            if (despues["paises"], despues["ipas"], despues["estilos"]) != \
+                    (antes["paises"] + 1, antes["ipas"] - 1, antes["estilos"]):
+                errores.append(f"contadores tras editar cervezas: {antes} -> {despues}")
+            # Y después borrar degustaciones no descuadra nada
+            for degustacion in db.query(DegustacionDB).filter(DegustacionDB.usuario_id == usuario,
+                    DegustacionDB.cerveza_id == cervezas[2]).all():
+                degustacion_servicio.eliminar_degustacion(db, degustacion.id)
+            galardones_de(usuario)
+            if contadores_de(usuario)["paises"] != antes["paises"]:
+                errores.append(f"países tras borrar la cerveza editada: {contadores_de(usuario)}")
+            CervezaService.actualizar_cerveza(db, cervezas[2], {"pais_procedencia": "España"})
+            CervezaService.actualizar_cerveza(db, cervezas[1], {"estilo": "Double IPA"})
+
+            # Usuario con historial anterior a los contadores: se siembra al tocarlo
+            antiguo = db.execute(insert(UsuarioDB).values(username="antiguo", email="antiguo@test.com",
+                password_hash="x")).inserted_primary_key[0]
+            db.execute(insert(DegustacionDB), [{"usuario_id": antiguo, "cerveza_id": cerveza_id}
+                for cerveza_id in cervezas[:3]])
+            db.commit()
+            degustar(antiguo, cervezas[3])
+            obtenidos = galardones_de(antiguo)
+            if obtenidos.get(galardones["Catador Inicial"]) != (1, 4) or obtenidos.get(galardones["Maestro de IPA"]) != (1, 2):
+                errores.append(f"usuario sembrado desde su historial: {obtenidos}")
+
+            # Cambiar las condiciones recompila las reglas
+            galardon_servicio.actualizar_galardon(db, galardones["Tertuliano"], {"condiciones": {"comentarios_minimos": 1}})
+            degustacion_servicio.agregar_comentario_degustacion(db, {"degustacion_id": degustar(antiguo, cervezas[0]).id,
+                "usuario_id": antiguo, "comentario": "hola"})
+            if galardones_de(antiguo).get(galardones["Tertuliano"]) != (1, 1):
+                errores.append("las condiciones editadas no se aplicaron")
+
+            from app.servicios.usuario_servicio import UsuarioServicio
+            UsuarioServicio.delete_usuario(db, antiguo)
+            if db.query(UsuarioContador).filter(UsuarioContador.usuario_id == antiguo).count():
+                errores.append("los contadores no se borran con el usuario")
+            db.close()
+
+            if errores:
+                for error in errores:
+                    self.print_error(f"Motor de reglas: {error}")
+                return False
+            self.print_success(f"Galardones otorgados por reglas ({consultas[-1]} consultas por degustación, constantes)")
+            return True
+                
+        except Exception as e:
+            self.print_error(f"Error probando el motor de reglas: {e}")
+            return False
+
+    def test_contadores_concurrentes(self):
+        """
+        Prueba (sin servidor) que dos degustaciones simultáneas del mismo
+        usuario no fallan al insertar la misma fila de contadores: la que
+        llega tarde suma a la fila de la otra y los contadores coinciden con
+        recalcularlos desde el historial. SQLite no admite dos escrituras a
+        la vez, así que la otra transacción se intercala en la misma conexión
+        justo antes del INSERT (o, en la siembra, el INSERT falla como en
+        MySQL/PostgreSQL cuando el DELETE previo no veía sus filas).
+        """
+        self.print_test_header("CONTADORES CON DEGUSTACIONES SIMULTÁNEAS")
+        
+        try:
+            from sqlalchemy import event, insert, select
+            from sqlalchemy.exc import IntegrityError
+            from bd_memoria import crear_sesion_memoria
+            from app.objetos.cerveza import Cerveza
+            from app.objetos.degustacion import DegustacionDB
+            from app.objetos.galardon import UsuarioContador, UsuarioDistinto
+            from app.objetos.trabajo import TrabajoDB
+            from app.objetos.usuario import UsuarioDB
+            from app.servicios import degustacion_servicio, reglas_galardones
+
+            engine, db = crear_sesion_memoria()
+            cervezas = []
+            for nombre, pais in [("Lager", "España"), ("Stout", "Irlanda")]:
+                cerveza = Cerveza(nombre=nombre, pais_procedencia=pais, estilo=nombre)
+                db.add(cerveza)
+                db.flush()
+                cervezas.append(cerveza.id)
+            for username in ("rapido", "antiguo"):
+                db.add(UsuarioDB(username=username, email=f"{username}@test.com", password_hash="x"))
+            db.commit()
+            rapido, antiguo = [db.query(UsuarioDB.id).filter(UsuarioDB.username == u).scalar()
+                               for u in ("rapido", "antiguo")]
+
+            def estado(usuario_id):
+                return (sorted(db.execute(select(UsuarioContador.contador, UsuarioContador.valor)
+                            .where(UsuarioContador.usuario_id == usuario_id)).all()),
+                        sorted(db.execute(select(UsuarioDistinto.dimension, UsuarioDistinto.clave, UsuarioDistinto.veces)
+                            .where(UsuarioDistinto.usuario_id == usuario_id)).all()))
+
+            def coincide_con_historial(usuario_id):
+                incremental = estado(usuario_id)
+                reglas_galardones.sembrar(db, lambda columna: columna == usuario_id)
+                return incremental == estado(usuario_id)
+
+            errores = []
+            # Valor distinto nuevo: la otra degustación (la Stout) lo anota entre nuestro UPDATE y nuestro INSERT
+            degustacion_servicio.crear_degustacion(db, {"usuario_id": rapido, "cerveza_id": cervezas[0]})
+            otra = [True]
+            def otra_degustacion(conn, cursor, statement, parameters, context, executemany):
+                if otra and statement.startswith("UPDATE usuario_distintos") and cursor.rowcount == 0:
+                    otra.pop()
+                    conn.execute(insert(DegustacionDB.__table__).values(usuario_id=rapido, cerveza_id=cervezas[1]))
+                    reglas_galardones._cambiar_degustacion(conn, rapido, cervezas[1], 1)
+            event.listen(engine, "after_cursor_execute", otra_degustacion)
+            try:
+                degustacion_servicio.crear_degustacion(db, {"usuario_id": rapido, "cerveza_id": cervezas[1]})
+            except IntegrityError as e:
+                db.rollback()
+                errores.append(f"valor distinto nuevo: la degustación falló ({e.orig})")
+            finally:
+                event.remove(engine, "after_cursor_execute", otra_degustacion)
+            if otra:
+                errores.append("no se intercaló la otra degustación")
+            elif not errores and not coincide_con_historial(rapido):
+                errores.append(f"valor distinto nuevo: contadores {estado(rapido)} distintos del historial")
+
+            # Siembra: 'antiguo' tiene historial y otra transacción lo siembra a la vez
+            db.execute(insert(DegustacionDB.__table__).values(usuario_id=antiguo, cerveza_id=cervezas[0]))
+            db.commit()
+            reglas_galardones.sembrar(db, lambda columna: columna == antiguo)
+            db.commit()
+            # Esta transacción no veía sus contadores (el primer UPDATE no encuentra
+            # nada) y su INSERT choca con los de la otra
+            sembrar, sumar = reglas_galardones.sembrar, reglas_galardones._sumar
+            sin_contadores = [True]
+            def sumar_sin_verlos(ejecutor, usuario_id, deltas):
+                return False if sin_contadores and sin_contadores.pop() else sumar(ejecutor, usuario_id, deltas)
+            def sembrar_en_conflicto(ejecutor, filtro_usuarios):
+                raise IntegrityError("INSERT INTO usuario_distintos", {}, Exception("UNIQUE constraint failed"))
+            reglas_galardones.sembrar, reglas_galardones._sumar = sembrar_en_conflicto, sumar_sin_verlos
+            try:
+                degustacion_servicio.crear_degustacion(db, {"usuario_id": antiguo, "cerveza_id": cervezas[1]})
+            except IntegrityError as e:
+                db.rollback()
+                errores.append(f"siembra simultánea: la degustación falló ({e.orig})")
+            finally:
+                reglas_galardones.sembrar, reglas_galardones._sumar = sembrar, sumar
+            if not errores:
+                if not coincide_con_historial(antiguo):
+                    errores.append(f"siembra simultánea: contadores {estado(antiguo)} distintos del historial")
+                evaluaciones = [t.datos for t in db.query(TrabajoDB).filter(TrabajoDB.tipo == "evaluar_galardones")]
+                if not any(datos["usuario_id"] == antiguo for datos in evaluaciones):
+                    errores.append("siembra simultánea: no se encoló la evaluación de sus galardones")
+            db.close()
+
+            if errores:
+                for error in errores:
+                    self.print_error(f"Contadores simultáneos: {error}")
+                return False
+            self.print_success("Las degustaciones simultáneas suman a la fila de la otra en vez de fallar")
+            return True
+                
+        except Exception as e:
+            self.print_error(f"Error probando los contadores simultáneos: {e}")
+            return False
+
+    def test_recalculo_galardones(self):
+        """
+        Prueba (sin servidor) que editar las condiciones de un galardón lo
+        recalcula para todos los usuarios, por lotes, incluso para quienes
+        tienen degustaciones pero todavía no tienen contadores
+        """
+        self.print_test_header("RECÁLCULO DE GALARDONES EN BLOQUE")
+        
+        try:
+            from sqlalchemy import insert
+            from bd_memoria import crear_sesion_memoria
+            from app.objetos.cerveza import Cerveza
+            from app.objetos.degustacion import DegustacionDB
+            from app.objetos.galardon import UsuarioContador, UsuarioGalardon
+            from app.objetos.trabajo import TrabajoDB
+            from app.objetos.usuario import UsuarioDB
+            from app.servicios import galardon_servicio, reglas_galardones, trabajos
+
+            engine, db = crear_sesion_memoria()
+            errores = []
+            # Historial cargado a mano (sin pasar por los servicios, como una importación)
+            db.execute(insert(Cerveza), [{"nombre": f"Cerveza {i}", "pais_procedencia": f"País {i % 3}",
+                "estilo": f"Estilo {i % 4}"} for i in range(6)])
+            db.execute(insert(UsuarioDB), [{"username": f"recalculo{i}", "email": f"recalculo{i}@test.com",
+                "password_hash": "x"} for i in range(7)])
+            usuarios = [u.id for u in db.query(UsuarioDB.id).order_by(UsuarioDB.id)]
+            cervezas = [c.id for c in db.query(Cerveza.id).order_by(Cerveza.id)]
+            # El usuario i ha probado las i primeras cervezas
+            db.execute(insert(DegustacionDB), [{"usuario_id": usuario_id, "cerveza_id": cerveza_id}
+                for i, usuario_id in enumerate(usuarios) for cerveza_id in cervezas[:i]])
+            db.commit()
+
+            galardon_id = galardon_servicio.crear_galardon(db, {"nombre": "Recalculado", "descripcion": "x",
+                "tipo": "prueba", "condiciones": {"paises_minimos": 3}}).id
+            lote_original = reglas_galardones.USUARIOS_POR_LOTE
+            reglas_galardones.USUARIOS_POR_LOTE = 3
+            try:
+                trabajos.ejecutar_pendientes(db)
+                # Editar las condiciones: 2 cervezas distintas por nivel
+                galardon_servicio.actualizar_galardon(db, galardon_id, {"condiciones": {"cervezas_minimas": 2}})
+                ejecutados = trabajos.ejecutar_pendientes(db)
+            finally:
+                reglas_galardones.USUARIOS_POR_LOTE = lote_original
+
+            db.expire_all()
+            obtenidos = {ug.usuario_id: (ug.nivel_actual, ug.progreso_actual) for ug in
+                db.query(UsuarioGalardon).filter(UsuarioGalardon.galardon_id == galardon_id)}
+            # Los niveles no bajan: quien lo ganó con 3 países lo conserva
+            esperados = {usuarios[i]: (max(i // 2, 1 if i >= 3 else 0), i) for i in range(2, 7)}
+            if obtenidos != esperados:
+                errores.append(f"galardones recalculados {obtenidos}, esperados {esperados}")
+            if ejecutados < 3:
+                errores.append(f"el recálculo no se hizo por lotes ({ejecutados} trabajos)")
+            fallidos = db.query(TrabajoDB).filter(TrabajoDB.estado != "hecho").count()
+            if fallidos:
+                errores.append(f"{fallidos} trabajos sin terminar")
+            if db.query(UsuarioContador.usuario_id).distinct().count() != len(usuarios):
+                errores.append("no se sembraron los contadores de todos los usuarios")
+
+            # Un lote suelto, como el comando recalcular-galardones
+            lote = reglas_galardones.recalcular_lote(db, desde_usuario=usuarios[-2], usuarios_por_lote=5)
+            db.commit()
+            if lote["usuarios"] != 2 or lote["degustaciones"] != 11 or lote["siguiente"] is not None:
+                errores.append(f"lote final: {lote}")
+            db.close()
+
+            if errores:
+                for error in errores:
+                    self.print_error(f"Recálculo: {error}")
+                return False
+            self.print_success(f"Galardón recalculado para {len(usuarios)} usuarios en {ejecutados} trabajos")
+            return True
+                
+        except Exception as e:
+            self.print_error(f"Error probando el recálculo de galardones: {e}")
+            return False
+
     def test_servidor_conectado(self):
         """Prueba conexión al servidor"""
         self.print_test_header("CONEXIÓN AL SERVIDOR")
@@ -567,6 +907,15 @@ class GalardonTester:
             self.test_eliminar_galardon(galardon_a_eliminar)
             self.wait_for_operation()
         
+        # Paso 9: Probar el motor de reglas
+        self.print_info("Paso 9: Probando el motor de reglas de galardones...")
+        self.test_motor_reglas()
+        
+        # Paso 10: Probar el recálculo en bloque
+        self.print_info("Paso 10: Probando el recálculo de galardones en bloque...")
+        self.test_recalculo_galardones()
+        self.test_contadores_concurrentes()
+        
         # Resultados finales
         self.print_test_summary()
 
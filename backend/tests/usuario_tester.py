@@ -154,6 +154,35 @@ class UsuarioTester:
             self.print_error(f"Error obteniendo usuarios: {e}")
             return None
 
+    def test_listado_usuarios_campos(self, params, campos_esperados, expected_success=True):
+        """Prueba los niveles de detalle (?nivel=) y la selección de campos (?fields=) del listado"""
+        self.print_test_header(f"LISTADO DE USUARIOS CON {params or 'NIVEL POR DEFECTO'}")
+        
+        try:
+            resp = requests.get(f"{BASE_URL}/usuarios/", params=params)
+            
+            if not expected_success:
+                if resp.status_code == 400:
+                    self.print_success(f"Parámetros rechazados como se esperaba: {resp.json()['error']}")
+                    return None
+                self.print_error(f"Se esperaba 400, se obtuvo {resp.status_code}")
+                return None
+            
+            if resp.status_code != 200:
+                self.print_error(f"Error obteniendo usuarios. Código: {resp.status_code}")
+                return None
+            usuarios = resp.json()
+            incorrectos = [u['id'] for u in usuarios if set(u.keys()) != set(campos_esperados)]
+            if usuarios and not incorrectos:
+                self.print_success(f"{len(usuarios)} usuarios con los campos {sorted(campos_esperados)}")
+            else:
+                self.print_error(f"Usuarios con campos inesperados: {incorrectos[:5]}")
+            return usuarios
+                
+        except Exception as e:
+            self.print_error(f"Error obteniendo usuarios: {e}")
+            return None
+
     def test_actualizar_usuario(self, usuario_id, nuevos_datos, expected_success=True):
         """Prueba actualizar usuario"""
         self.print_test_header(f"ACTUALIZAR USUARIO: {usuario_id}")
@@ -314,9 +343,9 @@ class UsuarioTester:
             
             if expected_success and resp.status_code == 200:
                 data = resp.json()
-                if 'user' in data and data['user']['username'] == username:
+                if data.get('username') == username and 'access_token' in data:
                     self.print_success(f"Login exitoso para {username}")
-                    return data['user']
+                    return data
                 else:
                     self.print_error("Login devolvió 200 pero estructura de datos incorrecta")
                     return None
@@ -331,6 +360,440 @@ class UsuarioTester:
             self.print_error(f"Error en login: {e}")
             return None
 
+    def test_hash_contrasenas_acotado(self):
+        """
+        Prueba el pool de bcrypt (sin servidor): rehash al cambiar el coste
+        en un login correcto y 429 con Retry-After cuando la cola está llena.
+        """
+        self.print_test_header("POOL DE BCRYPT: REHASH Y CONTRAPRESIÓN")
+        
+        try:
+            import os
+            import tempfile
+            from bd_memoria import app, crear_sesion_memoria
+            from app import base_datos
+            from app.objetos.usuario import UsuarioDB
+            from app.servicios import hash_contrasenas
+            from app.servicios.usuario_servicio import UsuarioServicio
+
+            try:
+                # Coste mínimo para que la prueba sea rápida
+                hash_contrasenas.configurar(coste=4, hilos=1, cola_maxima=1)
+                engine, db = crear_sesion_memoria()
+                usuario = UsuarioDB(username="rehash", email="rehash@test.com",
+                    password_hash=UsuarioServicio.get_password_hash("Clave123!"))
+                db.add(usuario)
+                db.commit()
+
+                hash_contrasenas.configurar(coste=5, hilos=1, cola_maxima=1)
+                costes = {"inicial": hash_contrasenas.coste_de(usuario.password_hash)}
+                incorrecta = UsuarioServicio.autenticar(db, usuario, "otra")
+                costes["tras fallo"] = hash_contrasenas.coste_de(usuario.password_hash)
+                correcta = UsuarioServicio.autenticar(db, usuario, "Clave123!")
+                db.refresh(usuario)
+                costes["tras login"] = hash_contrasenas.coste_de(usuario.password_hash)
+                sigue_valiendo = UsuarioServicio.verify_password("Clave123!", usuario.password_hash)
+                db.close()
+
+                esperados = {"inicial": 4, "tras fallo": 4, "tras login": 5}
+                if incorrecta or not correcta or not sigue_valiendo or costes != esperados:
+                    self.print_error(f"Rehash inesperado: costes {costes}, esperados {esperados}")
+                    return False
+
+                with tempfile.TemporaryDirectory() as directorio:
+                    base_datos.configurar_engine(f"sqlite:///{os.path.join(directorio, 'hash.db')}", None)
+                    try:
+                        base_datos.importar_modelos()
+                        base_datos.Base.metadata.create_all(bind=base_datos.engine)
+                        cliente = app.test_client()
+                        cliente.post("/api/usuarios/", json={"username": "cola", "email": "cola@test.com",
+                            "password": "Clave123!", "birth_date": "1990-01-01"})
+                        login = {"username": "cola", "password": "Clave123!"}
+
+                        # Ocupamos la única plaza de la cola, como haría un login en curso
+                        hash_contrasenas._plazas.acquire()
+                        try:
+                            saturado = cliente.post("/api/usuarios/login/", json=login)
+                        finally:
+                            hash_contrasenas._plazas.release()
+                        libre = cliente.post("/api/usuarios/login/", json=login)
+                    finally:
+                        base_datos.engine.dispose()
+                        base_datos.configurar_engine(base_datos.DATABASE_URL, None)
+            finally:
+                hash_contrasenas.configurar()
+
+            if saturado.status_code != 429 or saturado.headers.get("Retry-After") != "1":
+                self.print_error(f"Con la cola llena se esperaba 429 con Retry-After; recibido {saturado.status_code}")
+                return False
+            if libre.status_code != 200:
+                self.print_error(f"Con la cola libre se esperaba 200; recibido {libre.status_code}")
+                return False
+            self.print_success("Rehash al cambiar el coste y 429 con la cola de bcrypt llena")
+            return True
+                
+        except Exception as e:
+            self.print_error(f"Error probando el pool de bcrypt: {e}")
+            return False
+
+    def test_tokens_acceso(self):
+        """
+        Prueba los tokens firmados (sin servidor): el login los emite, se
+        verifican sin consultar la BD, el refresco rota (una sola vez aunque
+        otro worker no lo sepa aún, y sin tokens nuevos si su commit falla)
+        y el logout revoca.
+        """
+        self.print_test_header("TOKENS DE ACCESO Y REFRESCO")
+        
+        try:
+            import os
+            import tempfile
+            from sqlalchemy import event
+            from sqlalchemy.exc import IntegrityError
+            from sqlalchemy.orm import Session
+            from bd_memoria import app
+            from app import base_datos
+            from app.servicios import hash_contrasenas, tokens
+
+            errores = []
+            try:
+                hash_contrasenas.configurar(coste=4)
+                tokens.configurar("clave-de-pruebas")
+                with tempfile.TemporaryDirectory() as directorio:
+                    base_datos.configurar_engine(f"sqlite:///{os.path.join(directorio, 'tokens.db')}", None)
+                    try:
+                        base_datos.importar_modelos()
+                        base_datos.Base.metadata.create_all(bind=base_datos.engine)
+                        cliente = app.test_client()
+                        cliente.post("/api/usuarios/", json={"username": "token", "email": "token@test.com",
+                            "password": "Clave123!", "birth_date": "1990-01-01"})
+                        login = cliente.post("/api/usuarios/login/",
+                            json={"username": "token", "password": "Clave123!"}).get_json()
+                        acceso, refresco = login.get("access_token"), login.get("refresh_token")
+                        if not acceso or not refresco or login.get("username") != "token" or "user" in login:
+                            self.print_error(f"El login no devuelve usuario y tokens: {sorted(login)}")
+                            return False
+
+                        # Verificar no consulta la base de datos (la lista de revocados ya está cargada)
+                        sentencias = []
+                        contar = lambda *args: sentencias.append(1)
+                        tokens.verificar(acceso)
+                        event.listen(base_datos.engine, "before_cursor_execute", contar)
+                        try:
+                            datos = tokens.verificar(acceso)
+                        finally:
+                            event.remove(base_datos.engine, "before_cursor_execute", contar)
+                        if sentencias or datos["usr"] != "token":
+                            errores.append(f"verificar() ejecutó {len(sentencias)} sentencias SQL")
+
+                        manipulado = acceso[:-2] + ("AA" if not acceso.endswith("AA") else "BB")
+                        cabecera = lambda token: {"Authorization": f"Bearer {token}"}
+                        casos = [
+                            ("logout sin token", cliente.post("/api/usuarios/logout/"), 401),
+                            ("logout con firma manipulada", cliente.post("/api/usuarios/logout/",
+                                headers=cabecera(manipulado)), 401),
+                            ("refresco como acceso", cliente.post("/api/usuarios/logout/",
+                                headers=cabecera(refresco)), 401),
+                            ("token no válido en ruta pública", cliente.get("/api/usuarios/",
+                                headers=cabecera(manipulado)), 200),
+                        ]
+                        # Otra transacción gana al confirmar: 401 sin tokens y el refresco no se gasta
+                        fallos = [IntegrityError("INSERT INTO tokens_revocados", {}, Exception("simulado"))]
+                        def fallar_commit(sesion):
+                            if fallos:
+                                raise fallos.pop()
+                        event.listen(Session, "before_commit", fallar_commit)
+                        try:
+                            perdido = cliente.post("/api/usuarios/token/refrescar/", json={"refresh_token": refresco})
+                        finally:
+                            event.remove(Session, "before_commit", fallar_commit)
+                        casos.append(("refrescar con el commit fallido", perdido, 401))
+                        if "access_token" in (perdido.get_json() or {}):
+                            errores.append("refrescar con el commit fallido devolvió tokens")
+                        nuevo = cliente.post("/api/usuarios/token/refrescar/", json={"refresh_token": refresco})
+                        casos.append(("refrescar", nuevo, 200))
+                        casos.append(("reutilizar el refresco", cliente.post("/api/usuarios/token/refrescar/",
+                            json={"refresh_token": refresco}), 401))
+                        # Otro worker cuya copia en memoria aún no tiene el refresco usado
+                        tokens._lista_revocados().jtis.pop(tokens._serializador("refresco").loads(refresco)["jti"])
+                        casos.append(("reutilizar el refresco en otro worker", cliente.post(
+                            "/api/usuarios/token/refrescar/", json={"refresh_token": refresco}), 401))
+                        casos.append(("logout", cliente.post("/api/usuarios/logout/", headers=cabecera(acceso),
+                            json={"refresh_token": nuevo.get_json().get("refresh_token")}), 200))
+                        casos.append(("acceso tras logout", cliente.post("/api/usuarios/logout/",
+                            headers=cabecera(acceso)), 401))
+                        casos.append(("refresco tras logout", cliente.post("/api/usuarios/token/refrescar/",
+                            json={"refresh_token": nuevo.get_json().get("refresh_token")}), 401))
+                        for nombre, respuesta, esperado in casos:
+                            if respuesta.status_code != esperado:
+                                errores.append(f"{nombre}: {respuesta.status_code} (esperado {esperado})")
+                    finally:
+                        base_datos.engine.dispose()
+                        base_datos.configurar_engine(base_datos.DATABASE_URL, None)
+            finally:
+                hash_contrasenas.configurar()
+                tokens.configurar()
+
+            if errores:
+                for error in errores:
+                    self.print_error(error)
+                return False
+            self.print_success("Tokens verificados sin BD, refresco rotado y logout revocando ambos")
+            return True
+                
+        except Exception as e:
+            self.print_error(f"Error probando los tokens: {e}")
+            return False
+
+    def test_ids_amigos_sin_cargar(self):
+        """
+        Prueba (sin servidor) que los ids de amigos del login y el perfil se
+        leen de user_friends en una consulta, sin cargar las filas de los amigos.
+        """
+        self.print_test_header("IDS DE AMIGOS SIN CARGAR LA RELACIÓN")
+        
+        try:
+            from sqlalchemy import event, insert
+            from bd_memoria import ContadorConsultas, crear_sesion_memoria
+            from app.objetos.usuario import UsuarioDB, user_friends
+            from app.servicios.usuario_servicio import UsuarioServicio
+
+            engine, db = crear_sesion_memoria()
+            num_amigos = 500
+            db.execute(insert(UsuarioDB), [{"username": f"amigo{i}", "email": f"amigo{i}@test.com",
+                "password_hash": "x"} for i in range(num_amigos + 1)])
+            usuario_id = db.query(UsuarioDB.id).filter(UsuarioDB.username == "amigo0").scalar()
+            esperados = sorted(u.id for u in db.query(UsuarioDB.id).filter(UsuarioDB.id != usuario_id))
+            db.execute(insert(user_friends), [{"user_id": usuario_id, "friend_id": i} for i in esperados])
+            db.commit()
+
+            cargados = []
+            contar_carga = lambda objetivo, contexto: cargados.append(objetivo)
+            event.listen(UsuarioDB, "load", contar_carga)
+            try:
+                with ContadorConsultas(engine) as contador:
+                    ids = UsuarioServicio.obtener_ids_amigos(db, usuario_id)
+            finally:
+                event.remove(UsuarioDB, "load", contar_carga)
+                db.close()
+
+            if ids != esperados:
+                self.print_error(f"Ids de amigos incorrectos: {len(ids)} de {len(esperados)}")
+                return False
+            if cargados or contador.total != 1:
+                self.print_error(f"Se cargaron {len(cargados)} usuarios con {contador.total} consultas")
+                return False
+            self.print_success(f"{num_amigos} ids de amigos en 1 consulta sin cargar ningún usuario")
+            return True
+                
+        except Exception as e:
+            self.print_error(f"Error probando los ids de amigos: {e}")
+            return False
+
+    def test_amistad_simetrica(self):
+        """
+        Prueba (sin servidor) que las amistades se crean y borran en los dos
+        sentidos y las consultas de conjunto: son amigos, comunes y total.
+        """
+        self.print_test_header("AMISTADES SIMÉTRICAS Y CONSULTAS DE CONJUNTO")
+        
+        try:
+            from sqlalchemy import insert
+            from bd_memoria import crear_sesion_memoria
+            from app.objetos.usuario import UsuarioDB, user_friends
+            from app.servicios.usuario_servicio import UsuarioServicio as S
+
+            engine, db = crear_sesion_memoria()
+            usuarios = [UsuarioDB(username=n, email=f"{n}@test.com", password_hash="x") for n in "abcd"]
+            db.add_all(usuarios)
+            db.commit()
+            a, b, c, d = (u.id for u in usuarios)
+
+            errores = []
+            for x, y in [(a, b), (a, c), (b, c), (d, a)]:
+                if not S.crear_amistad(db, x, y):
+                    errores.append(f"No se creó la amistad {x}-{y}")
+            comprobaciones = {
+                "crear dos veces es idempotente": S.crear_amistad(db, a, b),
+                "no puede ser amigo de sí mismo": not S.crear_amistad(db, a, a),
+                "amigos en los dos sentidos": S.son_amigos(db, a, d) and S.son_amigos(db, d, a),
+                "amigos en común de a y b": S.amigos_en_comun(db, a, b) == [c],
+                "total de amigos de a": S.contar_amigos(db, a) == 3,
+                "eliminar devuelve True": S.eliminar_amistad(db, b, a),
+                "eliminar borra los dos sentidos": not S.son_amigos(db, a, b) and not S.son_amigos(db, b, a),
+                "eliminar lo que no existe": not S.eliminar_amistad(db, a, b),
+            }
+            # Amistad antigua guardada en un solo sentido
+            db.execute(insert(user_friends), [{"user_id": c, "friend_id": d}])
+            db.commit()
+            comprobaciones["simetrizar añade la fila inversa"] = S.simetrizar_amistades(db) == 1 \
+                and S.son_amigos(db, d, c) and S.simetrizar_amistades(db) == 0
+            db.close()
+
+            errores += [nombre for nombre, correcto in comprobaciones.items() if not correcto]
+            if errores:
+                for error in errores:
+                    self.print_error(f"Amistad simétrica: {error}")
+                return False
+            self.print_success("Amistades simétricas y consultas de conjunto correctas")
+            return True
+                
+        except Exception as e:
+            self.print_error(f"Error probando las amistades simétricas: {e}")
+            return False
+
+    def test_feed_actividad(self):
+        """
+        Prueba (sin servidor) el feed materializado: se llena al crear
+        degustaciones, sigue a las amistades, se lee en una consulta y el
+        comando de reconstrucción deja lo mismo.
+        """
+        self.print_test_header("FEED DE ACTIVIDAD MATERIALIZADO")
+        
+        try:
+            from bd_memoria import ContadorConsultas, crear_sesion_memoria
+            from app.objetos.cerveza import Cerveza
+            from app.objetos.usuario import UsuarioDB
+            from app.servicios import actividad_servicio, degustacion_servicio, trabajos
+            from app.servicios.usuario_servicio import UsuarioServicio as S
+
+            engine, db = crear_sesion_memoria()
+            usuarios = [UsuarioDB(username=n, email=f"{n}@test.com", password_hash="x") for n in "abc"]
+            cerveza = Cerveza(nombre="Feed")
+            db.add_all(usuarios + [cerveza])
+            db.commit()
+            a, b, c = (u.id for u in usuarios)
+            S.crear_amistad(db, a, b)
+            S.crear_amistad(db, a, c)
+
+            crear = lambda autor: degustacion_servicio.crear_degustacion(db,
+                {"usuario_id": autor, "cerveza_id": cerveza.id, "puntuacion": 4}).id
+            de_b, de_c, de_a = crear(b), crear(c), crear(a)
+            # La difusión al feed es un trabajo en segundo plano
+            trabajos.ejecutar_pendientes(db)
+            feed = lambda usuario: [d.id for d in S.get_recent_friends_activity(db, usuario, limit=10)]
+
+            with ContadorConsultas(engine) as contador:
+                feed_a = feed(a)
+            comprobaciones = {
+                "feed de a (lo más nuevo primero)": feed_a == [de_c, de_b],
+                "feed leído en una consulta": contador.total == 1,
+                "feed de b solo con a": feed(b) == [de_a],
+            }
+            S.eliminar_amistad(db, a, c)
+            comprobaciones["al dejar de ser amigos desaparece"] = feed(a) == [de_b] and feed(c) == []
+            S.crear_amistad(db, c, a)
+            comprobaciones["al volver a serlo se rellena"] = feed(a) == [de_c, de_b] and feed(c) == [de_a]
+            degustacion_servicio.eliminar_degustacion(db, de_b)
+            comprobaciones["la degustación borrada sale del feed"] = feed(a) == [de_c]
+            antes = {u: feed(u) for u in (a, b, c)}
+            escritas = actividad_servicio.reconstruir(db)
+            comprobaciones["reconstruir deja el mismo feed"] = escritas == 3 \
+                and {u: feed(u) for u in (a, b, c)} == antes
+            db.close()
+
+            errores = [nombre for nombre, correcto in comprobaciones.items() if not correcto]
+            if errores:
+                for error in errores:
+                    self.print_error(f"Feed de actividad: {error}")
+                return False
+            self.print_success("Feed escrito al crear degustaciones, leído en 1 consulta y reconstruible")
+            return True
+                
+        except Exception as e:
+            self.print_error(f"Error probando el feed de actividad: {e}")
+            return False
+
+    def test_actividad_calculada(self):
+        """
+        Prueba (sin servidor) que el feed calculado con k-way merge y el
+        materializado devuelven lo mismo, con fechas repetidas, skip y cursor,
+        y que las páginas por cursor buscan en el índice desde el cursor.
+        """
+        self.print_test_header("FEED CALCULADO (K-WAY MERGE) FRENTE A MATERIALIZADO")
+        
+        try:
+            from datetime import datetime, timedelta
+            from sqlalchemy import insert
+            from bd_memoria import ContadorConsultas, crear_sesion_memoria
+            from app.objetos.cerveza import Cerveza
+            from app.objetos.degustacion import DegustacionDB
+            from app.objetos.usuario import UsuarioDB, user_friends
+            from app.servicios import actividad_servicio
+
+            random.seed(3)
+            engine, db = crear_sesion_memoria()
+            db.execute(insert(UsuarioDB), [{"username": f"k{i}", "email": f"k{i}@test.com",
+                "password_hash": "x"} for i in range(40)])
+            ids = [u.id for u in db.query(UsuarioDB.id)]
+            pares = {tuple(sorted(random.sample(ids, 2))) for _ in range(200)}
+            db.execute(insert(user_friends), [{"user_id": x, "friend_id": y}
+                for a, b in pares for x, y in ((a, b), (b, a))])
+            cerveza = Cerveza(nombre="K-way")
+            db.add(cerveza)
+            db.flush()
+            # Pocas fechas distintas: muchos empates que se deshacen por id
+            inicio = datetime(2024, 1, 1)
+            db.execute(insert(DegustacionDB), [{"usuario_id": random.choice(ids), "cerveza_id": cerveza.id,
+                "fecha_creacion": inicio + timedelta(hours=random.randint(0, 20))} for _ in range(300)])
+            # Y otras con la fecha del servidor, todas en el mismo segundo
+            db.execute(insert(DegustacionDB), [{"usuario_id": random.choice(ids), "cerveza_id": cerveza.id}
+                for _ in range(60)])
+            db.commit()
+            actividad_servicio.reconstruir(db)
+
+            def leer(modo, usuario, **kwargs):
+                actividad_servicio.MODO = modo
+                try:
+                    return [d.id for d in actividad_servicio.obtener_actividad(db, usuario, **kwargs)]
+                finally:
+                    actividad_servicio.MODO = "materializado"
+
+            errores, planes = [], []
+            for usuario in ids[:10]:
+                for skip, limit in [(0, 5), (3, 7), (0, 100)]:
+                    if leer("calculado", usuario, skip=skip, limit=limit) != \
+                            leer("materializado", usuario, skip=skip, limit=limit):
+                        errores.append(f"usuario {usuario}, skip={skip}, limit={limit}")
+                # Recorrido completo con cursor en los dos modos
+                for modo in ("calculado", "materializado"):
+                    vistas, antes_de = [], None
+                    while True:
+                        actividad_servicio.MODO = modo
+                        with ContadorConsultas(engine) as contador:
+                            pagina = actividad_servicio.obtener_actividad(db, usuario, limit=6, antes_de=antes_de)
+                        actividad_servicio.MODO = "materializado"
+                        if antes_de is not None:
+                            planes += contador.planes()
+                        if not pagina:
+                            break
+                        vistas += [d.id for d in pagina]
+                        antes_de = (pagina[-1].id, pagina[-1].fecha_creacion)
+                    if vistas != leer("materializado", usuario, limit=1000):
+                        errores.append(f"usuario {usuario}: el recorrido con cursor ({modo}) no coincide")
+
+            with ContadorConsultas(engine) as contador:
+                leer("calculado", ids[0], limit=10)
+            db.close()
+
+            if contador.total > 3:
+                errores.append(f"el feed calculado hizo {contador.total} consultas (máximo 3)")
+            indices = ("ix_actividad_usuario_fecha ", "ix_degustaciones_usuario_fecha_id ")
+            sin_busqueda = [linea for plan in planes for linea in plan.splitlines()
+                if any(indice in linea for indice in indices) and "fecha_creacion<" not in linea]
+            if sin_busqueda:
+                errores.append(f"páginas por cursor sin búsqueda desde el cursor: {sin_busqueda[0]}")
+            if errores:
+                for error in errores:
+                    self.print_error(f"Feed calculado distinto: {error}")
+                return False
+            self.print_success("Feed calculado igual al materializado en 3 consultas como mucho")
+            return True
+                
+        except Exception as e:
+            self.print_error(f"Error probando el feed calculado: {e}")
+            return False
+
     def test_enviar_solicitud(self, user_id, friend_id, expected_success=True):
         """Prueba enviar solicitud de amistad"""
         # self.print_test_header(f"ENVIAR SOLICITUD: {user_id} -> {friend_id}")
@@ -564,6 +1027,20 @@ class UsuarioTester:
         self.test_obtener_detalles_amigo(usuario1_id, usuario2_id)
         self.wait_for_operation()
         
+        # Niveles de detalle del listado de usuarios
+        self.test_listado_usuarios_campos(None, ["id", "username", "email"])
+        self.wait_for_operation()
+        
+        self.test_listado_usuarios_campos({'nivel': 'perfil'},
+            ["id", "username", "email", "birth_date", "created_at", "updated_at", "friends"])
+        self.wait_for_operation()
+        
+        self.test_listado_usuarios_campos({'fields': 'id,friends'}, ["id", "friends"])
+        self.wait_for_operation()
+        
+        self.test_listado_usuarios_campos({'fields': 'id,password_hash'}, None, expected_success=False)
+        self.wait_for_operation()
+        
         # Paso 6: Probar eliminación de amigos
         self.print_info("Paso 6: Probando eliminación de amigos...")
         self.test_eliminar_amigo(usuario1_id, usuario2_id)
@@ -610,6 +1087,12 @@ class UsuarioTester:
         self.print_info("Paso 9: Probando Login...")
         self.test_login("UsuarioA", pwd_comun, expected_success=True)
         self.test_login("UsuarioA", "wrongpass", expected_success=False)
+        self.test_hash_contrasenas_acotado()
+        self.test_tokens_acceso()
+        self.test_ids_amigos_sin_cargar()
+        self.test_amistad_simetrica()
+        self.test_feed_actividad()
+        self.test_actividad_calculada()
     
 
         # Paso 10: Flujo Solicitud Aceptar (A -> B)